@@ -0,0 +1,97 @@
+"""
+Enrollment counters stored on each class document:
+
+    {subject_code, subject_name, instructor_id, student_count: 31,
+     risk_counts: {High: 4, Medium: 7, Low: 12}}
+
+Class lists, class detail and the class risk summary read them with the class instead of
+counting enrollments. changed() applies one $inc per class and is called from
+rollups.enrollments_changed(), so every writer that keeps the rollups current (adding students,
+label changes from updates, imports and rescoring) keeps these current too. backfill() counts
+classes created before the fields existed; check() and repair() find and recount drift.
+"""
+from bson import ObjectId
+from pymongo import UpdateOne
+
+STUDENT_COUNT = "student_count"
+RISK_COUNTS = "risk_counts"
+RISK_LEVELS = ("High", "Medium", "Low")
+AT_RISK_LEVELS = ("High", "Medium")
+PROJECTION = {STUDENT_COUNT: 1, RISK_COUNTS: 1}
+
+
+def zero() -> dict:
+    return {STUDENT_COUNT: 0, RISK_COUNTS: {level: 0 for level in RISK_LEVELS}}
+
+
+def counts_of(doc: dict) -> dict:
+    """Counter fields of a class document (zeros when missing)."""
+    risk_counts = doc.get(RISK_COUNTS) or {}
+    return {STUDENT_COUNT: doc.get(STUDENT_COUNT, 0), RISK_COUNTS: {level: risk_counts.get(level, 0) for level in RISK_LEVELS}}
+
+
+def at_risk(doc: dict) -> int:
+    risk_counts = doc.get(RISK_COUNTS) or {}
+    return sum(risk_counts.get(level, 0) for level in AT_RISK_LEVELS)
+
+
+def changed(db, class_id: str, added: int = 0, risk_changes=()):
+    """Apply `added` new enrollments and (old_risk, new_risk) label changes to a class's counters."""
+    inc = {STUDENT_COUNT: added}
+    for old, new in risk_changes:
+        if old in RISK_LEVELS:
+            inc[f"{RISK_COUNTS}.{old}"] = inc.get(f"{RISK_COUNTS}.{old}", 0) - 1
+        if new in RISK_LEVELS:
+            inc[f"{RISK_COUNTS}.{new}"] = inc.get(f"{RISK_COUNTS}.{new}", 0) + 1
+    inc = {k: v for k, v in inc.items() if v}
+    if not inc or not ObjectId.is_valid(class_id):
+        return
+    # classes without counters yet are left to backfill(), which counts them from scratch
+    db.classes.update_one({"_id": ObjectId(class_id), STUDENT_COUNT: {"$exists": True}}, {"$inc": inc})
+
+
+def count(db, class_ids: list[str] | None = None) -> dict:
+    """{class_id: counters} recounted from enrollments (all classes when class_ids is None)."""
+    pipeline = [] if class_ids is None else [{"$match": {"class_id": {"$in": class_ids}}}]
+    pipeline.append({"$group": {
+        "_id": "$class_id",
+        STUDENT_COUNT: {"$sum": 1},
+        **{level: {"$sum": {"$cond": [{"$eq": ["$risk", level]}, 1, 0]}} for level in RISK_LEVELS},
+    }})
+    return {
+        row["_id"]: {STUDENT_COUNT: row[STUDENT_COUNT], RISK_COUNTS: {level: row[level] for level in RISK_LEVELS}}
+        for row in db.enrollments.aggregate(pipeline)
+    }
+
+
+def _write(db, counters: dict) -> int:
+    ops = [UpdateOne({"_id": ObjectId(cid)}, {"$set": values}) for cid, values in counters.items()]
+    for i in range(0, len(ops), 1000):
+        db.classes.bulk_write(ops[i:i + 1000], ordered=False)
+    return len(ops)
+
+
+def backfill(db) -> int:
+    """Count classes that have no counters yet. Returns classes written."""
+    missing = [str(doc["_id"]) for doc in db.classes.find({STUDENT_COUNT: {"$exists": False}}, {"_id": 1})]
+    if not missing:
+        return 0
+    counted = count(db, missing)
+    return _write(db, {cid: counted.get(cid, zero()) for cid in missing})
+
+
+def check(db) -> list[dict]:
+    """Classes whose stored counters differ from their enrollments."""
+    expected = count(db)
+    drift = []
+    for doc in db.classes.find({}, PROJECTION):
+        cid = str(doc["_id"])
+        want = expected.get(cid, zero())
+        if counts_of(doc) != want or STUDENT_COUNT not in doc:
+            drift.append({"class_id": cid, "expected": want, "stored": counts_of(doc)})
+    return drift
+
+
+def repair(db) -> int:
+    """Recount the classes that drifted. Returns classes written."""
+    return _write(db, {entry["class_id"]: entry["expected"] for entry in check(db)})
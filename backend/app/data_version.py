@@ -0,0 +1,34 @@
+"""
+Per-collection data versions, bumped by every write that report artifacts depend on.
+
+    {_id: "enrollments", v: 42, updated_at: <datetime>}
+
+stamp() combines the versions of a set of collections into a short token; a cached artifact
+built under the same token is still current (app/reports.py uses it for file names and ETags).
+Writers call bump() after inserting, updating or deleting.
+"""
+import hashlib
+
+from pymongo import UpdateOne
+
+VERSIONS = "data_versions"
+ENROLLMENTS = "enrollments"
+CLASSES = "classes"
+INSTRUCTORS = "instructor"
+INTERVENTIONS = "interventions"
+EVALUATION = "evaluation_results"
+
+
+def bump(db, *names: str):
+    """Advance the version of each named collection."""
+    db[VERSIONS].bulk_write(
+        [UpdateOne({"_id": name}, {"$inc": {"v": 1}, "$currentDate": {"updated_at": True}}, upsert=True) for name in names],
+        ordered=False,
+    )
+
+
+def stamp(db, names) -> str:
+    """Short token that changes whenever any of the named collections is written."""
+    versions = {doc["_id"]: doc.get("v", 0) for doc in db[VERSIONS].find({"_id": {"$in": list(names)}}, {"v": 1})}
+    key = ",".join(f"{name}:{versions.get(name, 0)}" for name in sorted(names))
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
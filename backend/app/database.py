@@ -1,8 +1,12 @@
 import os
 from pymongo import MongoClient
 from pymongo.database import Database
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+from app.monitoring import command_listener, pool_listener, propagate_to_motor
 
 _client: MongoClient | None = None
+_async_client = None  # motor.motor_asyncio.AsyncIOMotorClient when MONGODB_DRIVER=async
 
 # Role -> collection name under capstonesystem
 ROLE_TO_COLLECTION = {
@@ -12,18 +16,100 @@ ROLE_TO_COLLECTION = {
 }
 ROLE_COLLECTIONS = list(ROLE_TO_COLLECTION.values())
 
+# MongoClient keyword -> environment variable. Unset variables keep the driver default.
+_INT_POOL_OPTIONS = {
+    "maxPoolSize": "MONGODB_MAX_POOL_SIZE",
+    "minPoolSize": "MONGODB_MIN_POOL_SIZE",
+    "maxIdleTimeMS": "MONGODB_MAX_IDLE_TIME_MS",
+    "waitQueueTimeoutMS": "MONGODB_WAIT_QUEUE_TIMEOUT_MS",
+    "serverSelectionTimeoutMS": "MONGODB_SERVER_SELECTION_TIMEOUT_MS",
+    "connectTimeoutMS": "MONGODB_CONNECT_TIMEOUT_MS",
+    "socketTimeoutMS": "MONGODB_SOCKET_TIMEOUT_MS",
+}
+
+_READ_PREFERENCES = {
+    "primary": Primary,
+    "primarypreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondarypreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+# Workload -> (environment variable, default read preference). Pass the workload to get_db()
+# so heavy reads can be routed away from the primary.
+WORKLOAD_READ_PREFERENCES = {
+    "analytics": ("MONGODB_ANALYTICS_READ_PREFERENCE", "secondaryPreferred"),
+}
+ANALYTICS = "analytics"
+
+
+def client_options() -> dict:
+    """MongoClient keyword options from the environment (pool size, timeouts, compression)."""
+    options = {}
+    for option, env_name in _INT_POOL_OPTIONS.items():
+        value = (os.getenv(env_name) or "").strip()
+        if value:
+            options[option] = int(value)
+    compressors = os.getenv("MONGODB_COMPRESSORS", "zlib").strip()
+    if compressors:
+        options["compressors"] = compressors
+    return options
+
 
 def get_client() -> MongoClient:
     global _client
     if _client is None:
         uri = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
-        _client = MongoClient(uri)
+        _client = MongoClient(uri, event_listeners=[command_listener, pool_listener], **client_options())
     return _client
 
 
-def get_db() -> Database:
+def _read_preference(workload: str):
+    env_name, default = WORKLOAD_READ_PREFERENCES[workload]
+    mode = (os.getenv(env_name) or default).strip().lower()
+    if mode not in _READ_PREFERENCES:
+        raise ValueError(f"Invalid read preference for {env_name}: {mode}")
+    return _READ_PREFERENCES[mode]()
+
+
+def get_db(workload: str | None = None) -> Database:
+    """Database handle. With a workload (e.g. ANALYTICS), reads use that workload's read preference."""
     name = os.getenv("MONGODB_DB", "capstonesystem")
-    return get_client()[name]
+    if workload is None:
+        return get_client()[name]
+    return get_client().get_database(name, read_preference=_read_preference(workload))
+
+
+def use_async_driver() -> bool:
+    """True when MONGODB_DRIVER=async: hot read routes run as async def on the Motor driver
+    instead of sync def on pymongo in Starlette's threadpool."""
+    return os.getenv("MONGODB_DRIVER", "sync").strip().lower() == "async"
+
+
+def get_async_client():
+    global _async_client
+    if _async_client is None:
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        propagate_to_motor()
+        uri = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
+        _async_client = AsyncIOMotorClient(uri, event_listeners=[command_listener, pool_listener], **client_options())
+    return _async_client
+
+
+def get_async_db():
+    name = os.getenv("MONGODB_DB", "capstonesystem")
+    return get_async_client()[name]
+
+
+def close_clients():
+    global _client, _async_client
+    if _async_client is not None:
+        _async_client.close()
+        _async_client = None
+    if _client is not None:
+        _client.close()
+        _client = None
 
 
 def get_collection_for_role(role: str) -> str:
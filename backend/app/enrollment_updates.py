@@ -0,0 +1,107 @@
+"""
+Writes of academic indicators, risk and outcome fields to existing enrollments, shared by the
+single-student PATCH, the batched class PATCH and bulk imports (app/imports.py).
+
+update_one() is a single find_one_and_update: fields are set, risk is rescored server-side
+when indicators change (scoring.risk_update_stages()), and the document from before the write
+tells which label it replaced. update_many() fetches a batch of enrollments with one query and
+writes it with one unordered bulk_write whose ops only match while the risk and indicators
+still hold the values read; the few that lost a race are retried with update_one(). Both then
+keep rollups and class counters, risk alerts, the enrollments data version and cached student
+views in step.
+"""
+from collections import defaultdict
+
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+
+from app import data_version, risk_alerts, rollups, scoring, student_view
+from app.indicators import INDICATORS
+
+_BEFORE = {"risk": 1, "risk_source": 1, **{name: 1 for name in INDICATORS}}
+
+
+def _rescores(payload: dict) -> bool:
+    return "risk" not in payload and any(name in payload for name in INDICATORS)
+
+
+def _after_write(db, transitions: list[tuple], emails):
+    by_class = defaultdict(list)
+    for class_id, _, old, new in transitions:
+        by_class[class_id].append((old, new))
+    for class_id, changes in by_class.items():
+        rollups.enrollments_changed(db, class_id, risk_changes=changes)
+    risk_alerts.record(transitions)
+    data_version.bump(db, data_version.ENROLLMENTS)
+    student_view.invalidate(*emails)
+
+
+def update_one(db, class_id: str, email: str, payload: dict) -> bool:
+    """Apply one update in one round trip. False when the student is not enrolled in the class."""
+    if _rescores(payload):
+        # literal values so strings such as "$x" are never read as field paths
+        stages = [{"$set": {**{k: {"$literal": v} for k, v in payload.items()}, "updated_at": "$$NOW"}}]
+        update = stages + scoring.risk_update_stages()
+    else:
+        fields = dict(payload)
+        scoring.label_update({}, fields)
+        update = {"$set": fields, "$currentDate": {"updated_at": True}}
+    before = db.enrollments.find_one_and_update(
+        {"class_id": class_id, "student_email": email},
+        update,
+        projection=_BEFORE,
+        return_document=ReturnDocument.BEFORE,
+    )
+    if before is None:
+        return False
+    # the label the write produced, by the same rule the server applied
+    applied = dict(payload)
+    scoring.label_update(before, applied)
+    old, new = before.get("risk"), applied.get("risk", before.get("risk"))
+    _after_write(db, [(class_id, email, old, new)] if new != old else [], [email])
+    return True
+
+
+def update_many(db, updates: dict) -> tuple[int, list[tuple[str, str]]]:
+    """Apply {(class_id, email): payload} updates with one read and one bulk write.
+    Returns (enrollments updated, keys of students not enrolled)."""
+    if not updates:
+        return 0, []
+    existing = {
+        (doc["class_id"], doc["student_email"]): doc
+        for doc in db.enrollments.find(
+            {"class_id": {"$in": list({cid for cid, _ in updates})},
+             "student_email": {"$in": list({email for _, email in updates})}},
+            {"class_id": 1, "student_email": 1, **_BEFORE},
+        )
+    }
+    run = ObjectId()
+    batch, missing = [], []
+    for key, payload in updates.items():
+        doc = existing.get(key)
+        if doc is None:
+            missing.append(key)
+            continue
+        fields = dict(payload)
+        scoring.label_update(doc, fields)
+        batch.append((UpdateOne(
+            {"_id": doc["_id"], **scoring.unchanged_filter(doc, _BEFORE)},
+            {"$set": {**fields, scoring.WRITE_RUN: run}, "$currentDate": {"updated_at": True}},
+        ), (doc["_id"], key, doc.get("risk"), fields.get("risk", doc.get("risk")))))
+    if not batch:
+        return 0, missing
+    booked = scoring.write_matched(db, batch, run)
+    if booked:
+        transitions = [(*key, old, new) for _, key, old, new in booked if new != old]
+        _after_write(db, transitions, {key[1] for _, key, _, _ in booked})
+    # enrollments changed between the read and the write: apply those one at a time
+    updated = len(booked)
+    written = {item[0] for item in booked}
+    for _, (_id, key, _, _) in batch:
+        if _id in written:
+            continue
+        if update_one(db, *key, updates[key]):
+            updated += 1
+        else:
+            missing.append(key)
+    return updated, missing
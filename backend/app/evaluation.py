@@ -0,0 +1,171 @@
+"""
+Offline evaluation of recorded risk labels against later outcomes.
+
+An enrollment is evaluated once it has a `term` and an `outcome` (passed / failed / withdrawn).
+A High or Medium risk label is a positive prediction; a failed or withdrawn outcome is a
+positive outcome. Unlabeled enrollments count as Low, as in the risk distribution.
+
+refresh() re-evaluates only the terms with enrollments written since the previous run
+(enrollments carry `updated_at`), scoring all of a term's enrollments in one vectorized pass:
+confusion counts and calibration (observed failure rate per risk level) per term × department
+and per term overall. Results are stored in `evaluation_results`; the accuracy endpoint and
+the AI accuracy report only read them. evaluation_loop(), started in main.py, refreshes every
+EVALUATION_INTERVAL_SECONDS (default 60); `python -m scripts.evaluate` refreshes from cron.
+"""
+import asyncio
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+from pymongo import ReplaceOne
+
+from app import data_version, scope
+
+RESULTS = "evaluation_results"
+ALL_DEPARTMENTS = "All"
+OUTCOMES = ("passed", "failed", "withdrawn")
+POSITIVE_OUTCOMES = ("failed", "withdrawn")
+RISK_LEVELS = ("Low", "Medium", "High")
+_META_ID = "_meta"
+
+
+def _percent(numerator, denominator) -> float | None:
+    return round(100 * numerator / denominator, 1) if denominator else None
+
+
+def _metrics(tp: int, fp: int, fn: int, tn: int) -> dict:
+    precision = tp / (tp + fp) if tp + fp else None
+    recall = tp / (tp + fn) if tp + fn else None
+    f1 = 2 * precision * recall / (precision + recall) if precision and recall else None
+    return {
+        "accuracy": _percent(tp + tn, tp + fp + fn + tn),
+        "precision": round(100 * precision, 1) if precision is not None else None,
+        "recall": round(100 * recall, 1) if recall is not None else None,
+        "f1": round(100 * f1, 1) if f1 is not None else None,
+    }
+
+
+def evaluate_terms(db, terms: list[str]) -> list[dict]:
+    """Result documents for the given terms (one per term × department, plus term × All)."""
+    scoped = scope.resolve(db, None)
+    dept_codes: dict[str, int] = {}
+    class_dept: dict[str, int] = {}
+    for cid, c in scoped.classes.items():
+        inst = scoped.instructors.get(c.get("instructor_id")) or {}
+        name = (inst.get("department") or "").strip() or "Unassigned"
+        class_dept[cid] = dept_codes.setdefault(name, len(dept_codes))
+    unknown = dept_codes.setdefault("Unassigned", len(dept_codes))
+    departments = list(dept_codes)
+    term_codes = {term: i for i, term in enumerate(terms)}
+
+    term_idx, dept_idx, risk, actual = [], [], [], []
+    cursor = db.enrollments.find(
+        {"term": {"$in": terms}, "outcome": {"$in": list(OUTCOMES)}},
+        {"_id": 0, "term": 1, "class_id": 1, "risk": 1, "outcome": 1},
+        batch_size=10_000,
+    )
+    for doc in cursor:
+        term_idx.append(term_codes[doc["term"]])
+        dept_idx.append(class_dept.get(doc.get("class_id"), unknown))
+        risk.append(RISK_LEVELS.index(doc["risk"]) if doc.get("risk") in RISK_LEVELS else 0)
+        actual.append(doc["outcome"] in POSITIVE_OUTCOMES)
+    term_idx = np.asarray(term_idx, dtype=np.int64)
+    risk = np.asarray(risk, dtype=np.int64)
+    actual = np.asarray(actual, dtype=bool)
+    predicted = risk >= 1
+
+    # group g = term * (departments + 1) + department; the extra department slot is "All"
+    width = len(departments) + 1
+    groups = np.concatenate([term_idx * width + np.asarray(dept_idx, dtype=np.int64), term_idx * width + len(departments)])
+    pred2, actual2, risk2 = np.tile(predicted, 2), np.tile(actual, 2), np.tile(risk, 2)
+    size = len(terms) * width
+
+    def count(mask):
+        return np.bincount(groups[mask], minlength=size)
+
+    tp, fp = count(pred2 & actual2), count(pred2 & ~actual2)
+    fn, tn = count(~pred2 & actual2), count(~pred2 & ~actual2)
+    level_n = np.bincount(groups * 3 + risk2, minlength=size * 3).reshape(size, 3)
+    level_pos = np.bincount(groups[actual2] * 3 + risk2[actual2], minlength=size * 3).reshape(size, 3)
+
+    evaluated_at = datetime.now(timezone.utc)
+    docs = []
+    for term, t in term_codes.items():
+        for d in range(width):
+            g = t * width + d
+            n = int(tp[g] + fp[g] + fn[g] + tn[g])
+            if not n:
+                continue
+            department = departments[d] if d < len(departments) else ALL_DEPARTMENTS
+            docs.append({
+                "_id": f"{term}|{department}",
+                "term": term,
+                "department": department,
+                "n": n,
+                "tp": int(tp[g]), "fp": int(fp[g]), "fn": int(fn[g]), "tn": int(tn[g]),
+                **_metrics(int(tp[g]), int(fp[g]), int(fn[g]), int(tn[g])),
+                "calibration": [
+                    {"risk": level, "n": int(level_n[g, r]), "observed_rate": _percent(int(level_pos[g, r]), int(level_n[g, r]))}
+                    for r, level in enumerate(RISK_LEVELS)
+                ],
+                "evaluated_at": evaluated_at,
+            })
+    return docs
+
+
+def refresh(db, full: bool = False) -> int:
+    """Re-evaluate terms with enrollments written since the last run (all terms if full).
+    Returns the number of result documents written."""
+    meta = db[RESULTS].find_one({"_id": _META_ID}) or {}
+    since = None if full else meta.get("evaluated_through")
+    # The watermark is the newest updated_at the server stamped, never the app clock, so clock
+    # skew between app and database cannot skip writes.
+    latest = db.enrollments.find_one(
+        {"updated_at": {"$exists": True}}, {"_id": 0, "updated_at": 1}, sort=[("updated_at", -1)]
+    )
+    through = latest["updated_at"] if latest else None
+    if since is not None and (through is None or through <= since):
+        return 0
+    query = {"term": {"$exists": True, "$ne": None}, "outcome": {"$in": list(OUTCOMES)}}
+    if since is not None:
+        # $gte: a write stamped in the same millisecond as the watermark may have landed after it
+        query["updated_at"] = {"$gte": since}
+    terms = sorted(db.enrollments.distinct("term", query))
+    written = 0
+    if terms:
+        docs = evaluate_terms(db, terms)
+        if docs:
+            db[RESULTS].bulk_write([ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in docs], ordered=False)
+        db[RESULTS].delete_many({"term": {"$in": terms}, "_id": {"$nin": [doc["_id"] for doc in docs]}})
+        data_version.bump(db, data_version.EVALUATION)
+        written = len(docs)
+    if through is not None and through != since:
+        db[RESULTS].update_one({"_id": _META_ID}, {"$set": {"evaluated_through": through}}, upsert=True)
+    return written
+
+
+def results(db, department: str | None = None, term: str | None = None):
+    """Stored results for one department (default: all departments combined), oldest term first."""
+    query = {"_id": {"$ne": _META_ID}, "department": department or ALL_DEPARTMENTS}
+    if term:
+        query["term"] = term
+    return db[RESULTS].find(query, {"_id": 0}).sort("term", 1)
+
+
+def _interval_seconds() -> float:
+    return float(os.getenv("EVALUATION_INTERVAL_SECONDS", "60"))
+
+
+async def evaluation_loop(get_db):
+    """Refresh the stored results every EVALUATION_INTERVAL_SECONDS (0 disables)."""
+    interval = _interval_seconds()
+    if interval <= 0:
+        return
+    while True:
+        try:
+            written = await asyncio.to_thread(refresh, get_db())
+            if written:
+                print(f"[Evaluation] Re-evaluated {written} term results.")
+        except Exception as e:  # keep the loop alive across transient database errors
+            print(f"[Evaluation] Refresh skipped: {e.__class__.__name__}.")
+        await asyncio.sleep(interval)
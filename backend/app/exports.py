@@ -0,0 +1,174 @@
+"""
+Columnar (Parquet / Arrow IPC) exports for analytics tools.
+
+Unlike the CSV reports, columns keep their types: gpa, attendance and lms_activity are
+float64, flagged_for_mentoring is a boolean, missing values are nulls. Rows are read from the
+MongoDB cursor in record batches of BATCH_ROWS and each batch is written to the response as
+soon as it is encoded (one Parquet row group or one Arrow IPC message per batch), so memory
+stays bounded by the batch size.
+
+pyarrow is imported lazily; only these endpoints need it.
+"""
+from app import rollups
+
+BATCH_ROWS = 50_000
+FORMATS = {
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+_ENROLLMENT_FIELDS = {
+    "_id": 0,
+    "student_email": 1,
+    "class_id": 1,
+    "risk": 1,
+    "gpa": 1,
+    "attendance": 1,
+    "lms_activity": 1,
+    "flagged_for_mentoring": 1,
+}
+
+
+def _schema(dataset: str):
+    import pyarrow as pa
+
+    class_fields = [
+        ("class_id", pa.string()),
+        ("subject_code", pa.string()),
+        ("subject_name", pa.string()),
+        ("instructor_id", pa.string()),
+        ("instructor", pa.string()),
+        ("department", pa.string()),
+    ]
+    if dataset == "classes":
+        return pa.schema(class_fields + [
+            ("students", pa.int64()),
+            ("at_risk", pa.int64()),
+            ("high", pa.int64()),
+            ("medium", pa.int64()),
+            ("low", pa.int64()),
+        ])
+    return pa.schema([("student_email", pa.string())] + class_fields + [
+        ("risk", pa.string()),
+        ("gpa", pa.float64()),
+        ("attendance", pa.float64()),
+        ("lms_activity", pa.float64()),
+        ("flagged_for_mentoring", pa.bool_()),
+    ])
+
+
+def _class_columns(scoped, class_id: str) -> dict:
+    c = scoped.classes.get(class_id) or {}
+    inst = scoped.instructors.get(c.get("instructor_id")) or {}
+    return {
+        "class_id": class_id,
+        "subject_code": c.get("subject_code"),
+        "subject_name": c.get("subject_name"),
+        "instructor_id": c.get("instructor_id"),
+        "instructor": inst.get("name"),
+        "department": (inst.get("department") or "").strip() or None,
+    }
+
+
+def _number(value):
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _enrollment_rows(db, scoped):
+    cursor = db.enrollments.find({"class_id": {"$in": scoped.class_ids}}, _ENROLLMENT_FIELDS, batch_size=BATCH_ROWS)
+    for doc in cursor:
+        yield {
+            "student_email": doc.get("student_email"),
+            **_class_columns(scoped, doc.get("class_id")),
+            "risk": doc.get("risk"),
+            "gpa": _number(doc.get("gpa")),
+            "attendance": _number(doc.get("attendance")),
+            "lms_activity": _number(doc.get("lms_activity")),
+            "flagged_for_mentoring": doc.get("flagged_for_mentoring"),
+        }
+
+
+def _class_rows(db, scoped):
+    keys = [rollups.class_key(cid) for cid in scoped.class_ids]
+    for doc in db[rollups.ROLLUPS].find({"_id": {"$in": keys}}, batch_size=BATCH_ROWS):
+        yield {
+            **_class_columns(scoped, doc["class_id"]),
+            "students": doc.get("total", 0),
+            "at_risk": doc.get("at_risk", 0),
+            "high": doc.get("high", 0),
+            "medium": doc.get("medium", 0),
+            "low": doc.get("low", 0),
+        }
+
+
+def _batches(rows, schema):
+    import pyarrow as pa
+
+    columns = {name: [] for name in schema.names}
+    count = 0
+    for row in rows:
+        for name, values in columns.items():
+            values.append(row[name])
+        count += 1
+        if count == BATCH_ROWS:
+            yield pa.RecordBatch.from_pydict(columns, schema=schema)
+            columns = {name: [] for name in schema.names}
+            count = 0
+    if count:
+        yield pa.RecordBatch.from_pydict(columns, schema=schema)
+
+
+class _ChunkSink:
+    """Write-only file object that collects what pyarrow writes until it is drained."""
+
+    def __init__(self):
+        self.chunks: list[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def export_chunks(db, scoped, dataset: str, fmt: str):
+    """Encoded bytes of a dataset in the given format, one chunk per record batch."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _schema(dataset)
+    rows = _class_rows(db, scoped) if dataset == "classes" else _enrollment_rows(db, scoped)
+    sink = _ChunkSink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+    for batch in _batches(rows, schema):
+        if fmt == "parquet":
+            writer.write_batch(batch, row_group_size=BATCH_ROWS)
+        else:
+            writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
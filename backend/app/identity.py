@@ -0,0 +1,199 @@
+"""
+Identity directory: maps user id, email and verification/reset tokens to the role collection
+(instructor, admin, amustaff) that owns the account.
+
+Users live in one collection per role, so looking someone up by id or token used to mean one
+query per role collection. The `identities` collection stores one entry per account:
+
+    {_id: <user ObjectId>, collection: "instructor", email: "<lowercase>",
+     email_verification_token?: str, password_reset_token?: str}
+
+and every write to a role collection in users.py / auth.py calls register() or forget() to keep
+it in step. A cold lookup is one aggregation that matches the directory entry and joins the
+account from its role collection; an in-process cache of which collection owns an id, email
+or token then makes a warm lookup a single query against that collection. Cached entries are
+verified against the fetched document and dropped if another process changed the account in
+the meantime.
+"""
+import os
+
+from bson import ObjectId
+from pymongo import ReplaceOne
+
+from app.cache import TTLCache
+from app.database import ROLE_COLLECTIONS
+
+DIRECTORY = "identities"
+TOKEN_FIELDS = ("email_verification_token", "password_reset_token")
+
+
+def _ttl_seconds() -> float:
+    return float(os.getenv("IDENTITY_CACHE_TTL_SECONDS", "300"))
+
+
+# ("id", str) -> collection, ("email", str) -> [(collection, id)], ("<token field>", token) -> (collection, id)
+_cache = TTLCache(maxsize=10_000, ttl=_ttl_seconds)
+
+
+def _entry_for(coll_name: str, doc: dict) -> dict:
+    entry = {"_id": doc["_id"], "collection": coll_name, "email": (doc.get("email") or "").strip().lower()}
+    for field in TOKEN_FIELDS:
+        if doc.get(field):
+            entry[field] = doc[field]
+    return entry
+
+
+def register(db, coll_name: str, doc: dict):
+    """Record (or refresh) the directory entry for a user document just written to coll_name.
+
+    Token fields absent from `doc` (e.g. a projected document) are left as they are; token
+    fields present but empty are removed."""
+    entry = _entry_for(coll_name, doc)
+    update = {"$set": {k: v for k, v in entry.items() if k != "_id"}}
+    unset = {f: "" for f in TOKEN_FIELDS if f in doc and f not in entry}
+    if unset:
+        update["$unset"] = unset
+    db[DIRECTORY].update_one({"_id": doc["_id"]}, update, upsert=True)
+    user_id = str(doc["_id"])
+    _cache.set(("id", user_id), coll_name)
+    _cache.pop(("email", entry["email"]))
+    for field in TOKEN_FIELDS:
+        if field in entry:
+            _cache.set((field, entry[field]), (coll_name, user_id))
+
+
+def set_tokens(db, coll_name: str, user_id, **tokens):
+    """Update token fields on a directory entry. A value of None removes that token."""
+    to_set = {f: v for f, v in tokens.items() if v is not None}
+    to_unset = {f: "" for f, v in tokens.items() if v is None}
+    update = {}
+    if to_set:
+        update["$set"] = to_set
+    if to_unset:
+        update["$unset"] = to_unset
+    if update:
+        db[DIRECTORY].update_one({"_id": ObjectId(str(user_id))}, update)
+    for field, value in to_set.items():
+        _cache.set((field, value), (coll_name, str(user_id)))
+
+
+def forget(db, user_id):
+    """Remove a deleted user from the directory."""
+    db[DIRECTORY].delete_one({"_id": ObjectId(str(user_id))})
+    _cache.pop(("id", str(user_id)))
+
+
+def _joined(db, match: dict, projection: dict | None = None) -> list:
+    """(doc, collection_name) for directory entries matching `match`, each joined to its account
+    in one aggregation; entries whose account no longer exists are left out."""
+    pipeline = [{"$match": match}]
+    for coll_name in ROLE_COLLECTIONS:
+        pipeline.append({"$lookup": {"from": coll_name, "localField": "_id", "foreignField": "_id", "as": coll_name}})
+    if projection:
+        fields = {"_id": 1, **projection}
+        pipeline.append({"$project": {
+            "collection": 1, **{f"{c}.{f}": v for c in ROLE_COLLECTIONS for f, v in fields.items()},
+        }})
+    found = []
+    for entry in db[DIRECTORY].aggregate(pipeline):
+        docs = entry.get(entry["collection"]) or []
+        if docs:
+            found.append((docs[0], entry["collection"]))
+    return found
+
+
+def find_user_by_id(db, user_id: str, projection: dict | None = None):
+    """Return (doc, collection_name) for a user id, else (None, None)."""
+    if not ObjectId.is_valid(user_id):
+        return None, None
+    oid = ObjectId(user_id)
+    coll_name = _cache.get(("id", user_id))
+    if coll_name:
+        doc = db[coll_name].find_one({"_id": oid}, projection)
+        if doc:
+            return doc, coll_name
+        _cache.pop(("id", user_id))
+    found = _joined(db, {"_id": oid}, projection)
+    if not found:
+        return None, None
+    doc, coll_name = found[0]
+    _cache.set(("id", user_id), coll_name)
+    return doc, coll_name
+
+
+def _by_role(found: list) -> list:
+    return sorted(found, key=lambda f: ROLE_COLLECTIONS.index(f[1]) if f[1] in ROLE_COLLECTIONS else len(ROLE_COLLECTIONS))
+
+
+def find_user_by_email(db, email: str):
+    """Return (doc, collection_name) for the first role collection (in ROLE_COLLECTIONS order)
+    holding this email, case-insensitively, else (None, None)."""
+    email = (email or "").strip().lower()
+    owners = _cache.get(("email", email))
+    if owners:
+        coll_name, user_id = owners[0]
+        doc = db[coll_name].find_one({"_id": ObjectId(user_id)})
+        if doc and (doc.get("email") or "").strip().lower() == email:
+            return doc, coll_name
+        # Stale cache entry (account changed or deleted elsewhere): ask the directory.
+        _cache.pop(("email", email))
+    found = [
+        (doc, coll_name) for doc, coll_name in _by_role(_joined(db, {"email": email}))
+        if (doc.get("email") or "").strip().lower() == email
+    ]
+    if not found:
+        return None, None
+    _cache.set(("email", email), [(coll_name, str(doc["_id"])) for doc, coll_name in found])
+    return found[0]
+
+
+def find_user_by_token(db, field: str, token: str):
+    """Return (doc, collection_name) for the account holding `token` in `field`, else (None, None)."""
+    cached = _cache.get((field, token))
+    if cached:
+        coll_name, user_id = cached
+        doc = db[coll_name].find_one({"_id": ObjectId(user_id), field: token})
+        if doc:
+            return doc, coll_name
+        _cache.pop((field, token))
+    found = [(doc, coll_name) for doc, coll_name in _joined(db, {field: token}) if doc.get(field) == token]
+    if not found:
+        return None, None
+    doc, coll_name = found[0]
+    _cache.set((field, token), (coll_name, str(doc["_id"])))
+    return doc, coll_name
+
+
+def sync_directory(db) -> int:
+    """Bring the directory in line with the role collections (first run, or accounts written by
+    other tools). Entries are replaced one account at a time, keyed by the user id, and only
+    where they differ, so lookups keep working meanwhile and several workers can run it at once.
+    Returns the number of entries written or removed, 0 if already in sync."""
+    existing = {e["_id"]: e for e in db[DIRECTORY].find({})}
+    projection = {"email": 1, **{f: 1 for f in TOKEN_FIELDS}}
+    changed, ops = 0, []
+    for coll_name in ROLE_COLLECTIONS:
+        for doc in db[coll_name].find({}, projection):
+            entry = _entry_for(coll_name, doc)
+            if existing.pop(doc["_id"], None) == entry:
+                continue
+            ops.append(ReplaceOne({"_id": entry["_id"]}, entry, upsert=True))
+            if len(ops) == 1000:
+                db[DIRECTORY].bulk_write(ops, ordered=False)
+                changed += len(ops)
+                ops = []
+    if ops:
+        db[DIRECTORY].bulk_write(ops, ordered=False)
+        changed += len(ops)
+    # Entries left over point at no account we saw; re-check each before removing it, since an
+    # account may have been created after its collection was read.
+    orphans = [
+        entry["_id"] for entry in existing.values()
+        if entry.get("collection") not in ROLE_COLLECTIONS
+        or db[entry["collection"]].find_one({"_id": entry["_id"]}, {"_id": 1}) is None
+    ]
+    if orphans:
+        changed += db[DIRECTORY].delete_many({"_id": {"$in": orphans}}).deleted_count
+    if changed:
+        _cache.clear()
+    return changed
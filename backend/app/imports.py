@@ -0,0 +1,138 @@
+"""
+Bulk import of academic indicators into existing enrollments from CSV or NDJSON uploads.
+
+Each row names an enrollment (`class_id`, `student_email`) and any of the fields
+PATCH /api/classes/{class_id}/students/{email} accepts (gpa, attendance, lms_activity, risk,
+flagged_for_mentoring, term, outcome); empty CSV cells leave a field unchanged. CSV needs a
+header row; both formats are read one line at a time, so quoted CSV cells cannot span lines.
+
+The upload is parsed while it streams in and handled CHUNK_ROWS rows at a time: rows are
+validated with the same schema as the single-enrollment update and written with
+enrollment_updates.update_many() (one query for the chunk's enrollments, one unordered
+bulk_write, bookkeeping once per chunk). Rows that fail are reported by line number and never
+stop the import.
+"""
+import codecs
+import csv
+import json
+
+from bson import ObjectId
+from pydantic import ValidationError
+
+from app import enrollment_updates
+from app.schemas import UpdateEnrollmentRequest
+
+CHUNK_ROWS = 5000
+MAX_REPORTED_ERRORS = 1000
+FORMATS = ("csv", "ndjson")
+KEY_FIELDS = ("class_id", "student_email")
+
+
+async def lines(stream):
+    """Decoded text lines of a byte stream, yielded as they arrive."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in stream:
+        pending += decoder.decode(chunk)
+        *complete, pending = pending.split("\n")
+        for line in complete:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending.strip():
+        yield pending.rstrip("\r")
+
+
+class EnrollmentImport:
+    """Accumulates parsed rows and applies them chunk by chunk; holds the running report."""
+
+    def __init__(self, db, fmt: str):
+        self.db = db
+        self.fmt = fmt
+        self.header: list[str] | None = None
+        self.rows = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors: list[dict] = []
+        self._known_classes: set[str] = set()
+
+    def error(self, line: int, message: str):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def parse(self, line_no: int, line: str) -> dict | None:
+        """Raw field values of one line, or None for blank lines and the CSV header."""
+        if not line.strip():
+            return None
+        if self.fmt == "csv" and self.header is None:
+            self.header = [cell.strip() for cell in next(csv.reader([line]))]
+            if not set(KEY_FIELDS) <= set(self.header):
+                raise ValueError("CSV header must include class_id and student_email.")
+            return None
+        self.rows += 1
+        if self.fmt == "ndjson":
+            try:
+                values = json.loads(line)
+            except ValueError:
+                self.error(line_no, "Invalid JSON.")
+                return None
+            if not isinstance(values, dict):
+                self.error(line_no, "Expected a JSON object.")
+                return None
+            return values
+        cells = next(csv.reader([line]))
+        return {name: cell.strip() for name, cell in zip(self.header, cells) if cell.strip()}
+
+    def _validate(self, line_no: int, values: dict):
+        class_id = str(values.pop("class_id", "") or "").strip()
+        email = str(values.pop("student_email", "") or "").strip().lower()
+        if not class_id or not email:
+            self.error(line_no, "class_id and student_email are required.")
+            return None
+        try:
+            body = UpdateEnrollmentRequest.model_validate(values)
+        except ValidationError as e:
+            first = e.errors()[0]
+            self.error(line_no, f"{'.'.join(str(p) for p in first['loc'])}: {first['msg']}")
+            return None
+        payload = body.model_dump(exclude_unset=True)
+        if not payload:
+            self.error(line_no, "No fields to update.")
+            return None
+        return class_id, email, payload
+
+    def _check_classes(self, class_ids: set[str]) -> set[str]:
+        unknown = [cid for cid in class_ids - self._known_classes if ObjectId.is_valid(cid)]
+        if unknown:
+            found = self.db.classes.find({"_id": {"$in": [ObjectId(cid) for cid in unknown]}}, {"_id": 1})
+            self._known_classes.update(str(doc["_id"]) for doc in found)
+        return class_ids & self._known_classes
+
+    def apply(self, chunk: list[tuple[int, dict]]):
+        """Validate and write one chunk of (line number, raw values) rows."""
+        # later rows for the same enrollment override earlier ones
+        merged: dict[tuple[str, str], tuple[list[int], dict]] = {}
+        for line_no, values in chunk:
+            valid = self._validate(line_no, values)
+            if valid is None:
+                continue
+            class_id, email, payload = valid
+            line_nos, combined = merged.setdefault((class_id, email), ([], {}))
+            line_nos.append(line_no)
+            combined.update(payload)
+        if not merged:
+            return
+        classes = self._check_classes({cid for cid, _ in merged})
+        for key, (line_nos, _) in list(merged.items()):
+            if key[0] not in classes:
+                for line_no in line_nos:
+                    self.error(line_no, "Class not found.")
+                del merged[key]
+        updated, missing = enrollment_updates.update_many(self.db, {key: payload for key, (_, payload) in merged.items()})
+        self.updated += updated
+        for key in missing:
+            for line_no in merged[key][0]:
+                self.error(line_no, "Student not enrolled in this class.")
+
+    def report(self) -> dict:
+        return {"rows": self.rows, "updated": self.updated, "error_count": self.error_count, "errors": self.errors}
@@ -0,0 +1,201 @@
+"""
+Index manager: declares the indexes every router relies on and reconciles them at startup.
+
+Each entry in INDEXES is (collection, keys, options). ensure_indexes() creates missing
+indexes, rebuilds declared indexes whose options drifted, and reports (but never drops)
+indexes that exist in MongoDB without being declared here.
+"""
+import time
+
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+
+from app.database import ROLE_COLLECTIONS
+
+# (collection, keys, options). Options may include unique / sparse / name.
+INDEXES = [
+    # Enrollments: one row per (class, student); duplicates are rejected by the index.
+    ("enrollments", [("class_id", ASCENDING), ("student_email", ASCENDING)], {"unique": True}),
+    ("enrollments", [("class_id", ASCENDING), ("risk", ASCENDING)], {}),
+    ("enrollments", [("student_email", ASCENDING)], {}),
+    # Model evaluation (app/evaluation.py): enrollments written since the last run, by term.
+    ("enrollments", [("updated_at", ASCENDING)], {"sparse": True}),
+    ("enrollments", [("term", ASCENDING), ("outcome", ASCENDING)], {"sparse": True}),
+    # Classes: instructor dashboards list classes sorted by subject code.
+    ("classes", [("instructor_id", ASCENDING), ("subject_code", ASCENDING)], {}),
+    # Students / interventions / notifications list filters, paged by _id.
+    ("students", [("risk", ASCENDING), ("_id", ASCENDING)], {}),
+    ("students", [("search_terms", ASCENDING)], {}),
+    ("interventions", [("status", ASCENDING), ("_id", ASCENDING)], {}),
+    ("notifications", [("role", ASCENDING), ("_id", ASCENDING)], {}),
+    ("notifications", [("role", ASCENDING), ("instructor_id", ASCENDING), ("_id", ASCENDING)], {}),
+    # Identity directory (app/identity.py): account lookup by email or emailed token.
+    ("identities", [("email", ASCENDING)], {}),
+    ("identities", [("email_verification_token", ASCENDING)], {"sparse": True}),
+    ("identities", [("password_reset_token", ASCENDING)], {"sparse": True}),
+    # Overview rollups (app/rollups.py): class rollups by instructor, departments by name.
+    ("rollups", [("kind", ASCENDING), ("instructor_id", ASCENDING)], {}),
+    ("rollups", [("kind", ASCENDING), ("department", ASCENDING)], {}),
+    # Risk history (app/risk_history.py): trend range queries per rollup.
+    ("risk_snapshots", [("meta.key", ASCENDING), ("ts", ASCENDING)], {}),
+    ("evaluation_results", [("department", ASCENDING), ("term", ASCENDING)], {}),
+]
+
+# Role collections (instructor, admin, amustaff): login by email, status filter, token links.
+for _coll in ROLE_COLLECTIONS:
+    INDEXES.extend([
+        (_coll, [("email", ASCENDING)], {}),
+        (_coll, [("status", ASCENDING), ("_id", ASCENDING)], {}),
+        (_coll, [("department", ASCENDING)], {}),
+        (_coll, [("search_terms", ASCENDING)], {}),
+        (_coll, [("email_verification_token", ASCENDING)], {"sparse": True}),
+        (_coll, [("password_reset_token", ASCENDING)], {"sparse": True}),
+    ])
+
+# Options compared when checking an existing index against its declaration.
+_COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+
+def _index_name(keys) -> str:
+    """Default MongoDB index name for a key list, e.g. class_id_1_student_email_1."""
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+
+def _normalize_key(keys) -> list:
+    """Key spec as [(field, direction)]; the shell stores numeric directions as doubles."""
+    return [(f, int(d) if isinstance(d, (int, float)) else d) for f, d in keys]
+
+
+def _options_match(existing: dict, options: dict) -> bool:
+    for opt in _COMPARED_OPTIONS:
+        want = options.get(opt)
+        have = existing.get(opt)
+        # unique/sparse default to False when absent
+        if opt in ("unique", "sparse"):
+            want, have = bool(want), bool(have)
+        if want != have:
+            return False
+    return True
+
+
+def _has_duplicates(coll, keys, options: dict) -> bool:
+    """Whether `coll` holds documents a unique index on `keys` (with these options) would reject."""
+    fields = [f for f, _ in keys]
+    if options.get("partialFilterExpression"):
+        match = options["partialFilterExpression"]
+    elif options.get("sparse"):
+        match = {"$or": [{f: {"$exists": True}} for f in fields]}
+    else:
+        match = {}
+    pipeline = [
+        {"$match": match},
+        {"$group": {"_id": {f.replace(".", "_"): f"${f}" for f in fields}, "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}},
+        {"$limit": 1},
+    ]
+    return bool(list(coll.aggregate(pipeline, allowDiskUse=True)))
+
+
+def _restore(coll, name: str, existing: dict):
+    """Recreate an index from its index_information() entry."""
+    options = {opt: existing[opt] for opt in _COMPARED_OPTIONS if opt in existing}
+    coll.create_index(_normalize_key(existing["key"]), name=name, **options)
+
+
+def check_indexes(db) -> dict:
+    """Compare declared indexes against MongoDB without changing anything.
+
+    Returns {"missing": [...], "drifted": [...], "undeclared": [...]} with entries of the
+    form "collection.index_name".
+    """
+    report = {"missing": [], "drifted": [], "undeclared": []}
+    declared_by_coll: dict[str, set] = {}
+    existing_by_coll: dict[str, dict] = {}
+    for coll_name, keys, options in INDEXES:
+        name = options.get("name") or _index_name(keys)
+        declared_by_coll.setdefault(coll_name, set()).add(name)
+        if coll_name not in existing_by_coll:
+            existing_by_coll[coll_name] = db[coll_name].index_information()
+        existing = existing_by_coll[coll_name].get(name)
+        if existing is None:
+            report["missing"].append(f"{coll_name}.{name}")
+        elif _normalize_key(existing.get("key", [])) != _normalize_key(keys) or not _options_match(existing, options):
+            report["drifted"].append(f"{coll_name}.{name}")
+    for coll_name, existing in existing_by_coll.items():
+        for name in existing:
+            if name != "_id_" and name not in declared_by_coll[coll_name]:
+                report["undeclared"].append(f"{coll_name}.{name}")
+    return report
+
+
+def ensure_indexes(db, log=print) -> dict:
+    """Create missing indexes and rebuild drifted ones. Undeclared indexes are only reported.
+
+    Progress is written through `log` as each index is built. Returns the drift report
+    taken before reconciling plus a list of indexes that failed to build (e.g. a unique
+    index over data that still contains duplicates).
+
+    MongoDB cannot hold two indexes with the same name, so a drifted index is dropped before
+    its replacement is built. A unique replacement is only attempted when the data has no
+    duplicates, and if the build still fails the old index is recreated, so a failed rebuild
+    never leaves the collection without the index.
+    """
+    report = check_indexes(db)
+    todo = set(report["missing"]) | set(report["drifted"])
+    report["built"] = []
+    report["failed"] = []
+    if report["undeclared"]:
+        log(f"[Indexes] Undeclared indexes (left in place): {', '.join(report['undeclared'])}")
+    if not todo:
+        log(f"[Indexes] All {len(INDEXES)} declared indexes present.")
+        return report
+    pending = [(c, k, o) for c, k, o in INDEXES if f"{c}.{o.get('name') or _index_name(k)}" in todo]
+    for step, (coll_name, keys, options) in enumerate(pending, start=1):
+        name = options.get("name") or _index_name(keys)
+        qualified = f"{coll_name}.{name}"
+        log(f"[Indexes] ({step}/{len(pending)}) building {qualified} ...")
+        started = time.monotonic()
+        coll = db[coll_name]
+        previous = coll.index_information().get(name) if qualified in report["drifted"] else None
+        try:
+            if previous is not None:
+                if options.get("unique") and _has_duplicates(coll, keys, options):
+                    raise OperationFailure("duplicate keys; existing index kept")
+                coll.drop_index(name)
+            try:
+                coll.create_index(keys, name=name, **{k: v for k, v in options.items() if k != "name"})
+            except OperationFailure:
+                if previous is not None:
+                    _restore(coll, name, previous)
+                raise
+        except OperationFailure as e:
+            report["failed"].append({"index": qualified, "error": str(e)})
+            log(f"[Indexes] ({step}/{len(pending)}) FAILED {qualified}: {e}")
+            continue
+        report["built"].append(qualified)
+        log(f"[Indexes] ({step}/{len(pending)}) built {qualified} in {time.monotonic() - started:.2f}s")
+    return report
+
+
+def index_builds_in_progress(db) -> list[dict]:
+    """Index builds currently running on the server for this database, with progress if reported."""
+    try:
+        cursor = db.client.admin.aggregate([
+            {"$currentOp": {"allUsers": True, "idleConnections": False}},
+            {"$match": {"command.createIndexes": {"$exists": True}, "ns": {"$regex": f"^{db.name}\\."}}},
+        ])
+    except OperationFailure:
+        # $currentOp needs the inprog privilege; report nothing rather than fail the caller.
+        return []
+    builds = []
+    for op in cursor:
+        progress = op.get("progress") or {}
+        done, total = progress.get("done"), progress.get("total")
+        builds.append({
+            "ns": op.get("ns", ""),
+            "indexes": [ix.get("name") for ix in op.get("command", {}).get("indexes", [])],
+            "msg": op.get("msg", ""),
+            "percent": round(100 * done / total, 1) if done is not None and total else None,
+            "secs_running": op.get("secs_running", 0),
+        })
+    return builds
@@ -0,0 +1,115 @@
+"""
+Vectorized statistics for the academic indicators stored on enrollments (gpa, attendance,
+lms_activity).
+
+Every enrollment is loaded once into NumPy columns: one float array per indicator (NaN where
+missing), an int8 risk code and an int32 class code. The arrays are cached per process and
+reused until the data version of enrollments / classes changes (app/data_version.py), so a
+request only builds a boolean mask for its scope and runs array reductions over it.
+"""
+import threading
+
+import numpy as np
+from bson.decimal128 import Decimal128
+
+from app import data_version
+
+INDICATORS = ("gpa", "attendance", "lms_activity")
+RISK_CODES = {"Low": 0, "Medium": 1, "High": 2}
+PERCENTILES = (10, 25, 50, 75, 90)
+_DEPENDENCIES = (data_version.ENROLLMENTS, data_version.CLASSES)
+
+
+def to_float(value) -> float:
+    """An indicator value as a float, NaN unless it is stored as a number. Numeric strings and
+    booleans count as missing, the same rule as $isNumber in scoring.risk_update_stages()."""
+    if isinstance(value, Decimal128):
+        return float(value.to_decimal())
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return np.nan
+    return float(value)
+
+
+class IndicatorArrays:
+    """Column arrays for every enrollment, plus the class id ↔ class code mapping."""
+
+    def __init__(self, class_index: dict[str, int], class_codes, values: dict, risk):
+        self.class_index = class_index
+        self.class_codes = class_codes
+        self.values = values
+        self.risk = risk
+
+    def mask_for(self, class_ids) -> np.ndarray:
+        codes = [self.class_index[cid] for cid in class_ids if cid in self.class_index]
+        return np.isin(self.class_codes, np.asarray(codes, dtype=np.int32))
+
+
+def load(db) -> IndicatorArrays:
+    class_index: dict[str, int] = {}
+    class_codes, risk = [], []
+    columns = {name: [] for name in INDICATORS}
+    projection = {"_id": 0, "class_id": 1, "risk": 1, **{name: 1 for name in INDICATORS}}
+    for doc in db.enrollments.find({}, projection, batch_size=10_000):
+        class_codes.append(class_index.setdefault(doc.get("class_id"), len(class_index)))
+        risk.append(RISK_CODES.get(doc.get("risk"), -1))
+        for name in INDICATORS:
+            columns[name].append(to_float(doc.get(name)))
+    return IndicatorArrays(
+        class_index,
+        np.asarray(class_codes, dtype=np.int32),
+        {name: np.asarray(values, dtype=np.float64) for name, values in columns.items()},
+        np.asarray(risk, dtype=np.int8),
+    )
+
+
+_lock = threading.Lock()
+_cached: tuple[str, IndicatorArrays] | None = None
+
+
+def arrays(db) -> IndicatorArrays:
+    """Cached arrays, reloaded when enrollments or classes changed since they were built."""
+    global _cached
+    stamp = data_version.stamp(db, _DEPENDENCIES)
+    with _lock:
+        if _cached is None or _cached[0] != stamp:
+            _cached = (stamp, load(db))
+        return _cached[1]
+
+
+def _summary(x: np.ndarray, risk: np.ndarray, bins: int) -> dict:
+    if x.size == 0:
+        return {"count": 0}
+    counts, edges = np.histogram(x, bins=bins)
+    percentiles = np.percentile(x, PERCENTILES)
+    by_risk = {}
+    for level, code in RISK_CODES.items():
+        selected = x[risk == code]
+        by_risk[level] = round(float(selected.mean()), 4) if selected.size else None
+    labeled = risk >= 0
+    correlation = None
+    if labeled.sum() > 1 and x[labeled].std() > 0 and risk[labeled].std() > 0:
+        correlation = round(float(np.corrcoef(x[labeled], risk[labeled])[0, 1]), 4)
+    return {
+        "count": int(x.size),
+        "mean": round(float(x.mean()), 4),
+        "std": round(float(x.std()), 4),
+        "min": float(x.min()),
+        "max": float(x.max()),
+        "percentiles": {f"p{p}": round(float(v), 4) for p, v in zip(PERCENTILES, percentiles)},
+        "histogram": {"edges": [round(float(e), 4) for e in edges], "counts": counts.tolist()},
+        "mean_by_risk": by_risk,
+        # Pearson correlation with risk level (Low=0, Medium=1, High=2), labeled enrollments only
+        "risk_correlation": correlation,
+    }
+
+
+def summarize(data: IndicatorArrays, class_ids, bins: int = 10) -> dict:
+    """Per-indicator statistics over the enrollments of the given classes."""
+    mask = data.mask_for(class_ids)
+    risk = data.risk[mask]
+    out = {"enrollments": int(mask.sum())}
+    for name in INDICATORS:
+        values = data.values[name][mask]
+        present = ~np.isnan(values)
+        out[name] = _summary(values[present], risk[present], bins)
+    return out
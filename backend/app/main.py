@@ -1,13 +1,24 @@
+import asyncio
 import os
 from contextlib import asynccontextmanager
 from pathlib import Path
 
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from pymongo.errors import PyMongoError, ServerSelectionTimeoutError
 
-from app.database import get_db
-from app.routers import auth, users, students, interventions, notifications, classes, admin
+from app.class_counters import backfill as backfill_class_counters
+from app.database import close_clients, get_db, use_async_driver
+from app.evaluation import evaluation_loop
+from app.identity import sync_directory
+from app.indexes import ensure_indexes
+from app.monitoring import pool_stats, start_counting
+from app.risk_alerts import alert_loop, drain as drain_risk_alerts
+from app.risk_history import ensure_snapshot_collection, snapshot_loop
+from app.rollups import sync_rollups
+from app.search import backfill_search_terms
+from app.routers import auth, users, students, interventions, notifications, classes, classes_async, admin
 
 # Load .env from backend directory so SMTP and other config work regardless of cwd
 _backend_dir = Path(__file__).resolve().parent.parent
@@ -16,7 +27,28 @@ load_dotenv(_backend_dir / ".env")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    get_db()
+    db = get_db()
+    # Declare/reconcile indexes the routers rely on, then bring derived data up to date. Each
+    # step is guarded on its own so one failure does not skip the rest.
+    steps = [
+        ("Snapshots", ensure_snapshot_collection, None),
+        ("Indexes", ensure_indexes, None),
+        ("Search", backfill_search_terms, "Added search keys to {} existing documents."),
+        ("Identity", sync_directory, "Updated identity directory ({} accounts)."),
+        ("Rollups", sync_rollups, "Built overview rollups ({} documents)."),
+        ("Classes", backfill_class_counters, "Counted enrollments for {} classes."),
+    ]
+    for tag, step, message in steps:
+        try:
+            result = step(db)
+        except ServerSelectionTimeoutError:
+            print(f"[{tag}] Skipped: database unavailable; remaining startup steps skipped.")
+            break
+        except PyMongoError as e:
+            print(f"[{tag}] Failed: {e.__class__.__name__}: {e}")
+            continue
+        if message and result:
+            print(f"[{tag}] {message.format(result)}")
     # Confirm SMTP from .env is connected for verification emails
     smtp_user = (os.getenv("SMTP_USER") or "").strip()
     smtp_pass = (os.getenv("SMTP_PASSWORD") or "").strip()
@@ -25,7 +57,22 @@ async def lifespan(app: FastAPI):
         print(f"[SMTP] Connected for verification emails: {smtp_user} via {host}")
     else:
         print("[SMTP] Not configured. Set SMTP_USER and SMTP_PASSWORD in backend/.env to send verification emails.")
+    print(f"[DB] Driver: {'async (motor)' if use_async_driver() else 'sync (pymongo)'}")
+    # Daily risk snapshots for the trend charts
+    snapshots = asyncio.create_task(snapshot_loop(get_db))
+    # Notifications for risk escalations queued by enrollment writes
+    alerts = asyncio.create_task(alert_loop(get_db))
+    # Model evaluation against recorded outcomes, kept off the GET routes
+    evaluations = asyncio.create_task(evaluation_loop(get_db))
     yield
+    snapshots.cancel()
+    alerts.cancel()
+    evaluations.cancel()
+    try:
+        drain_risk_alerts(get_db())
+    except PyMongoError:
+        pass
+    close_clients()
 
 
 app = FastAPI(
@@ -41,11 +88,25 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing", "X-DB-Commands"],
 )
 
+
+@app.middleware("http")
+async def count_db_commands(request: Request, call_next):
+    """Expose the number of MongoDB commands a request issued (X-DB-Commands) to catch N+1 queries."""
+    counter = start_counting()
+    response = await call_next(request)
+    response.headers["X-DB-Commands"] = str(counter.count)
+    return response
+
+
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(users.router, prefix="/api/users", tags=["users"])
 app.include_router(students.router, prefix="/api/students", tags=["students"])
+if use_async_driver():
+    # Registered first so its async read routes take precedence over the sync ones.
+    app.include_router(classes_async.router, prefix="/api/classes", tags=["classes"])
 app.include_router(classes.router, prefix="/api/classes", tags=["classes"])
 app.include_router(interventions.router, prefix="/api/interventions", tags=["interventions"])
 app.include_router(notifications.router, prefix="/api/notifications", tags=["notifications"])
@@ -55,3 +116,9 @@ app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
 @app.get("/api/health")
 def health():
     return {"status": "ok"}
+
+
+@app.get("/api/health/db")
+def health_db():
+    """Connection pool statistics per MongoDB server (checked-out connections, checkout wait times)."""
+    return {"pools": pool_stats()}
@@ -0,0 +1,180 @@
+"""
+MongoDB driver monitoring: per-request command counting and connection pool statistics.
+
+A pymongo CommandListener increments the counter bound to the current request, and the
+HTTP middleware in main.py reports it in the X-DB-Commands response header;
+scripts/check_query_counts.py asserts the counts stay flat as data grows. This makes
+N+1 query patterns visible: an endpoint whose header grows with the number of classes
+(or students) is issuing one query per row.
+
+A ConnectionPoolListener keeps per-server pool counters (open / checked-out connections,
+checkout waits and failures) that /api/health/db reports for monitoring.
+"""
+import contextvars
+import functools
+import threading
+import time
+from contextvars import ContextVar
+
+from pymongo import monitoring
+
+
+class CommandCounter:
+    """Mutable counter shared between the request context and the threadpool running the route."""
+
+    def __init__(self):
+        self.count = 0
+        self.commands: dict[str, int] = {}
+        # listener callbacks of one request can run on several threads at once
+        self._lock = threading.Lock()
+
+    def record(self, command_name: str):
+        with self._lock:
+            self.count += 1
+            self.commands[command_name] = self.commands.get(command_name, 0) + 1
+
+
+_current_counter: ContextVar[CommandCounter | None] = ContextVar("db_command_counter", default=None)
+
+
+def start_counting() -> CommandCounter:
+    """Bind a fresh counter to the current context (one per HTTP request)."""
+    counter = CommandCounter()
+    _current_counter.set(counter)
+    return counter
+
+
+def current_counter() -> CommandCounter | None:
+    return _current_counter.get()
+
+
+def propagate_to_motor():
+    """Run Motor's thread-pool calls in a copy of the caller's context.
+
+    Motor issues every command from its own executor threads, which (unlike Starlette's
+    threadpool) do not inherit contextvars in every Motor release, so the async routes would
+    always report zero commands. Safe to call more than once."""
+    from motor.frameworks import asyncio as motor_asyncio
+
+    run = motor_asyncio.run_on_executor
+    if getattr(run, "copies_context", False):
+        return
+
+    def run_on_executor(loop, fn, *args, **kwargs):
+        return run(loop, functools.partial(contextvars.copy_context().run, fn), *args, **kwargs)
+
+    run_on_executor.copies_context = True
+    motor_asyncio.run_on_executor = run_on_executor
+
+
+class _CommandCountListener(monitoring.CommandListener):
+    def started(self, event):
+        counter = _current_counter.get()
+        if counter is not None:
+            counter.record(event.command_name)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+command_listener = _CommandCountListener()
+
+
+class _PoolStats:
+    def __init__(self):
+        self.open = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "open_connections": self.open,
+            "checked_out": self.checked_out,
+            "max_checked_out": self.max_checked_out,
+            "checkouts": self.checkouts,
+            "checkout_failures": self.checkout_failures,
+            "wait_ms_avg": round(1000 * self.wait_seconds_total / self.checkouts, 3) if self.checkouts else 0,
+            "wait_ms_max": round(1000 * self.wait_seconds_max, 3),
+        }
+
+
+class _PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Aggregates connection pool events per server address."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: dict[str, _PoolStats] = {}
+        self._waiting = threading.local()
+
+    def _for(self, address) -> _PoolStats:
+        key = f"{address[0]}:{address[1]}" if isinstance(address, tuple) else str(address)
+        if key not in self._stats:
+            self._stats[key] = _PoolStats()
+        return self._stats[key]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {address: stats.as_dict() for address, stats in self._stats.items()}
+
+    def connection_check_out_started(self, event):
+        self._waiting.started = time.monotonic()
+
+    def connection_checked_out(self, event):
+        started = getattr(self._waiting, "started", None)
+        waited = time.monotonic() - started if started is not None else 0.0
+        with self._lock:
+            stats = self._for(event.address)
+            stats.checked_out += 1
+            stats.max_checked_out = max(stats.max_checked_out, stats.checked_out)
+            stats.checkouts += 1
+            stats.wait_seconds_total += waited
+            stats.wait_seconds_max = max(stats.wait_seconds_max, waited)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self._for(event.address).checkout_failures += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            stats = self._for(event.address)
+            stats.checked_out = max(0, stats.checked_out - 1)
+
+    def connection_created(self, event):
+        with self._lock:
+            self._for(event.address).open += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            stats = self._for(event.address)
+            stats.open = max(0, stats.open - 1)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._stats.pop(f"{event.address[0]}:{event.address[1]}", None)
+
+    def connection_ready(self, event):
+        pass
+
+
+pool_listener = _PoolStatsListener()
+
+
+def pool_stats() -> dict:
+    """Connection pool counters per server address."""
+    return pool_listener.snapshot()
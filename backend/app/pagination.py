@@ -0,0 +1,109 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+List endpoints accept `limit` and `after`. Without `limit` they return every row, as before.
+With `limit` they return at most that many rows and, when more remain, an opaque cursor in the
+X-Next-Cursor response header; pass it back as `after` to get the next page. Cursors encode the
+sort-key values of the last row returned, so each page is an indexed range scan rather than a
+skip over everything before it.
+"""
+import base64
+import binascii
+
+from bson import json_util
+from bson.errors import InvalidId
+from fastapi import HTTPException, Query, Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = 1000
+
+# Shared query parameters so every list endpoint documents paging the same way.
+LimitParam = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size. Omit to return all rows.")
+AfterParam = Query(None, description="Cursor from the previous page's X-Next-Cursor header.")
+
+
+def encode_cursor(values: list) -> str:
+    """Opaque URL-safe token for the sort-key values of the last row on a page."""
+    raw = json_util.dumps(values).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, size: int) -> list:
+    """Sort-key values from a cursor token. Raises 400 if the token is malformed."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json_util.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (binascii.Error, ValueError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor.")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor.")
+    return values
+
+
+def keyset_filter(fields: list[str], values: list) -> dict:
+    """Filter for rows strictly after `values` in ascending (fields...) order.
+
+    For fields (a, b) this is {"$or": [{a: {"$gt": va}}, {a: va, b: {"$gt": vb}}]}.
+    """
+    clauses = []
+    for i, field in enumerate(fields):
+        clause = {f: values[j] for j, f in enumerate(fields[:i])}
+        clause[field] = {"$gt": values[i]}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def and_filters(*filters: dict) -> dict:
+    """Combine query filters, skipping empty ones."""
+    parts = [f for f in filters if f]
+    if not parts:
+        return {}
+    return parts[0] if len(parts) == 1 else {"$and": parts}
+
+
+def paginate_find(collection, query: dict, fields: list[str], limit: int | None, after: str | None,
+                  response: Response, projection: dict | None = None) -> list:
+    """Run collection.find(query) in ascending `fields` order, one page at a time.
+
+    Returns the page's documents and sets X-Next-Cursor on `response` when more rows remain.
+    With neither limit nor after the query runs unsorted and returns everything, as before.
+    """
+    if limit is None and not after:
+        return list(collection.find(query, projection))
+    if after:
+        query = and_filters(query, keyset_filter(fields, decode_cursor(after, len(fields))))
+    cursor = collection.find(query, projection).sort([(f, 1) for f in fields])
+    if limit is None:
+        return list(cursor)
+    docs = list(cursor.limit(limit + 1))
+    return page_result(docs, limit, lambda d: [d[f] for f in fields], response)
+
+
+def page_result(rows: list, limit: int | None, key, response: Response) -> list:
+    """Trim rows fetched with limit + 1 to `limit` and set the next cursor from the last kept row."""
+    if limit is None or len(rows) <= limit:
+        return rows
+    rows = rows[:limit]
+    response.headers[NEXT_CURSOR_HEADER] = encode_cursor(key(rows[-1]))
+    return rows
+
+
+def paginate_find_many(db, collection_names: list[str], query: dict, limit: int | None, after: str | None,
+                       response: Response, projection: dict | None = None) -> list[tuple]:
+    """paginate_find over several collections (e.g. the role collections), paged by _id.
+
+    Returns (doc, collection_name) pairs. Each collection contributes at most limit + 1 rows
+    to the merge, so a page costs one bounded query per collection.
+    """
+    if limit is None and not after:
+        return [(doc, name) for name in collection_names for doc in db[name].find(query, projection)]
+    if after:
+        query = and_filters(query, keyset_filter(["_id"], decode_cursor(after, 1)))
+    found = []
+    for name in collection_names:
+        cursor = db[name].find(query, projection).sort("_id", 1)
+        if limit is not None:
+            cursor = cursor.limit(limit + 1)
+        found.extend((doc, name) for doc in cursor)
+    found.sort(key=lambda pair: pair[0]["_id"])
+    return page_result(found, limit, lambda pair: [pair[0]["_id"]], response)
@@ -0,0 +1,90 @@
+"""
+Query projections derived from the response models, plus the raw BSON pass-through used by
+hot list endpoints.
+
+Routers fetch only the fields their response model returns (never password_hash or
+search_terms), so less data crosses the wire and less is decoded per row.
+
+Hot list endpoints also honour `Accept: application/bson`: rows shaped by the query are
+streamed to the client as the raw batches the server returned (or, for a page that needs its
+last row inspected, as RawBSONDocument bytes), skipping BSON decoding, dict copies and JSON
+encoding entirely. The query drops null fields itself (present()), so both formats return the
+same fields. JSON remains the default.
+"""
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from app.schemas import (
+    ClassResponse,
+    InterventionResponse,
+    NotificationResponse,
+    StudentResponse,
+    UserResponse,
+)
+
+BSON_MEDIA_TYPE = "application/bson"
+_RAW_CODEC = CodecOptions(document_class=RawBSONDocument)
+
+
+def projection_for(model, *extra: str, exclude: tuple = ("id",)) -> dict:
+    """Inclusion projection for the stored fields of a response model (`id` comes from _id)."""
+    fields = {name: 1 for name in model.model_fields if name not in exclude}
+    fields.update({name: 1 for name in extra})
+    return fields
+
+
+STUDENT = projection_for(StudentResponse)
+INTERVENTION = projection_for(InterventionResponse)
+NOTIFICATION = projection_for(NotificationResponse)
+# role is derived from the collection when absent, so it is fetched but not required
+USER = projection_for(UserResponse)
+CLASS = projection_for(ClassResponse, exclude=("id", "student_count", "at_risk_count"))
+# with the enrollment counters kept on the class (app/class_counters.py)
+CLASS_WITH_COUNTS = {**CLASS, "student_count": 1, "risk_counts": 1}
+INSTRUCTOR_SUMMARY = {"name": 1, "email": 1, "department": 1}
+ENROLLMENT_ROW = {
+    "_id": 0,
+    "student_email": 1,
+    "risk": 1,
+    "gpa": 1,
+    "attendance": 1,
+    "lms_activity": 1,
+    "flagged_for_mentoring": 1,
+}
+ID_ONLY = {"_id": 1}
+
+
+def wants_bson(request: Request) -> bool:
+    return BSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def raw(collection):
+    """The same collection, returning RawBSONDocument rows (no decoding until accessed)."""
+    return collection.with_options(codec_options=_RAW_CODEC)
+
+
+def bson_response(cursor, headers: dict | None = None) -> StreamingResponse:
+    """Stream each RawBSONDocument's bytes back-to-back (a BSON document sequence)."""
+    return StreamingResponse((doc.raw for doc in cursor), media_type=BSON_MEDIA_TYPE, headers=headers)
+
+
+def bson_batches_response(batches, headers: dict | None = None) -> StreamingResponse:
+    """Stream the batches of a find_raw_batches()/aggregate_raw_batches() cursor as they arrive;
+    each batch is already a BSON document sequence."""
+    return StreamingResponse(batches, media_type=BSON_MEDIA_TYPE, headers=headers)
+
+
+def present(path: str) -> dict:
+    """$project expression for a field that is left out when missing or null, like without_nulls()."""
+    return {"$ifNull": [path, "$$REMOVE"]}
+
+
+def present_fields(projection: dict) -> dict:
+    """$project stage body for an inclusion projection whose null fields are left out."""
+    return {name: present(f"${name}") if value == 1 else value for name, value in projection.items()}
+
+
+def without_nulls(doc) -> dict:
+    return {k: v for k, v in doc.items() if v is not None}
@@ -0,0 +1,298 @@
+"""
+Institution report rows, constant-memory CSV encoding and cached report artifacts for
+/api/admin/reports.
+
+report_source() resolves a report id to its file name, CSV columns and a lazy row iterator
+that reads straight from a MongoDB cursor. csv_chunks() encodes rows into ~64 KB chunks and
+gzip_chunks() optionally compresses them on the fly, so memory use stays flat however many
+rows a report has.
+
+artifact() returns the report as a CSV file under REPORTS_DIR named by the data version of
+the collections it reads (app/data_version.py). A missing artifact is generated by a job in
+a small worker pool (REPORT_WORKERS); concurrent requests for the same artifact share one
+job, and an unchanged report is never regenerated.
+"""
+import csv
+import glob
+import os
+import re
+import threading
+import uuid
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from app import data_version, evaluation, rollups, scope
+
+CHUNK_SIZE = 64 * 1024
+AT_RISK_FIELDS = ["student_email", "risk", "department", "course", "instructor"]
+DEPARTMENT_FIELDS = ["department", "total_students", "at_risk", "instructor_count"]
+INTERVENTION_FIELDS = ["student", "department", "course", "type", "status", "instructor", "due", "completed"]
+ACCURACY_FIELDS = ["term", "department", "n", "accuracy", "precision", "recall", "f1", "tp", "fp", "fn", "tn"]
+_ENROLLMENT_RISK = {"student_email": 1, "class_id": 1, "risk": 1}
+
+
+class ReportSource:
+    def __init__(self, filename: str, fields: list[str], rows):
+        self.filename = filename
+        self.fields = fields
+        self.rows = rows
+
+
+def department_slug(department: str) -> str:
+    return department.replace(" ", "-").replace(",", "")
+
+
+def _department_for_slug(db, slug: str) -> str:
+    depts = scope.departments(db)
+    matching = next((d for d in depts if department_slug(d) == slug), None)
+    if not matching:
+        matching = next((d for d in depts if slug.lower() in department_slug(d).lower()), None)
+    return matching or slug.replace("-", " ")
+
+
+def _at_risk_rows(db, scoped):
+    cursor = db.enrollments.find(
+        {"class_id": {"$in": scoped.class_ids}, "risk": {"$in": ["High", "Medium"]}},
+        _ENROLLMENT_RISK,
+        batch_size=1000,
+    )
+    for doc in cursor:
+        c = scoped.classes.get(doc["class_id"])
+        if not c:
+            continue
+        inst = scoped.instructors.get(c.get("instructor_id"))
+        yield {
+            "student_email": doc["student_email"],
+            "risk": doc.get("risk", ""),
+            "department": (inst.get("department") or "") if inst else "",
+            "course": (c.get("subject_code") or "") + " " + (c.get("subject_name") or ""),
+            "instructor": (inst.get("name") or "") if inst else "",
+        }
+
+
+def _department_rows(db):
+    cursor = db[rollups.ROLLUPS].find({"kind": "department", "instructors": {"$gt": 0}}).sort("department", 1)
+    for doc in cursor:
+        yield {
+            "department": doc["department"],
+            "total_students": doc.get("total", 0),
+            "at_risk": doc.get("at_risk", 0),
+            "instructor_count": doc.get("instructors", 0),
+        }
+
+
+def _intervention_rows(db):
+    if "interventions" not in db.list_collection_names():
+        return
+    for doc in db.interventions.find({}, {f: 1 for f in INTERVENTION_FIELDS}, batch_size=1000):
+        yield {f: doc.get(f, "") for f in INTERVENTION_FIELDS}
+
+
+def _accuracy_rows(db):
+    cursor = db[evaluation.RESULTS].find(
+        {"term": {"$exists": True}}, {f: 1 for f in ACCURACY_FIELDS}, batch_size=1000
+    ).sort([("term", 1), ("department", 1)])
+    for doc in cursor:
+        yield {f: doc.get(f, "") for f in ACCURACY_FIELDS}
+
+
+def report_dependencies(report_id: str) -> tuple[str, ...] | None:
+    """Collections a report reads (its data-version inputs), or None if it has no CSV."""
+    if report_id == "interventions":
+        return (data_version.INTERVENTIONS,)
+    if report_id == "ai-accuracy":
+        return (data_version.EVALUATION,)
+    if report_id == "department-performance" or report_id.startswith("at-risk-"):
+        return (data_version.ENROLLMENTS, data_version.CLASSES, data_version.INSTRUCTORS)
+    return None
+
+
+def report_source(db, report_id: str) -> ReportSource | None:
+    """Rows for a downloadable report, or None if the report has no CSV."""
+    if report_id == "at-risk-summary":
+        return ReportSource("at-risk-summary.csv", AT_RISK_FIELDS, _at_risk_rows(db, scope.resolve(db, None)))
+    if report_id.startswith("at-risk-"):
+        department = _department_for_slug(db, report_id.replace("at-risk-", ""))
+        filename = report_id.replace(" ", "-") + ".csv"
+        return ReportSource(filename, AT_RISK_FIELDS, _at_risk_rows(db, scope.resolve(db, department)))
+    if report_id == "department-performance":
+        return ReportSource("department-performance.csv", DEPARTMENT_FIELDS, _department_rows(db))
+    if report_id == "interventions":
+        return ReportSource("interventions.csv", INTERVENTION_FIELDS, _intervention_rows(db))
+    if report_id == "ai-accuracy":
+        return ReportSource("ai-accuracy.csv", ACCURACY_FIELDS, _accuracy_rows(db))
+    return None
+
+
+class _Line:
+    """File-like target that hands back what csv.writer writes instead of storing it."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def csv_chunks(fields: list[str], rows, chunk_size: int = CHUNK_SIZE):
+    """Encode rows as UTF-8 CSV, yielding chunks of about chunk_size bytes."""
+    writer = csv.DictWriter(_Line(), fieldnames=fields)
+    parts = [writer.writeheader()]
+    size = len(parts[0])
+    for row in rows:
+        line = writer.writerow(row)
+        parts.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield "".join(parts).encode("utf-8")
+            parts, size = [], 0
+    if parts:
+        yield "".join(parts).encode("utf-8")
+
+
+def gzip_chunks(chunks):
+    """Gzip a stream of byte chunks incrementally."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+# ----- cached artifacts -----
+
+_DEFAULT_REPORTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "report_cache")
+_executor: ThreadPoolExecutor | None = None
+_jobs: dict[str, Future] = {}
+_jobs_lock = threading.RLock()  # done-callbacks of finished jobs run while it is held
+
+
+def _reports_dir() -> str:
+    # read on use, not at import: main.py loads .env after importing the app modules
+    return os.getenv("REPORTS_DIR", _DEFAULT_REPORTS_DIR)
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    with _jobs_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=int(os.getenv("REPORT_WORKERS", "2")), thread_name_prefix="report")
+        return _executor
+
+
+class Artifact:
+    def __init__(self, path: str, filename: str, version: str):
+        self.path = path
+        self.filename = filename
+        self.version = version
+
+
+def _file_prefix(report_id: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", report_id)
+
+
+def _generate(db, report_id: str, path: str):
+    source = report_source(db, report_id)
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            for chunk in csv_chunks(source.fields, source.rows):
+                f.write(chunk)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    # older versions of this report are superseded (open downloads keep their file handle)
+    pattern = f"{glob.escape(_file_prefix(report_id))}--{'[0-9a-f]' * 16}.csv"
+    for old in glob.glob(os.path.join(os.path.dirname(path), pattern)):
+        if old != path:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+
+def _submit(db, report_id: str, path: str) -> Future:
+    with _jobs_lock:
+        job = _jobs.get(path)
+        if job is None:
+            job = _pool().submit(_generate, db, report_id, path)
+            _jobs[path] = job
+            job.add_done_callback(lambda _: _forget_job(path))
+        return job
+
+
+def _forget_job(path: str):
+    with _jobs_lock:
+        _jobs.pop(path, None)
+
+
+def _artifact_path(db, report_id: str) -> tuple[str, str] | None:
+    dependencies = report_dependencies(report_id)
+    if dependencies is None:
+        return None
+    version = data_version.stamp(db, dependencies)
+    return os.path.join(_reports_dir(), f"{_file_prefix(report_id)}--{version}.csv"), version
+
+
+def artifact(db, report_id: str, wait: bool = True) -> Artifact | None:
+    """Current artifact for a report, generating it in the worker pool if the data changed.
+
+    With wait=False the job is only started; the return value is None until it is ready.
+    Returns None for reports without a CSV.
+    """
+    resolved = _artifact_path(db, report_id)
+    if resolved is None:
+        return None
+    path, version = resolved
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        job = _submit(db, report_id, path)
+        if not wait:
+            return None
+        job.result()
+    return Artifact(path, os.path.basename(path).rsplit("--", 1)[0] + ".csv", version)
+
+
+def file_chunks(path: str, start: int = 0, end: int | None = None, chunk_size: int = CHUNK_SIZE):
+    """Bytes start..end (inclusive) of a file, in chunks. The file is opened immediately, so
+    the download survives the artifact being superseded while it streams."""
+    f = open(path, "rb")
+
+    def read():
+        with f:
+            f.seek(start)
+            remaining = (end if end is not None else os.fstat(f.fileno()).st_size - 1) - start + 1
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    return read()
+
+
+def etag_matches(header: str | None, tags) -> bool:
+    """Whether an If-None-Match header names one of `tags` (unquoted) or is `*`. Entity tags
+    are compared whole, ignoring the weak W/ prefix as If-None-Match requires."""
+    for candidate in (header or "").split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if len(candidate) >= 2 and candidate[0] == candidate[-1] == '"' and candidate[1:-1] in tags:
+            return True
+    return False
+
+
+def parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """(start, end) for a single `bytes=` range header, or None to send the whole file."""
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", (header or "").strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    if match.group(1) == "":
+        start, end = max(0, size - int(match.group(2))), size - 1
+    else:
+        start = int(match.group(1))
+        end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+    return start, end
@@ -0,0 +1,144 @@
+"""
+Risk escalation alerts: notifications when enrollments move up to Medium or High risk.
+
+Writers that change risk labels (update_enrollment, bulk imports, rescoring) call record()
+with the transitions they applied; it only puts them on an in-process queue, so the request
+path never writes notifications itself. drain() empties the queue, coalesces it (one
+net transition per enrollment, then one notification per class for instructors and one summary
+for admins) and writes everything with a single insert_many. alert_loop(), started in main.py,
+drains every RISK_ALERT_INTERVAL_SECONDS (default 10); scripts drain once before exiting.
+"""
+import asyncio
+import os
+import queue
+from collections import defaultdict
+from datetime import datetime
+
+from bson import ObjectId
+
+RANK = {"Low": 0, "Medium": 1, "High": 2}
+_queue: queue.SimpleQueue = queue.SimpleQueue()
+
+
+def _interval_seconds() -> float:
+    return float(os.getenv("RISK_ALERT_INTERVAL_SECONDS", "10"))
+
+
+def _rank(risk) -> int:
+    return RANK.get(risk, 0)
+
+
+def record(transitions):
+    """Queue (class_id, student_email, old_risk, new_risk) transitions. All of them are queued,
+    so a later de-escalation can cancel an earlier escalation when the queue is coalesced."""
+    for transition in transitions:
+        _queue.put(tuple(transition))
+
+
+def _pending() -> list[tuple]:
+    items = []
+    while True:
+        try:
+            items.append(_queue.get_nowait())
+        except queue.Empty:
+            return items
+
+
+def _coalesce(items: list[tuple]) -> dict:
+    """{class_id: {email: (first old risk, last new risk)}}, keeping only net escalations."""
+    net: dict[tuple[str, str], list] = {}
+    for class_id, email, old, new in items:
+        entry = net.setdefault((class_id, email), [old, new])
+        entry[1] = new
+    by_class = defaultdict(dict)
+    for (class_id, email), (old, new) in net.items():
+        if _rank(new) > _rank(old):
+            by_class[class_id][email] = (old, new)
+    return by_class
+
+
+def _course(cls: dict | None) -> str:
+    if not cls:
+        return "a class"
+    return ((cls.get("subject_code") or "") + " " + (cls.get("subject_name") or "")).strip() or "a class"
+
+
+def _classes(db, class_ids) -> dict:
+    """{class_id: class doc} for the queued classes, read fresh so classes created in another
+    worker (or since the scope snapshot) have their owner."""
+    oids = [ObjectId(cid) for cid in class_ids if ObjectId.is_valid(cid)]
+    found = db.classes.find({"_id": {"$in": oids}}, {"instructor_id": 1, "subject_code": 1, "subject_name": 1})
+    return {str(doc["_id"]): doc for doc in found}
+
+
+def _instructor_notification(class_id: str, cls: dict, students: dict, time: str) -> dict:
+    high = [email for email, (_, new) in students.items() if new == "High"]
+    if len(students) == 1:
+        email, (old, new) = next(iter(students.items()))
+        title = f"{email} is now {new} risk"
+        body = f"{_course(cls)}: risk rose from {old or 'unlabeled'} to {new}. Review the student and consider an intervention."
+    else:
+        title = f"{len(students)} students escalated in {cls.get('subject_code') or 'a class'}"
+        body = f"{_course(cls)}: {len(high)} now High risk, {len(students) - len(high)} now Medium risk. Review the class and consider interventions."
+    return {
+        "title": title,
+        "body": body,
+        "type": "alert",
+        "time": time,
+        "read": False,
+        "role": "instructor",
+        "instructor_id": cls["instructor_id"],
+        "class_id": class_id,
+    }
+
+
+def _admin_notification(by_class: dict, time: str) -> dict:
+    students = sum(len(s) for s in by_class.values())
+    high = sum(1 for s in by_class.values() for _, new in s.values() if new == "High")
+    return {
+        "title": f"{students} new at-risk alert{'s' if students != 1 else ''}",
+        "body": f"{high} students rose to High and {students - high} to Medium risk across {len(by_class)} class{'es' if len(by_class) != 1 else ''}.",
+        "type": "alert",
+        "time": time,
+        "read": False,
+        "role": "admin",
+    }
+
+
+def drain(db) -> int:
+    """Write notifications for everything queued so far. Returns notifications written."""
+    items = _pending()
+    by_class = _coalesce(items)
+    if not by_class:
+        return 0
+    try:
+        classes = _classes(db, by_class)
+        time = datetime.utcnow().strftime("%b %d, %Y %H:%M UTC")
+        docs = []
+        for cid, students in by_class.items():
+            cls = classes.get(cid)
+            if not cls or not cls.get("instructor_id"):
+                # no instructor could ever see it; the admin summary still counts these students
+                print(f"[Alerts] No instructor for class {cid}; {len(students)} escalations only in the admin summary.")
+                continue
+            docs.append(_instructor_notification(cid, cls, students, time))
+        docs.append(_admin_notification(by_class, time))
+        db.notifications.insert_many(docs, ordered=False)
+    except Exception:
+        for item in items:  # retried on the next drain
+            _queue.put(item)
+        raise
+    return len(docs)
+
+
+async def alert_loop(get_db):
+    """Drain the queue every RISK_ALERT_INTERVAL_SECONDS (at least once a second)."""
+    interval = max(_interval_seconds(), 1.0)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            written = await asyncio.to_thread(drain, get_db())
+            if written:
+                print(f"[Alerts] Wrote {written} risk notifications.")
+        except Exception as e:  # keep the loop alive across transient database errors
+            print(f"[Alerts] Drain skipped: {e.__class__.__name__}.")
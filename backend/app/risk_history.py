@@ -0,0 +1,118 @@
+"""
+Daily risk history: snapshots of the overview rollups in a time-series collection.
+
+take_snapshot() copies the current counters of every rollup (institution, department,
+instructor and class; see app/rollups.py) into `risk_snapshots`, once per UTC day:
+
+    {ts: <day start>, meta: {kind, key: <rollup _id>}, total, at_risk, high, medium, low}
+
+A day's snapshot is complete when every rollup has its document; a run interrupted halfway is
+finished by the next one. Trend charts read ranges of snapshots and downsample them to day /
+week (starting Monday) / month buckets (the last snapshot in each bucket), so they never touch
+enrollments. Buckets are built with $dateToString rather than $dateTrunc, which needs
+MongoDB 5.0, so trends also work on the plain-collection fallback. Snapshots are
+taken by the background loop started in main.py and by `python -m scripts.risk_history snapshot`.
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+from app.rollups import ROLLUPS
+
+SNAPSHOTS = "risk_snapshots"
+SNAPSHOT_FIELDS = ("total", "at_risk", "high", "medium", "low")
+GRANULARITIES = ("day", "week", "month")
+# Default range per granularity when the caller gives no start date
+DEFAULT_SPAN = {"day": timedelta(days=30), "week": timedelta(weeks=26), "month": timedelta(days=366)}
+
+
+def _day_start(now: datetime) -> datetime:
+    return now.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+
+
+def ensure_snapshot_collection(db):
+    """Create risk_snapshots as a time-series collection (a plain collection on MongoDB < 5.0)."""
+    if SNAPSHOTS in db.list_collection_names():
+        return
+    try:
+        db.create_collection(SNAPSHOTS, timeseries={"timeField": "ts", "metaField": "meta", "granularity": "hours"})
+    except CollectionInvalid:
+        pass  # created concurrently by another worker
+    except OperationFailure:
+        db.create_collection(SNAPSHOTS)
+
+
+def take_snapshot(db, now: datetime | None = None) -> int:
+    """Record today's counters for every rollup that has none yet. Returns documents written
+    (0 if today's snapshot is already complete)."""
+    ts = _day_start(now or datetime.now(timezone.utc))
+    # time-series collections cannot be upserted into, so the rollups already recorded are skipped
+    done = set(db[SNAPSHOTS].distinct("meta.key", {"ts": ts}))
+    if done and len(done) >= db[ROLLUPS].count_documents({}):
+        return 0
+    projection = {"kind": 1, **{f: 1 for f in SNAPSHOT_FIELDS}}
+    batch = []
+    written = 0
+    for doc in db[ROLLUPS].find({}, projection):
+        if doc["_id"] in done:
+            continue
+        batch.append({
+            "ts": ts,
+            "meta": {"kind": doc.get("kind"), "key": doc["_id"]},
+            **{f: doc.get(f, 0) for f in SNAPSHOT_FIELDS},
+        })
+        if len(batch) == 1000:
+            db[SNAPSHOTS].insert_many(batch, ordered=False)
+            written += len(batch)
+            batch = []
+    if batch:
+        db[SNAPSHOTS].insert_many(batch, ordered=False)
+        written += len(batch)
+    return written
+
+
+def _bucket(granularity: str) -> dict:
+    """Start of the day / week (Monday) / month bucket holding $ts."""
+    def truncated(fmt: str) -> dict:
+        return {"$dateFromString": {"dateString": {"$dateToString": {"date": "$ts", "format": fmt}}, "format": "%Y-%m-%d"}}
+
+    if granularity == "month":
+        return truncated("%Y-%m-01")
+    day = truncated("%Y-%m-%d")
+    if granularity == "day":
+        return day
+    return {"$subtract": [day, {"$multiply": [{"$subtract": [{"$isoDayOfWeek": "$ts"}, 1]}, 86_400_000]}]}
+
+
+def trend(db, key: str, granularity: str = "month", start: datetime | None = None, end: datetime | None = None) -> list[dict]:
+    """Downsampled history of one rollup: [{ts, total, at_risk, high, medium, low}] oldest first."""
+    end = end or datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(days=1)
+    start = start or end - DEFAULT_SPAN[granularity]
+    pipeline = [
+        {"$match": {"meta.key": key, "ts": {"$gte": start, "$lt": end}}},
+        {"$sort": {"ts": 1}},
+        {"$group": {"_id": _bucket(granularity), **{f: {"$last": f"${f}"} for f in SNAPSHOT_FIELDS}}},
+        {"$sort": {"_id": 1}},
+    ]
+    return [{"ts": row.pop("_id"), **row} for row in db[SNAPSHOTS].aggregate(pipeline)]
+
+
+def _interval_seconds() -> float:
+    return float(os.getenv("RISK_SNAPSHOT_INTERVAL_SECONDS", "3600"))
+
+
+async def snapshot_loop(get_db):
+    """Take the daily snapshot now and re-check every RISK_SNAPSHOT_INTERVAL_SECONDS (0 disables)."""
+    interval = _interval_seconds()
+    if interval <= 0:
+        return
+    while True:
+        try:
+            written = await asyncio.to_thread(take_snapshot, get_db())
+            if written:
+                print(f"[History] Recorded risk snapshot ({written} rollups).")
+        except Exception as e:  # keep the loop alive across transient database errors
+            print(f"[History] Snapshot skipped: {e.__class__.__name__}.")
+        await asyncio.sleep(interval)
@@ -0,0 +1,267 @@
+"""
+Incrementally maintained enrollment rollups for the admin overview.
+
+The `rollups` collection holds one document per class, per instructor, per instructor
+department, plus one institution-wide document:
+
+    {_id: "class:<class_id>",        kind: "class", class_id, instructor_id, scope: [...], counters}
+    {_id: "instructor:<id>",         kind: "instructor", instructor_id, department, counters}
+    {_id: "department:<name>",       kind: "department", department, counters}
+    {_id: "all",                     kind: "all", counters}
+
+with counters total / at_risk / high / medium / low / classes / instructors. A class's
+`scope` lists the instructor, department and "all" rollups its enrollments count towards
+(empty when its instructor no longer exists, matching the overview, which only counts
+classes of existing instructors).
+
+Writers call enrollments_changed(), class_created() and instructor_changed(); admin overview
+endpoints read a handful of rollup documents instead of re-joining every enrollment.
+enrollments_changed() also updates the counters on the class document (app/class_counters.py).
+rebuild_rollups() recomputes everything from scratch and check_rollups() reports drift.
+"""
+from bson import ObjectId
+from pymongo import DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+
+from app import class_counters
+from app.database import ROLE_TO_COLLECTION
+
+ROLLUPS = "rollups"
+ALL = "all"
+AT_RISK_LEVELS = ("High", "Medium")
+_RISK_FIELDS = {"High": "high", "Medium": "medium", "Low": "low"}
+COUNTERS = ("total", "at_risk", "high", "medium", "low", "classes", "instructors")
+
+
+def class_key(class_id: str) -> str:
+    return f"class:{class_id}"
+
+
+def instructor_key(instructor_id: str) -> str:
+    return f"instructor:{instructor_id}"
+
+
+def department_key(department: str) -> str:
+    return f"department:{department}"
+
+
+def _zero() -> dict:
+    return {c: 0 for c in COUNTERS}
+
+
+def _add_risk(counters: dict, risk, sign: int = 1):
+    if risk in _RISK_FIELDS:
+        counters[_RISK_FIELDS[risk]] += sign
+    if risk in AT_RISK_LEVELS:
+        counters["at_risk"] += sign
+
+
+def _scope(instructor_id: str, department: str | None, instructor_exists: bool) -> list[str]:
+    if not instructor_exists:
+        return []
+    scope = [instructor_key(instructor_id), ALL]
+    if department:
+        scope.append(department_key(department))
+    return scope
+
+
+def _labels(key: str) -> dict:
+    """Non-counter fields of an aggregate rollup, set when an $inc creates it."""
+    if key == ALL:
+        return {"kind": "all"}
+    return {"kind": "department", "department": key.split(":", 1)[1]}
+
+
+def _inc_ops(keys: list[str], inc: dict, upsert: bool = False) -> list:
+    inc = {k: v for k, v in inc.items() if v}
+    if not inc:
+        return []
+    if upsert:
+        return [UpdateOne({"_id": key}, {"$inc": inc, "$setOnInsert": _labels(key)}, upsert=True) for key in keys]
+    return [UpdateOne({"_id": key}, {"$inc": inc}) for key in keys]
+
+
+def counters_of(doc: dict | None) -> dict:
+    """Counter fields of a rollup document (zeros when the document is missing)."""
+    return {c: (doc or {}).get(c, 0) for c in COUNTERS}
+
+
+# ----- incremental maintenance -----
+
+def enrollments_changed(db, class_id: str, added: int = 0, risk_changes=()):
+    """Apply `added` new (unlabelled) enrollments and (old_risk, new_risk) label changes for a class."""
+    delta = _zero()
+    delta["total"] = added
+    for old, new in risk_changes:
+        _add_risk(delta, old, -1)
+        _add_risk(delta, new, 1)
+    if not any(delta.values()):
+        return
+    class_counters.changed(db, class_id, added, risk_changes)
+    owner = db[ROLLUPS].find_one({"_id": class_key(class_id)}, {"scope": 1})
+    if owner is None:
+        # the recount already includes this write, so the delta must not be applied on top
+        _init_class_rollup(db, class_id)
+        return
+    db[ROLLUPS].bulk_write(_inc_ops([class_key(class_id), *owner.get("scope", [])], delta), ordered=False)
+
+
+def _init_class_rollup(db, class_id: str):
+    """Create the rollup for a class that predates rollups (counts recomputed from enrollments).
+    Only the call that actually creates it adds the counts to the scope rollups."""
+    if not ObjectId.is_valid(class_id):
+        return
+    cls = db.classes.find_one({"_id": ObjectId(class_id)}, {"instructor_id": 1})
+    if not cls:
+        return
+    counts = _zero()
+    for e in db.enrollments.find({"class_id": class_id}, {"risk": 1}):
+        counts["total"] += 1
+        _add_risk(counts, e.get("risk"))
+    _register_class(db, cls, counts)
+
+
+def _register_class(db, class_doc: dict, counts: dict):
+    """Insert a class rollup holding `counts` unless it exists; when this call inserted it, add
+    the class and its counts to the scope rollups. Concurrent callers therefore count it once."""
+    instructor_id = class_doc.get("instructor_id") or ""
+    inst = db[ROLLUPS].find_one({"_id": instructor_key(instructor_id)}, {"department": 1})
+    scope = _scope(instructor_id, (inst or {}).get("department"), inst is not None)
+    class_id = str(class_doc["_id"])
+    result = db[ROLLUPS].update_one(
+        {"_id": class_key(class_id)},
+        {"$setOnInsert": {"kind": "class", "class_id": class_id, "instructor_id": instructor_id,
+                          "scope": scope, **counts}},
+        upsert=True,
+    )
+    if result.upserted_id is not None:
+        ops = _inc_ops(scope, {**counts, "classes": 1})
+        if ops:
+            db[ROLLUPS].bulk_write(ops, ordered=False)
+
+
+def class_created(db, class_doc: dict):
+    """Register a new class under its instructor's rollups."""
+    _register_class(db, class_doc, _zero())
+
+
+def instructor_changed(db, instructor_id: str):
+    """Re-file an instructor after create, department change or delete.
+
+    Moves the instructor's totals (and its one instructor count) from its previous department
+    to its current one, or out of the overview entirely when the instructor was deleted.
+    """
+    if not ObjectId.is_valid(instructor_id):
+        return
+    inst = db[ROLE_TO_COLLECTION["instructor"]].find_one({"_id": ObjectId(instructor_id)}, {"department": 1})
+    old = db[ROLLUPS].find_one({"_id": instructor_key(instructor_id)})
+    new_department = (inst.get("department") or "").strip() if inst else None
+    if old is None and inst is None:
+        return
+    if old is not None and inst is not None and old.get("department") == new_department:
+        return
+    classes = list(db[ROLLUPS].find({"kind": "class", "instructor_id": instructor_id}))
+    totals = _zero()
+    for c in classes:
+        for k in ("total", "at_risk", "high", "medium", "low"):
+            totals[k] += c.get(k, 0)
+    totals["classes"] = len(classes)
+    totals["instructors"] = 1
+    key = instructor_key(instructor_id)
+    ops = []
+    if old is not None:
+        old_scope = _scope(instructor_id, old.get("department"), True)[1:]
+        ops += _inc_ops(old_scope, {k: -v for k, v in totals.items()})
+    new_scope = _scope(instructor_id, new_department, inst is not None)
+    if inst is not None:
+        ops.append(ReplaceOne(
+            {"_id": key},
+            {"kind": "instructor", "instructor_id": instructor_id, "department": new_department,
+             **totals, "instructors": 0},
+            upsert=True,
+        ))
+        ops += _inc_ops(new_scope[1:], totals, upsert=True)
+    else:
+        ops.append(DeleteOne({"_id": key}))
+    ops.append(UpdateMany({"kind": "class", "instructor_id": instructor_id}, {"$set": {"scope": new_scope}}))
+    db[ROLLUPS].bulk_write(ops, ordered=False)
+
+
+# ----- full rebuild and consistency check -----
+
+def compute_rollups(db) -> dict:
+    """All rollup documents computed from scratch, keyed by _id."""
+    instructors = {
+        str(i["_id"]): (i.get("department") or "").strip()
+        for i in db[ROLE_TO_COLLECTION["instructor"]].find({}, {"department": 1})
+    }
+    docs = {ALL: {"_id": ALL, "kind": "all", **_zero()}}
+    for iid, dept in instructors.items():
+        docs[instructor_key(iid)] = {"_id": instructor_key(iid), "kind": "instructor", "instructor_id": iid,
+                                     "department": dept, **_zero()}
+        for key in _scope(iid, dept, True)[1:]:
+            if key not in docs:
+                docs[key] = {"_id": key, **_labels(key), **_zero()}
+            docs[key]["instructors"] += 1
+    class_counts = {}
+    for row in db.enrollments.aggregate([
+        {"$group": {
+            "_id": "$class_id",
+            "total": {"$sum": 1},
+            "at_risk": {"$sum": {"$cond": [{"$in": ["$risk", list(AT_RISK_LEVELS)]}, 1, 0]}},
+            "high": {"$sum": {"$cond": [{"$eq": ["$risk", "High"]}, 1, 0]}},
+            "medium": {"$sum": {"$cond": [{"$eq": ["$risk", "Medium"]}, 1, 0]}},
+            "low": {"$sum": {"$cond": [{"$eq": ["$risk", "Low"]}, 1, 0]}},
+        }},
+    ]):
+        class_counts[row["_id"]] = row
+    for cls in db.classes.find({}, {"instructor_id": 1}):
+        cid = str(cls["_id"])
+        iid = cls.get("instructor_id") or ""
+        scope = _scope(iid, instructors.get(iid), iid in instructors)
+        counts = _zero()
+        for k in ("total", "at_risk", "high", "medium", "low"):
+            counts[k] = class_counts.get(cid, {}).get(k, 0)
+        docs[class_key(cid)] = {"_id": class_key(cid), "kind": "class", "class_id": cid, "instructor_id": iid,
+                                "scope": scope, **counts}
+        for key in scope:
+            for k in ("total", "at_risk", "high", "medium", "low"):
+                docs[key][k] += counts[k]
+            docs[key]["classes"] += 1
+    return docs
+
+
+def rebuild_rollups(db) -> int:
+    """Replace every rollup document with freshly computed values. Returns documents written.
+
+    Writes that land while the rebuild runs can be lost; run it when the system is quiet
+    (or re-run check_rollups afterwards).
+    """
+    docs = compute_rollups(db)
+    db[ROLLUPS].delete_many({})
+    ops = [InsertOne(doc) for doc in docs.values()]
+    for i in range(0, len(ops), 1000):
+        db[ROLLUPS].bulk_write(ops[i:i + 1000], ordered=False)
+    return len(ops)
+
+
+def check_rollups(db) -> list[dict]:
+    """Compare stored rollups with freshly computed ones. Returns one entry per drifted document."""
+    expected = compute_rollups(db)
+    stored = {doc["_id"]: doc for doc in db[ROLLUPS].find({})}
+    drift = []
+    for key in sorted(set(expected) | set(stored)):
+        want, have = expected.get(key), stored.get(key)
+        if want is None and have is not None and have.get("kind") == "department" and not any(counters_of(have).values()):
+            continue  # emptied department, harmless
+        if counters_of(want) != counters_of(have) or (want or {}).get("scope") != (have or {}).get("scope"):
+            drift.append({"_id": key, "expected": counters_of(want), "stored": counters_of(have)})
+    return drift
+
+
+def sync_rollups(db) -> int:
+    """Build rollups on first run (collection empty but classes or instructors exist)."""
+    if db[ROLLUPS].find_one({}, {"_id": 1}):
+        return 0
+    if not db.classes.find_one({}, {"_id": 1}) and not db[ROLE_TO_COLLECTION["instructor"]].find_one({}, {"_id": 1}):
+        return 0
+    return rebuild_rollups(db)
@@ -1,26 +1,138 @@
 """
 Admin-only endpoints for system overview: KPIs, departments (from instructors only),
 students at risk, department stats, instructors list, and trends.
+
+KPIs, department and instructor counts are read from the rollups collection (app/rollups.py)
+rather than recomputed from enrollments on every request.
+
+Overview, analytics and report reads use get_db(ANALYTICS), which routes them to
+secondaries when available (MONGODB_ANALYTICS_READ_PREFERENCE).
 """
-from bson import ObjectId
-from fastapi import APIRouter, HTTPException
+import asyncio
+import importlib.util
+import os
+import time
+from datetime import date, datetime, timedelta
+from email.utils import formatdate
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from pymongo.errors import ServerSelectionTimeoutError
 
-from app.database import get_db
+from app import evaluation, exports, identity, imports, indicators, projections, reports, risk_history, rollups, scope, student_view
+from app.database import ANALYTICS, get_db
 from app.email_sender import send_account_decision_email
+from app.indexes import check_indexes, index_builds_in_progress
+from app.pagination import MAX_PAGE_SIZE, AfterParam, LimitParam, paginate_find, paginate_find_many
 
 router = APIRouter()
 
+# Enrollment fields read by the overview scans.
+ENROLLMENT_RISK = {"student_email": 1, "class_id": 1, "risk": 1}
+
+
+def _rollup_key(department: str | None) -> str:
+    if department and department != "all":
+        return rollups.department_key(department.strip())
+    return rollups.ALL
+
+
+def _rollup_counters(db, department: str | None) -> dict:
+    """Enrollment/class/instructor counters for one department, or for all instructors."""
+    return rollups.counters_of(db.rollups.find_one({"_id": _rollup_key(department)}))
+
+
+def _risk_trends(db, department: str | None, granularity: str = "month", start=None, end=None) -> list[dict]:
+    """Chart points from the risk history; empty when no snapshot falls in the range."""
+    start_dt = datetime(start.year, start.month, start.day) if start else None
+    end_dt = datetime(end.year, end.month, end.day) + timedelta(days=1) if end else None
+    label = "%b" if granularity == "month" else "%b %d"
+    return [
+        {
+            "name": p["ts"].strftime(label),
+            "date": p["ts"].date().isoformat(),
+            "atRisk": p["at_risk"],
+            "total": p["total"],
+            "improved": 0,
+        }
+        for p in risk_history.trend(db, _rollup_key(department), granularity, start_dt, end_dt)
+    ]
+
 
-def _instructor_ids_by_department(db, department: str | None):
-    """Return list of instructor _id (as str) for instructors in the given department.
-    If department is None or 'all', return all instructor ids from instructor collection.
-    """
-    q = {}
+def _department_rollups(db, department: str | None):
+    """Department rollups that still have instructors, sorted by name."""
+    q = {"kind": "department", "instructors": {"$gt": 0}}
     if department and department != "all":
-        q["department"] = department
-    cursor = db.instructor.find(q, {"_id": 1})
-    return [str(doc["_id"]) for doc in cursor]
+        q["department"] = department.strip()
+    return db.rollups.find(q).sort("department", 1)
+
+
+def _interventions_count(db) -> int:
+    return db.interventions.count_documents({}) if "interventions" in db.list_collection_names() else 0
+
+
+def _overview_kpis(total_students: int, at_risk_students: int, instructors_count: int, interventions_count: int) -> dict:
+    return {
+        "total_students": total_students,
+        "at_risk_students": at_risk_students,
+        "instructors_count": instructors_count,
+        "active_alerts": at_risk_students,
+        "interventions_count": interventions_count,
+        "at_risk_percent": round(100 * at_risk_students / total_students, 1) if total_students else 0,
+    }
+
+
+def _at_risk_student_row(doc, scoped) -> dict | None:
+    c = scoped.classes.get(doc["class_id"])
+    if not c:
+        return None
+    inst = scoped.instructors.get(c.get("instructor_id"))
+    course = (c.get("subject_code") or "") + (" " + (c.get("subject_name") or "") if c.get("subject_name") else "")
+    return {
+        "id": doc["student_email"],
+        "student_email": doc["student_email"],
+        "department": (inst.get("department") or "") if inst else "",
+        "course": course.strip(),
+        "risk": doc.get("risk") or "Medium",
+        "instructor": (inst.get("name") or "") if inst else "",
+        "class_id": doc["class_id"],
+    }
+
+
+def _department_row(name: str, total: int, at_risk: int, instructors: int) -> dict:
+    return {
+        "name": name,
+        "total": total,
+        "atRisk": at_risk,
+        "rate": round(100 * at_risk / total, 1) if total else 0,
+        "instructors": instructors,
+    }
+
+
+def _instructor_row(iid: str, inst: dict, classes: int, students: int, at_risk: int) -> dict:
+    return {
+        "id": iid,
+        "name": inst.get("name") or "",
+        "email": inst.get("email") or "",
+        "department": inst.get("department") or "",
+        "classes": classes,
+        "students": students,
+        "atRisk": at_risk,
+    }
+
+
+def _trend_point(total: int, at_risk: int) -> dict:
+    return {"name": datetime.utcnow().strftime("%b"), "atRisk": at_risk, "total": total, "improved": 0}
+
+
+def _risk_distribution(total: int, high: int, medium: int) -> list[dict]:
+    # Enrollments without a risk label count as Low
+    return [
+        {"name": "High", "value": high, "color": "#ef4444"},
+        {"name": "Medium", "value": medium, "color": "#f59e0b"},
+        {"name": "Low", "value": total - high - medium, "color": "#3b82f6"},
+    ]
 
 
 @router.get("/students/{student_email:path}")
@@ -32,41 +144,13 @@ def get_student_by_email(student_email: str):
         if not email:
             from fastapi import HTTPException
             raise HTTPException(status_code=400, detail="Invalid student email")
+        # Primary, not ANALYTICS: the view is cached until the next write invalidates it, so a
+        # lagging secondary read right after an invalidate would be served stale for the TTL.
         db = get_db()
-        enrollments = list(db.enrollments.find({"student_email": email}))
-        if not enrollments:
+        rows = student_view.get(db, email)
+        if rows is None:
             from fastapi import HTTPException
             raise HTTPException(status_code=404, detail="Student not found")
-        class_ids = [str(e["class_id"]) if e.get("class_id") else "" for e in enrollments]
-        oids = [ObjectId(cid) for cid in class_ids if cid and ObjectId.is_valid(cid)]
-        classes = {str(c["_id"]): c for c in db.classes.find({"_id": {"$in": oids}})} if oids else {}
-        instructors = {}
-        for c in classes.values():
-            iid = c.get("instructor_id")
-            if iid and ObjectId.is_valid(iid):
-                inst = db.instructor.find_one({"_id": ObjectId(iid)})
-                if inst:
-                    instructors[iid] = inst
-        rows = []
-        for e in enrollments:
-            cid = str(e.get("class_id") or "")
-            c = classes.get(cid)
-            if not c:
-                continue
-            inst = instructors.get(c.get("instructor_id") or "")
-            rows.append({
-                "class_id": e["class_id"],
-                "subject_code": c.get("subject_code", ""),
-                "subject_name": c.get("subject_name", ""),
-                "course": (c.get("subject_code", "") + " " + c.get("subject_name", "")).strip(),
-                "instructor_id": c.get("instructor_id", ""),
-                "instructor_name": (inst.get("name", "") if inst else ""),
-                "department": (inst.get("department", "") if inst else ""),
-                "risk": e.get("risk"),
-                "gpa": e.get("gpa"),
-                "attendance": e.get("attendance"),
-                "lms_activity": e.get("lms_activity"),
-            })
         return {"student_email": email, "enrollments": rows}
     except ServerSelectionTimeoutError:
         from fastapi import HTTPException
@@ -77,9 +161,8 @@ def get_student_by_email(student_email: str):
 def list_instructor_departments():
     """List unique department names from the instructor collection only (not admin or amu-staff)."""
     try:
-        db = get_db()
-        depts = db.instructor.distinct("department")
-        return [d for d in sorted(depts) if d]
+        db = get_db(ANALYTICS)
+        return scope.departments(db)
     except ServerSelectionTimeoutError:
         return []
 
@@ -88,82 +171,30 @@ def list_instructor_departments():
 def get_overview(department: str | None = None):
     """KPIs for system overview. Optional department filter (instructor departments only)."""
     try:
-        db = get_db()
-        instructor_ids = _instructor_ids_by_department(db, department)
-        if not instructor_ids and department and department != "all":
-            return {
-                "total_students": 0,
-                "at_risk_students": 0,
-                "instructors_count": 0,
-                "active_alerts": 0,
-                "interventions_count": 0,
-                "at_risk_percent": 0,
-            }
-        # Classes belonging to (filtered) instructors
-        class_cursor = db.classes.find({"instructor_id": {"$in": instructor_ids}})
-        class_ids = [str(c["_id"]) for c in class_cursor]
-        total_students = db.enrollments.count_documents({"class_id": {"$in": class_ids}}) if class_ids else 0
-        at_risk_students = (
-            db.enrollments.count_documents(
-                {"class_id": {"$in": class_ids}, "risk": {"$in": ["High", "Medium"]}}
-            )
-            if class_ids
-            else 0
-        )
-        instructors_count = len(instructor_ids)
-        interventions_count = db.interventions.count_documents({}) if "interventions" in db.list_collection_names() else 0
-        at_risk_percent = round(100 * at_risk_students / total_students, 1) if total_students else 0
-        return {
-            "total_students": total_students,
-            "at_risk_students": at_risk_students,
-            "instructors_count": instructors_count,
-            "active_alerts": at_risk_students,
-            "interventions_count": interventions_count,
-            "at_risk_percent": at_risk_percent,
-        }
+        db = get_db(ANALYTICS)
+        totals = _rollup_counters(db, department)
+        return _overview_kpis(totals["total"], totals["at_risk"], totals["instructors"], _interventions_count(db))
     except ServerSelectionTimeoutError:
-        return {
-            "total_students": 0,
-            "at_risk_students": 0,
-            "instructors_count": 0,
-            "active_alerts": 0,
-            "interventions_count": 0,
-            "at_risk_percent": 0,
-        }
+        return _overview_kpis(0, 0, 0, 0)
 
 
 @router.get("/overview/students-at-risk")
-def list_students_at_risk(department: str | None = None):
+def list_students_at_risk(
+    response: Response,
+    department: str | None = None,
+    limit: int | None = LimitParam,
+    after: str | None = AfterParam,
+):
     """List at-risk students (High/Medium) with department from instructor and course info. Filter by department (instructor's)."""
     try:
-        db = get_db()
-        instructor_ids = _instructor_ids_by_department(db, department)
-        classes = list(db.classes.find({"instructor_id": {"$in": instructor_ids}}))
-        class_ids = [str(c["_id"]) for c in classes]
-        class_by_id = {str(c["_id"]): c for c in classes}
-        instructor_by_id = {doc["_id"]: doc for doc in db.instructor.find({})}
-        rows = []
-        for doc in db.enrollments.find(
-            {"class_id": {"$in": class_ids}, "risk": {"$in": ["High", "Medium"]}}
-        ):
-            c = class_by_id.get(doc["class_id"])
-            if not c:
-                continue
-            inst_id = c.get("instructor_id")
-            inst = instructor_by_id.get(ObjectId(inst_id)) if ObjectId.is_valid(inst_id) else None
-            inst_name = (inst.get("name") or "") if inst else ""
-            dept = (inst.get("department") or "") if inst else ""
-            course = (c.get("subject_code") or "") + (" " + (c.get("subject_name") or "") if c.get("subject_name") else "")
-            rows.append({
-                "id": doc["student_email"],
-                "student_email": doc["student_email"],
-                "department": dept,
-                "course": course.strip(),
-                "risk": doc.get("risk") or "Medium",
-                "instructor": inst_name,
-                "class_id": doc["class_id"],
-            })
-        return rows
+        db = get_db(ANALYTICS)
+        scoped = scope.resolve(db, department)
+        enrollments = paginate_find(
+            db.enrollments,
+            {"class_id": {"$in": scoped.class_ids}, "risk": {"$in": ["High", "Medium"]}},
+            ["_id"], limit, after, response, ENROLLMENT_RISK,
+        )
+        return [row for row in (_at_risk_student_row(doc, scoped) for doc in enrollments) if row]
     except ServerSelectionTimeoutError:
         return []
 
@@ -172,109 +203,57 @@ def list_students_at_risk(department: str | None = None):
 def list_departments_stats(department: str | None = None):
     """Per-department stats (only instructor departments). If department is set, return that one only."""
     try:
-        db = get_db()
-        instructor_ids = _instructor_ids_by_department(db, department)
-        # Get all instructors to group by department
-        instructors = list(db.instructor.find({"_id": {"$in": [ObjectId(i) for i in instructor_ids]}}))
-        dept_to_instructor_ids = {}
-        for inst in instructors:
-            d = (inst.get("department") or "").strip()
-            if not d:
-                continue
-            sid = str(inst["_id"])
-            dept_to_instructor_ids.setdefault(d, []).append(sid)
-        classes = list(db.classes.find({"instructor_id": {"$in": instructor_ids}}))
-        class_ids = [str(c["_id"]) for c in classes]
-        inst_id_to_dept = {str(i["_id"]): (i.get("department") or "").strip() for i in instructors}
-        class_to_inst = {str(c["_id"]): c.get("instructor_id") for c in classes}
-        enrollments = list(db.enrollments.find({"class_id": {"$in": class_ids}}))
-        dept_totals = {}
-        dept_at_risk = {}
-        for e in enrollments:
-            cid = e["class_id"]
-            inst_id = class_to_inst.get(cid)
-            d = inst_id_to_dept.get(inst_id, "")
-            if not d:
-                continue
-            dept_totals[d] = dept_totals.get(d, 0) + 1
-            if e.get("risk") in ("High", "Medium"):
-                dept_at_risk[d] = dept_at_risk.get(d, 0) + 1
-        rows = []
-        for d in sorted(dept_to_instructor_ids.keys()):
-            total = dept_totals.get(d, 0)
-            at_risk = dept_at_risk.get(d, 0)
-            rate = round(100 * at_risk / total, 1) if total else 0
-            rows.append({
-                "name": d,
-                "total": total,
-                "atRisk": at_risk,
-                "rate": rate,
-                "instructors": len(dept_to_instructor_ids[d]),
-            })
-        return rows
+        db = get_db(ANALYTICS)
+        return [
+            _department_row(doc["department"], doc.get("total", 0), doc.get("at_risk", 0), doc.get("instructors", 0))
+            for doc in _department_rollups(db, department)
+        ]
     except ServerSelectionTimeoutError:
         return []
 
 
 @router.get("/overview/instructors")
-def list_overview_instructors(department: str | None = None):
+def list_overview_instructors(
+    response: Response,
+    department: str | None = None,
+    limit: int | None = LimitParam,
+    after: str | None = AfterParam,
+):
     """Instructors with class count, student count, at-risk count. Filter by department (instructor's)."""
     try:
-        db = get_db()
-        instructor_ids = _instructor_ids_by_department(db, department)
-        instructors = list(db.instructor.find({"_id": {"$in": [ObjectId(i) for i in instructor_ids]}}))
-        classes = list(db.classes.find({"instructor_id": {"$in": instructor_ids}}))
-        class_ids = [str(c["_id"]) for c in classes]
-        inst_class_count = {}
-        for c in classes:
-            iid = c.get("instructor_id")
-            inst_class_count[iid] = inst_class_count.get(iid, 0) + 1
-        enrollments = list(db.enrollments.find({"class_id": {"$in": class_ids}}))
-        class_to_inst = {str(c["_id"]): c.get("instructor_id") for c in classes}
-        inst_students = {}
-        inst_at_risk = {}
-        for e in enrollments:
-            iid = class_to_inst.get(e["class_id"])
-            if iid:
-                inst_students[iid] = inst_students.get(iid, 0) + 1
-                if e.get("risk") in ("High", "Medium"):
-                    inst_at_risk[iid] = inst_at_risk.get(iid, 0) + 1
+        db = get_db(ANALYTICS)
+        q = {"department": department} if department and department != "all" else {}
+        # Page over instructors; counts come from this page's instructor rollups.
+        instructors = paginate_find(db.instructor, q, ["_id"], limit, after, response, projections.INSTRUCTOR_SUMMARY)
+        keys = [rollups.instructor_key(str(inst["_id"])) for inst in instructors]
+        counts = {doc["instructor_id"]: doc for doc in db.rollups.find({"_id": {"$in": keys}})}
         rows = []
         for inst in instructors:
             iid = str(inst["_id"])
-            rows.append({
-                "id": iid,
-                "name": inst.get("name") or "",
-                "email": inst.get("email") or "",
-                "department": inst.get("department") or "",
-                "classes": inst_class_count.get(iid, 0),
-                "students": inst_students.get(iid, 0),
-                "atRisk": inst_at_risk.get(iid, 0),
-            })
+            totals = rollups.counters_of(counts.get(iid))
+            rows.append(_instructor_row(iid, inst, totals["classes"], totals["total"], totals["at_risk"]))
         return rows
     except ServerSelectionTimeoutError:
         return []
 
 
 @router.get("/overview/trends")
-def get_overview_trends(department: str | None = None):
-    """Trend data for chart. DB has no history; return current snapshot as a single point."""
+def get_overview_trends(
+    department: str | None = None,
+    granularity: Literal["day", "week", "month"] = "month",
+    start: date | None = None,
+    end: date | None = None,
+):
+    """Trend data for chart from the daily risk snapshots (app/risk_history.py), one point per
+    day/week/month between start and end (default: the last year by month). Until the first
+    snapshot exists, returns the current counts as a single point."""
     try:
-        db = get_db()
-        instructor_ids = _instructor_ids_by_department(db, department)
-        class_cursor = db.classes.find({"instructor_id": {"$in": instructor_ids}})
-        class_ids = [str(c["_id"]) for c in class_cursor]
-        total = db.enrollments.count_documents({"class_id": {"$in": class_ids}}) if class_ids else 0
-        at_risk = (
-            db.enrollments.count_documents(
-                {"class_id": {"$in": class_ids}, "risk": {"$in": ["High", "Medium"]}}
-            )
-            if class_ids
-            else 0
-        )
-        from datetime import datetime
-        month_name = datetime.utcnow().strftime("%b")
-        return [{"name": month_name, "atRisk": at_risk, "total": total, "improved": 0}]
+        db = get_db(ANALYTICS)
+        points = _risk_trends(db, department, granularity, start, end)
+        if points:
+            return points
+        totals = _rollup_counters(db, department)
+        return [_trend_point(totals["total"], totals["at_risk"])]
     except ServerSelectionTimeoutError:
         return []
 
@@ -285,34 +264,10 @@ def get_overview_trends(department: str | None = None):
 def get_analytics_department_chart(department: str | None = None):
     """At-risk and total students by department (instructor departments only). For bar chart."""
     try:
-        db = get_db()
-        instructor_ids = _instructor_ids_by_department(db, department)
-        instructors = list(db.instructor.find({"_id": {"$in": [ObjectId(i) for i in instructor_ids]}}))
-        dept_to_instructor_ids = {}
-        for inst in instructors:
-            d = (inst.get("department") or "").strip()
-            if not d:
-                continue
-            dept_to_instructor_ids.setdefault(d, []).append(str(inst["_id"]))
-        classes = list(db.classes.find({"instructor_id": {"$in": instructor_ids}}))
-        class_ids = [str(c["_id"]) for c in classes]
-        class_to_inst = {str(c["_id"]): c.get("instructor_id") for c in classes}
-        inst_id_to_dept = {str(i["_id"]): (i.get("department") or "").strip() for i in instructors}
-        enrollments = list(db.enrollments.find({"class_id": {"$in": class_ids}}))
-        dept_totals = {}
-        dept_at_risk = {}
-        for e in enrollments:
-            cid = e["class_id"]
-            inst_id = class_to_inst.get(cid)
-            d = inst_id_to_dept.get(inst_id, "")
-            if not d:
-                continue
-            dept_totals[d] = dept_totals.get(d, 0) + 1
-            if e.get("risk") in ("High", "Medium"):
-                dept_at_risk[d] = dept_at_risk.get(d, 0) + 1
+        db = get_db(ANALYTICS)
         return [
-            {"name": d, "atRisk": dept_at_risk.get(d, 0), "total": dept_totals.get(d, 0)}
-            for d in sorted(dept_to_instructor_ids.keys())
+            {"name": doc["department"], "atRisk": doc.get("at_risk", 0), "total": doc.get("total", 0)}
+            for doc in _department_rollups(db, department)
         ]
     except ServerSelectionTimeoutError:
         return []
@@ -322,60 +277,195 @@ def get_analytics_department_chart(department: str | None = None):
 def get_analytics_risk_distribution(department: str | None = None):
     """Count of enrollments by risk level (High, Medium, Low). For pie chart."""
     try:
-        db = get_db()
-        instructor_ids = _instructor_ids_by_department(db, department)
-        classes = list(db.classes.find({"instructor_id": {"$in": instructor_ids}}))
-        class_ids = [str(c["_id"]) for c in classes]
-        if not class_ids:
-            return [
-                {"name": "High", "value": 0, "color": "#ef4444"},
-                {"name": "Medium", "value": 0, "color": "#f59e0b"},
-                {"name": "Low", "value": 0, "color": "#3b82f6"},
-            ]
-        pipeline = [
-            {"$match": {"class_id": {"$in": class_ids}}},
-            {"$group": {"_id": "$risk", "count": {"$sum": 1}}},
-        ]
-        cursor = db.enrollments.aggregate(pipeline)
-        counts = {}
-        for doc in cursor:
-            key = doc["_id"] if doc["_id"] in ("High", "Medium", "Low") else "Low"
-            counts[key] = counts.get(key, 0) + doc["count"]
-        return [
-            {"name": "High", "value": counts.get("High", 0), "color": "#ef4444"},
-            {"name": "Medium", "value": counts.get("Medium", 0), "color": "#f59e0b"},
-            {"name": "Low", "value": counts.get("Low", 0), "color": "#3b82f6"},
-        ]
+        db = get_db(ANALYTICS)
+        totals = _rollup_counters(db, department)
+        return _risk_distribution(totals["total"], totals["high"], totals["medium"])
     except ServerSelectionTimeoutError:
-        return [
-            {"name": "High", "value": 0, "color": "#ef4444"},
-            {"name": "Medium", "value": 0, "color": "#f59e0b"},
-            {"name": "Low", "value": 0, "color": "#3b82f6"},
+        return _risk_distribution(0, 0, 0)
+
+
+@router.get("/analytics/indicators")
+def get_analytics_indicators(
+    department: str | None = None,
+    instructor_id: str | None = None,
+    class_id: str | None = None,
+    bins: int = Query(10, ge=1, le=100),
+):
+    """GPA, attendance and LMS activity statistics (histogram, percentiles, mean, mean per risk
+    level, correlation with risk) for a department, an instructor's classes or one class."""
+    try:
+        db = get_db(ANALYTICS)
+        if class_id:
+            class_ids = [class_id]
+        elif instructor_id:
+            class_ids = [cid for cid, c in scope.resolve(db, None).classes.items() if c.get("instructor_id") == instructor_id]
+        else:
+            class_ids = scope.resolve(db, department).class_ids
+        return indicators.summarize(indicators.arrays(db), class_ids, bins)
+    except ServerSelectionTimeoutError:
+        raise HTTPException(status_code=503, detail="Database unavailable.")
+
+
+# ----- Dashboard (every System Overview panel in one request) -----
+
+class _ServerTiming:
+    """Collects Server-Timing entries; each mark() records the time since the previous one."""
+
+    def __init__(self):
+        self.entries: list[str] = []
+        self._last = time.perf_counter()
+
+    def mark(self, name: str):
+        now = time.perf_counter()
+        self.entries.append(f"{name};dur={1000 * (now - self._last):.1f}")
+        self._last = now
+
+    def header(self) -> str:
+        return ", ".join(self.entries)
+
+
+def _dashboard_pipeline(class_ids, at_risk_limit: int) -> list[dict]:
+    return [
+        {"$match": {"class_id": {"$in": class_ids}}},
+        {"$facet": {
+            "classes": [
+                {"$group": {
+                    "_id": "$class_id",
+                    "total": {"$sum": 1},
+                    "high": {"$sum": {"$cond": [{"$eq": ["$risk", "High"]}, 1, 0]}},
+                    "medium": {"$sum": {"$cond": [{"$eq": ["$risk", "Medium"]}, 1, 0]}},
+                }},
+            ],
+            "students_at_risk": [
+                {"$match": {"risk": {"$in": ["High", "Medium"]}}},
+                {"$sort": {"_id": 1}},
+                {"$limit": at_risk_limit},
+                {"$project": ENROLLMENT_RISK},
+            ],
+        }},
+    ]
+
+
+@router.get("/dashboard")
+def get_dashboard(
+    response: Response,
+    department: str | None = None,
+    at_risk_limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+):
+    """All System Overview panels (overview, students-at-risk, departments, instructors, trends,
+    risk-distribution) from one $facet pass over the scope's enrollments. Panels have the same
+    shape as their individual endpoints; students_at_risk holds the first `at_risk_limit` rows.
+    The Server-Timing header reports the scope lookup, the aggregation and each panel."""
+    try:
+        timing = _ServerTiming()
+        db = get_db(ANALYTICS)
+        scoped = scope.resolve(db, department)
+        timing.mark("scope")
+        facets = next(db.enrollments.aggregate(_dashboard_pipeline(scoped.class_ids, at_risk_limit)))
+        timing.mark("facet")
+
+        by_instructor = {}
+        for row in facets["classes"]:
+            c = scoped.classes.get(row["_id"])
+            if c:
+                counts = by_instructor.setdefault(c.get("instructor_id"), [0, 0, 0])
+                counts[0] += row["total"]
+                counts[1] += row["high"]
+                counts[2] += row["medium"]
+        total = sum(c[0] for c in by_instructor.values())
+        high = sum(c[1] for c in by_instructor.values())
+        medium = sum(c[2] for c in by_instructor.values())
+        overview = _overview_kpis(total, high + medium, len(scoped.instructor_ids), _interventions_count(db))
+        timing.mark("overview")
+
+        students_at_risk = [
+            row for row in (_at_risk_student_row(doc, scoped) for doc in facets["students_at_risk"]) if row
         ]
+        timing.mark("students_at_risk")
+
+        departments = {}
+        for iid in scoped.instructor_ids:
+            d = (scoped.instructors[iid].get("department") or "").strip()
+            if d:
+                t, h, m = by_instructor.get(iid, (0, 0, 0))
+                dept = departments.setdefault(d, [0, 0, 0])
+                dept[0] += t
+                dept[1] += h + m
+                dept[2] += 1
+        department_rows = [_department_row(d, *departments[d]) for d in sorted(departments)]
+        timing.mark("departments")
+
+        classes_per_instructor = {}
+        for c in scoped.classes.values():
+            classes_per_instructor[c.get("instructor_id")] = classes_per_instructor.get(c.get("instructor_id"), 0) + 1
+        instructor_rows = []
+        for iid in sorted(scoped.instructor_ids):
+            t, h, m = by_instructor.get(iid, (0, 0, 0))
+            instructor_rows.append(_instructor_row(iid, scoped.instructors[iid], classes_per_instructor.get(iid, 0), t, h + m))
+        timing.mark("instructors")
+
+        trends = _risk_trends(db, department) or [_trend_point(total, high + medium)]
+        timing.mark("trends")
+
+        response.headers["Server-Timing"] = timing.header()
+        return {
+            "overview": overview,
+            "students_at_risk": students_at_risk,
+            "departments": department_rows,
+            "instructors": instructor_rows,
+            "trends": trends,
+            "risk_distribution": _risk_distribution(total, high, medium),
+        }
+    except ServerSelectionTimeoutError:
+        raise HTTPException(status_code=503, detail="Database unavailable.")
+
+
+def _accuracy_point(doc) -> dict:
+    return {
+        "month": doc["term"],
+        "accuracy": doc.get("accuracy"),
+        "precision": doc.get("precision"),
+        "recall": doc.get("recall"),
+        "f1": doc.get("f1"),
+        "n": doc.get("n", 0),
+    }
 
 
 @router.get("/analytics/accuracy")
-def get_analytics_accuracy():
-    """AI prediction accuracy over time. No historical data in DB; return empty until implemented."""
-    return []
+def get_analytics_accuracy(department: str | None = None):
+    """Risk-label accuracy per term, evaluated against recorded outcomes. Serves the stored
+    results, which the background evaluation refreshes (app/evaluation.py); empty until outcomes
+    are recorded."""
+    try:
+        return [_accuracy_point(doc) for doc in evaluation.results(get_db(ANALYTICS), department)]
+    except ServerSelectionTimeoutError:
+        return []
+
+
+@router.get("/analytics/evaluation")
+def get_analytics_evaluation(department: str | None = None, term: str | None = None):
+    """Stored evaluation results with confusion counts and calibration per risk level."""
+    try:
+        return list(evaluation.results(get_db(ANALYTICS), department, term))
+    except ServerSelectionTimeoutError:
+        raise HTTPException(status_code=503, detail="Database unavailable.")
 
 
 # ----- Institution Reports (real data) -----
 
 def _build_reports_list(db) -> list[dict]:
     """Build list of available reports: fixed types + one at-risk report per instructor department."""
-    from datetime import datetime
     today = datetime.utcnow().strftime("%b %d, %Y")
-    depts = [d for d in sorted(db.instructor.distinct("department")) if d]
-    reports = [
+    depts = scope.departments(db)
+    items = [
         {"id": "at-risk-summary", "name": "Semester At-Risk Summary", "type": "At-Risk", "date": today, "department": "All", "description": "Summary of all at-risk students (High/Medium) across departments."},
         {"id": "department-performance", "name": "Department Performance Report", "type": "Performance", "date": today, "department": "All", "description": "Department-level student counts and at-risk counts by instructor department."},
-        {"id": "ai-accuracy", "name": "AI Model Accuracy Report", "type": "AI", "date": today, "department": "N/A", "description": "Model accuracy, precision, recall (when AI pipeline is implemented)."},
+        {"id": "ai-accuracy", "name": "AI Model Accuracy Report", "type": "AI", "date": today, "department": "N/A", "description": "Risk-label accuracy, precision, recall and F1 per term and department, against recorded outcomes."},
         {"id": "interventions", "name": "Intervention Success Report", "type": "Interventions", "date": today, "department": "All", "description": "List of interventions and their status from the database."},
     ]
     for d in depts:
-        safe_id = "at-risk-" + d.replace(" ", "-").replace(",", "")
-        reports.append({
+        safe_id = "at-risk-" + reports.department_slug(d)
+        items.append({
             "id": safe_id,
             "name": f"{d} — At-Risk List",
             "type": "At-Risk",
@@ -383,140 +473,147 @@ def _build_reports_list(db) -> list[dict]:
             "department": d,
             "description": f"Current at-risk students in {d}.",
         })
-    return reports
+    return items
 
 
 @router.get("/reports")
 def list_reports():
     """List available institution reports (built from real data: instructor departments + fixed types)."""
     try:
-        db = get_db()
+        db = get_db(ANALYTICS)
         return _build_reports_list(db)
     except ServerSelectionTimeoutError:
         return []
 
 
 @router.get("/reports/{report_id}/download")
-def download_report(report_id: str):
-    """Download report as CSV. Supports at-risk-summary, at-risk-{department}, department-performance, interventions."""
+def download_report(report_id: str, request: Request):
+    """Download report as CSV. Supports at-risk-summary, at-risk-{department}, department-performance, interventions, ai-accuracy.
+    Served from a cached artifact that is regenerated only when its enrollments, classes,
+    instructors or interventions changed; supports ETag / Last-Modified revalidation, byte
+    ranges, and gzip when the client accepts it."""
+    try:
+        db = get_db(ANALYTICS)
+        artifact = reports.artifact(db, report_id)
+        if artifact is None:
+            raise HTTPException(status_code=404, detail="Report not found or not available for download.")
+        stat = os.stat(artifact.path)
+        etag = f'"{artifact.version}"'
+        headers = {
+            "ETag": etag,
+            "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+            "Accept-Ranges": "bytes",
+            "Content-Disposition": f"attachment; filename={artifact.filename}",
+        }
+        # either encoding's tag: both name the same report version
+        if reports.etag_matches(request.headers.get("if-none-match"), (artifact.version, f"{artifact.version}-gzip")):
+            return Response(status_code=304, headers=headers)
+        byte_range = reports.parse_range(request.headers.get("range"), stat.st_size)
+        if byte_range and request.headers.get("if-range", etag) == etag:
+            start, end = byte_range
+            if start > end or start >= stat.st_size:
+                return Response(status_code=416, headers={"Content-Range": f"bytes */{stat.st_size}"})
+            headers["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+            headers["Content-Length"] = str(end - start + 1)
+            body = reports.file_chunks(artifact.path, start, end)
+            return StreamingResponse(body, status_code=206, media_type="text/csv", headers=headers)
+        body = reports.file_chunks(artifact.path)
+        if "gzip" in request.headers.get("accept-encoding", ""):
+            body = reports.gzip_chunks(body)
+            headers["ETag"] = f'"{artifact.version}-gzip"'
+            headers["Content-Encoding"] = "gzip"
+            headers["Vary"] = "Accept-Encoding"
+        else:
+            headers["Content-Length"] = str(stat.st_size)
+        return StreamingResponse(body, media_type="text/csv", headers=headers)
+    except ServerSelectionTimeoutError:
+        raise HTTPException(status_code=503, detail="Database unavailable.")
+
+
+@router.post("/reports/{report_id}/generate", status_code=202)
+def generate_report(report_id: str, response: Response):
+    """Start generating a report in the background (e.g. before a meeting). 200 when the
+    current artifact already exists, 202 while it is being generated."""
+    try:
+        db = get_db(ANALYTICS)
+        if reports.report_dependencies(report_id) is None:
+            raise HTTPException(status_code=404, detail="Report not found or not available for download.")
+        if reports.artifact(db, report_id, wait=False) is not None:
+            response.status_code = 200
+            return {"status": "ready"}
+        return {"status": "generating"}
+    except ServerSelectionTimeoutError:
+        raise HTTPException(status_code=503, detail="Database unavailable.")
+
+
+# ----- Bulk indicator import (CSV / NDJSON) -----
+
+@router.post("/imports/enrollments")
+async def import_enrollments(request: Request, fmt: Literal["csv", "ndjson"] | None = Query(None, alias="format")):
+    """Update many enrollments from a CSV (with header) or NDJSON upload sent as the raw request
+    body. Rows carry class_id, student_email and any of gpa, attendance, lms_activity, risk,
+    flagged_for_mentoring, term, outcome. The body is parsed as it streams in and written in
+    chunks of bulk updates; failed rows are listed by line number."""
+    if fmt is None:
+        fmt = "ndjson" if "ndjson" in request.headers.get("content-type", "") else "csv"
+    try:
+        job = imports.EnrollmentImport(get_db(), fmt)
+        chunk = []
+        line_no = 0
+        async for line in imports.lines(request.stream()):
+            line_no += 1
+            values = job.parse(line_no, line)
+            if values is not None:
+                chunk.append((line_no, values))
+            if len(chunk) == imports.CHUNK_ROWS:
+                await asyncio.to_thread(job.apply, chunk)
+                chunk = []
+        if chunk:
+            await asyncio.to_thread(job.apply, chunk)
+        return job.report()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ServerSelectionTimeoutError:
+        raise HTTPException(status_code=503, detail="Database unavailable.")
+
+
+# ----- Columnar exports (Parquet / Arrow) -----
+
+@router.get("/exports/{dataset}")
+def export_dataset(
+    dataset: Literal["enrollments", "classes"],
+    fmt: Literal["parquet", "arrow"] = Query("parquet", alias="format"),
+    department: str | None = None,
+):
+    """Typed columnar export for analytics tools. `enrollments`: one row per enrollment joined to
+    its class, instructor and department; `classes`: one row per class with enrollment and risk
+    counts. Streamed in record batches as Parquet (default) or an Arrow IPC stream."""
+    if importlib.util.find_spec("pyarrow") is None:
+        raise HTTPException(status_code=501, detail="Columnar export requires pyarrow on the server.")
+    try:
+        db = get_db(ANALYTICS)
+        scoped = scope.resolve(db, department)
+        media_type, extension = exports.FORMATS[fmt]
+        filename = f"{dataset}-{reports.department_slug(scoped.department)}" if scoped.department else dataset
+        return StreamingResponse(
+            exports.export_chunks(db, scoped, dataset, fmt),
+            media_type=media_type,
+            headers={"Content-Disposition": f"attachment; filename={filename}.{extension}"},
+        )
+    except ServerSelectionTimeoutError:
+        raise HTTPException(status_code=503, detail="Database unavailable.")
+
+
+# ----- Database indexes -----
+
+@router.get("/indexes")
+def get_index_status():
+    """Drift between declared and existing indexes, plus index builds currently in progress."""
     try:
         db = get_db()
-        from fastapi.responses import StreamingResponse
-        import io
-        import csv
-
-        # at-risk-summary: all at-risk students
-        if report_id == "at-risk-summary":
-            instructor_ids = _instructor_ids_by_department(db, None)
-            classes = list(db.classes.find({"instructor_id": {"$in": instructor_ids}}))
-            class_ids = [str(c["_id"]) for c in classes]
-            class_by_id = {str(c["_id"]): c for c in classes}
-            instructor_by_id = {doc["_id"]: doc for doc in db.instructor.find({})}
-            rows = []
-            for doc in db.enrollments.find({"class_id": {"$in": class_ids}, "risk": {"$in": ["High", "Medium"]}}):
-                c = class_by_id.get(doc["class_id"])
-                if not c:
-                    continue
-                inst = instructor_by_id.get(ObjectId(c["instructor_id"])) if ObjectId.is_valid(c.get("instructor_id")) else None
-                rows.append({
-                    "student_email": doc["student_email"],
-                    "risk": doc.get("risk", ""),
-                    "department": (inst.get("department") or "") if inst else "",
-                    "course": (c.get("subject_code") or "") + " " + (c.get("subject_name") or ""),
-                    "instructor": (inst.get("name") or "") if inst else "",
-                })
-            buf = io.StringIO()
-            w = csv.DictWriter(buf, fieldnames=["student_email", "risk", "department", "course", "instructor"])
-            w.writeheader()
-            w.writerows(rows)
-            return StreamingResponse(io.BytesIO(buf.getvalue().encode("utf-8")), media_type="text/csv", headers={"Content-Disposition": "attachment; filename=at-risk-summary.csv"})
-
-        # at-risk-{DepartmentName}: at-risk students in that department (id built as at-risk- + dept with spaces -> dashes)
-        if report_id.startswith("at-risk-"):
-            slug = report_id.replace("at-risk-", "")
-            depts = [d for d in db.instructor.distinct("department") if d]
-            matching = next((d for d in depts if d.replace(" ", "-").replace(",", "") == slug), None)
-            if not matching:
-                matching = next((d for d in depts if slug.lower() in d.replace(" ", "-").replace(",", "").lower()), None)
-            department = matching or slug.replace("-", " ")
-            instructor_ids = _instructor_ids_by_department(db, department)
-            classes = list(db.classes.find({"instructor_id": {"$in": instructor_ids}}))
-            class_ids = [str(c["_id"]) for c in classes]
-            class_by_id = {str(c["_id"]): c for c in classes}
-            instructor_by_id = {doc["_id"]: doc for doc in db.instructor.find({})}
-            rows = []
-            for doc in db.enrollments.find({"class_id": {"$in": class_ids}, "risk": {"$in": ["High", "Medium"]}}):
-                c = class_by_id.get(doc["class_id"])
-                if not c:
-                    continue
-                inst = instructor_by_id.get(ObjectId(c["instructor_id"])) if ObjectId.is_valid(c.get("instructor_id")) else None
-                rows.append({
-                    "student_email": doc["student_email"],
-                    "risk": doc.get("risk", ""),
-                    "department": (inst.get("department") or "") if inst else "",
-                    "course": (c.get("subject_code") or "") + " " + (c.get("subject_name") or ""),
-                    "instructor": (inst.get("name") or "") if inst else "",
-                })
-            buf = io.StringIO()
-            w = csv.DictWriter(buf, fieldnames=["student_email", "risk", "department", "course", "instructor"])
-            w.writeheader()
-            w.writerows(rows)
-            safe_name = report_id.replace(" ", "-") + ".csv"
-            return StreamingResponse(io.BytesIO(buf.getvalue().encode("utf-8")), media_type="text/csv", headers={"Content-Disposition": f"attachment; filename={safe_name}"})
-
-        # department-performance: departments with total and at-risk counts
-        if report_id == "department-performance":
-            stats = list(db.instructor.find({}, {"_id": 1, "department": 1}))
-            dept_to_ids = {}
-            for s in stats:
-                d = (s.get("department") or "").strip()
-                if d:
-                    dept_to_ids.setdefault(d, []).append(str(s["_id"]))
-            classes = list(db.classes.find({}))
-            class_ids = [str(c["_id"]) for c in classes]
-            class_to_inst = {str(c["_id"]): c.get("instructor_id") for c in classes}
-            inst_to_dept = {str(i["_id"]): (i.get("department") or "").strip() for i in db.instructor.find({})}
-            enrollments = list(db.enrollments.find({"class_id": {"$in": class_ids}}))
-            dept_total = {}
-            dept_at_risk = {}
-            for e in enrollments:
-                inst_id = class_to_inst.get(e["class_id"])
-                d = inst_to_dept.get(inst_id, "")
-                if not d:
-                    continue
-                dept_total[d] = dept_total.get(d, 0) + 1
-                if e.get("risk") in ("High", "Medium"):
-                    dept_at_risk[d] = dept_at_risk.get(d, 0) + 1
-            rows = [{"department": d, "total_students": dept_total.get(d, 0), "at_risk": dept_at_risk.get(d, 0), "instructor_count": len(dept_to_ids[d])} for d in sorted(dept_to_ids.keys())]
-            buf = io.StringIO()
-            w = csv.DictWriter(buf, fieldnames=["department", "total_students", "at_risk", "instructor_count"])
-            w.writeheader()
-            w.writerows(rows)
-            return StreamingResponse(io.BytesIO(buf.getvalue().encode("utf-8")), media_type="text/csv", headers={"Content-Disposition": "attachment; filename=department-performance.csv"})
-
-        # interventions: list interventions
-        if report_id == "interventions":
-            cursor = db.interventions.find({}) if "interventions" in db.list_collection_names() else []
-            rows = []
-            for doc in cursor:
-                rows.append({
-                    "student": doc.get("student", ""),
-                    "department": doc.get("department", ""),
-                    "course": doc.get("course", ""),
-                    "type": doc.get("type", ""),
-                    "status": doc.get("status", ""),
-                    "instructor": doc.get("instructor", ""),
-                    "due": doc.get("due", ""),
-                    "completed": doc.get("completed", ""),
-                })
-            buf = io.StringIO()
-            w = csv.DictWriter(buf, fieldnames=["student", "department", "course", "type", "status", "instructor", "due", "completed"])
-            w.writeheader()
-            w.writerows(rows)
-            return StreamingResponse(io.BytesIO(buf.getvalue().encode("utf-8")), media_type="text/csv", headers={"Content-Disposition": "attachment; filename=interventions.csv"})
-
-        # ai-accuracy: no data
-        raise HTTPException(status_code=404, detail="Report not found or not available for download.")
+        report = check_indexes(db)
+        report["in_progress"] = index_builds_in_progress(db)
+        return report
     except ServerSelectionTimeoutError:
         raise HTTPException(status_code=503, detail="Database unavailable.")
 
@@ -524,23 +621,27 @@ def download_report(report_id: str):
 # ----- Pending accounts (instructor / amu-staff signups awaiting admin approval) -----
 
 @router.get("/pending-accounts")
-def list_pending_accounts():
+def list_pending_accounts(
+    response: Response,
+    limit: int | None = LimitParam,
+    after: str | None = AfterParam,
+):
     """List users with status 'pending' from instructor and amu-staff collections (for admin approval)."""
     try:
         db = get_db()
         out = []
-        for coll_name in ("instructor", "amustaff"):
+        pending = paginate_find_many(db, ["instructor", "amustaff"], {"status": "pending"}, limit, after, response)
+        for doc, coll_name in pending:
             role_label = "instructor" if coll_name == "instructor" else "amu-staff"
-            for doc in db[coll_name].find({"status": "pending"}):
-                out.append({
-                    "id": str(doc["_id"]),
-                    "name": doc.get("name", ""),
-                    "email": doc.get("email", ""),
-                    "role": role_label,
-                    "department": doc.get("department", ""),
-                    "contact_number": doc.get("contact_number", ""),
-                    "status": doc.get("status", "pending"),
-                })
+            out.append({
+                "id": str(doc["_id"]),
+                "name": doc.get("name", ""),
+                "email": doc.get("email", ""),
+                "role": role_label,
+                "department": doc.get("department", ""),
+                "contact_number": doc.get("contact_number", ""),
+                "status": doc.get("status", "pending"),
+            })
         return out
     except ServerSelectionTimeoutError:
         raise HTTPException(status_code=503, detail="Database unavailable.")
@@ -548,14 +649,10 @@ def list_pending_accounts():
 
 def _find_pending_user(db, user_id: str):
     """Return (doc, coll_name) for a user in instructor or amustaff with status pending, else (None, None)."""
-    if not ObjectId.is_valid(user_id):
+    doc, coll_name = identity.find_user_by_id(db, user_id)
+    if not doc or coll_name not in ("instructor", "amustaff") or doc.get("status") != "pending":
         return None, None
-    oid = ObjectId(user_id)
-    for coll_name in ("instructor", "amustaff"):
-        doc = db[coll_name].find_one({"_id": oid, "status": "pending"})
-        if doc:
-            return doc, coll_name
-    return None, None
+    return doc, coll_name
 
 
 @router.post("/pending-accounts/{user_id}/approve")
@@ -1,5 +1,4 @@
 import os
-import re
 import secrets
 from datetime import datetime, timedelta, timezone
 
@@ -7,9 +6,11 @@ import bcrypt
 from fastapi import APIRouter, HTTPException
 from pymongo.errors import ServerSelectionTimeoutError
 
-from app.database import get_db, get_collection_for_role, ROLE_COLLECTIONS
+from app import data_version, identity, rollups, scope
+from app.database import get_db, get_collection_for_role
 from app.email_sender import is_smtp_configured, send_password_reset_email, send_test_email, send_verification_email
 from app.schemas import ForgotPasswordRequest, LoginRequest, ResetPasswordRequest, SignUpRequest
+from app.search import search_terms
 
 router = APIRouter()
 
@@ -54,6 +55,7 @@ def _signup_admin_flow(db, coll, body, existing, doc_base):
     else:
         result = coll.insert_one(doc)
         doc["_id"] = result.inserted_id
+    identity.register(db, coll.name, doc)
     frontend_url = os.getenv("FRONTEND_URL", "http://localhost:5173").rstrip("/")
     verification_link = f"{frontend_url}/verify-email?token={token}"
     sent, send_err = send_verification_email(body.email, verification_link, body.name)
@@ -78,7 +80,7 @@ def _signup_admin_flow(db, coll, body, existing, doc_base):
     return doc, response
 
 
-def _signup_instructor_amu_flow(coll, body, existing, doc_base):
+def _signup_instructor_amu_flow(db, coll, body, existing, doc_base):
     """Instructor/AMU Staff signup: pending admin approval. No verification email. Returns (doc, response_dict)."""
     doc = {
         **doc_base,
@@ -91,6 +93,11 @@ def _signup_instructor_amu_flow(coll, body, existing, doc_base):
     else:
         result = coll.insert_one(doc)
         doc["_id"] = result.inserted_id
+    identity.register(db, coll.name, doc)
+    if coll.name == "instructor":
+        rollups.instructor_changed(db, str(doc["_id"]))
+        scope.invalidate()
+        data_version.bump(db, data_version.INSTRUCTORS)
     response = {
         "id": str(doc["_id"]),
         "name": doc["name"],
@@ -122,13 +129,14 @@ def signup(body: SignUpRequest):
             "department": (body.department or "").strip(),
             "contact_number": body.contact_number or "",
             "password_hash": _hash_password(body.password),
+            "search_terms": search_terms(body.name, body.email),
         }
         if body.role == "admin":
             doc, response = _signup_admin_flow(db, coll, body, existing, doc_base)
             return response
         else:
             # instructor or amu-staff: pending admin approval
-            doc, response = _signup_instructor_amu_flow(coll, body, existing, doc_base)
+            doc, response = _signup_instructor_amu_flow(db, coll, body, existing, doc_base)
             return response
     except ServerSelectionTimeoutError:
         raise HTTPException(
@@ -143,28 +151,25 @@ def verify_email(token: str):
     try:
         db = get_db()
         now = datetime.now(timezone.utc)
-        for coll_name in ROLE_COLLECTIONS:
-            coll = db[coll_name]
-            doc = coll.find_one({"email_verification_token": token})
-            if not doc:
-                continue
-            # Token found: already verified (e.g. link clicked twice) -> success
-            if doc.get("email_verified") is True:
-                return {"message": "Email already verified. You can sign in."}
-            # Expired -> clear error (MongoDB may return naive datetime; normalize to UTC for comparison)
-            expires = doc.get("email_verification_expires")
-            if expires:
-                if expires.tzinfo is None:
-                    expires = expires.replace(tzinfo=timezone.utc)
-                if expires < now:
-                    raise HTTPException(status_code=400, detail="Verification link has expired.")
-            # Valid and not yet verified -> mark verified (keep token so second hit still returns success)
-            coll.update_one(
-                {"_id": doc["_id"]},
-                {"$set": {"email_verified": True}},
-            )
-            return {"message": "Email verified. You can now sign in."}
-        raise HTTPException(status_code=400, detail="Invalid or expired verification link.")
+        doc, coll_name = identity.find_user_by_token(db, "email_verification_token", token)
+        if not doc:
+            raise HTTPException(status_code=400, detail="Invalid or expired verification link.")
+        # Token found: already verified (e.g. link clicked twice) -> success
+        if doc.get("email_verified") is True:
+            return {"message": "Email already verified. You can sign in."}
+        # Expired -> clear error (MongoDB may return naive datetime; normalize to UTC for comparison)
+        expires = doc.get("email_verification_expires")
+        if expires:
+            if expires.tzinfo is None:
+                expires = expires.replace(tzinfo=timezone.utc)
+            if expires < now:
+                raise HTTPException(status_code=400, detail="Verification link has expired.")
+        # Valid and not yet verified -> mark verified (keep token so second hit still returns success)
+        db[coll_name].update_one(
+            {"_id": doc["_id"]},
+            {"$set": {"email_verified": True}},
+        )
+        return {"message": "Email verified. You can now sign in."}
     except ServerSelectionTimeoutError:
         raise HTTPException(
             status_code=503,
@@ -184,22 +189,18 @@ def forgot_password(body: ForgotPasswordRequest):
         frontend_url = os.getenv("FRONTEND_URL", "http://localhost:5173").rstrip("/")
         reset_link = f"{frontend_url}/reset-password?token={token}"
 
-        for coll_name in ROLE_COLLECTIONS:
-            coll = db[coll_name]
-            doc = coll.find_one({"email": {"$regex": f"^{re.escape(email_lower)}$", "$options": "i"}})
-            if not doc:
-                continue
-            if doc.get("email_verified") is not True:
-                break  # don't send reset for unverified
-            coll.update_one(
+        doc, coll_name = identity.find_user_by_email(db, email_lower)
+        # don't send reset for unknown or unverified accounts
+        if doc and doc.get("email_verified") is True:
+            db[coll_name].update_one(
                 {"_id": doc["_id"]},
                 {"$set": {"password_reset_token": token, "password_reset_expires": expires}},
             )
+            identity.set_tokens(db, coll_name, doc["_id"], password_reset_token=token)
             sent, _ = send_password_reset_email(body.email, reset_link, doc.get("name", "User"))
             if not sent:
                 import logging
                 logging.getLogger(__name__).warning("Password reset email not sent to %s", body.email)
-            break
         return {"message": "If that email is registered, we sent a password reset link. Check your inbox and spam."}
     except ServerSelectionTimeoutError:
         raise HTTPException(status_code=503, detail="Database unavailable.")
@@ -211,26 +212,24 @@ def reset_password(body: ResetPasswordRequest):
     try:
         db = get_db()
         now = datetime.now(timezone.utc)
-        for coll_name in ROLE_COLLECTIONS:
-            coll = db[coll_name]
-            doc = coll.find_one({"password_reset_token": body.token})
-            if not doc:
-                continue
-            exp = doc.get("password_reset_expires")
-            if exp:
-                if getattr(exp, "tzinfo", None) is None:
-                    exp = exp.replace(tzinfo=timezone.utc)
-                if exp < now:
-                    raise HTTPException(status_code=400, detail="Reset link has expired. Request a new one.")
-            coll.update_one(
-                {"_id": doc["_id"]},
-                {
-                    "$set": {"password_hash": _hash_password(body.new_password)},
-                    "$unset": {"password_reset_token": "", "password_reset_expires": ""},
-                },
-            )
-            return {"message": "Password updated. You can now sign in."}
-        raise HTTPException(status_code=400, detail="Invalid or expired reset link.")
+        doc, coll_name = identity.find_user_by_token(db, "password_reset_token", body.token)
+        if not doc:
+            raise HTTPException(status_code=400, detail="Invalid or expired reset link.")
+        exp = doc.get("password_reset_expires")
+        if exp:
+            if getattr(exp, "tzinfo", None) is None:
+                exp = exp.replace(tzinfo=timezone.utc)
+            if exp < now:
+                raise HTTPException(status_code=400, detail="Reset link has expired. Request a new one.")
+        db[coll_name].update_one(
+            {"_id": doc["_id"]},
+            {
+                "$set": {"password_hash": _hash_password(body.new_password)},
+                "$unset": {"password_reset_token": "", "password_reset_expires": ""},
+            },
+        )
+        identity.set_tokens(db, coll_name, doc["_id"], password_reset_token=None)
+        return {"message": "Password updated. You can now sign in."}
     except HTTPException:
         raise
     except ServerSelectionTimeoutError:
@@ -1,11 +1,17 @@
+import os
+
 from bson import ObjectId
-from fastapi import APIRouter, HTTPException
-from pymongo.errors import ServerSelectionTimeoutError
+from fastapi import APIRouter, HTTPException, Request, Response
+from pymongo.errors import BulkWriteError, ServerSelectionTimeoutError
 
+from app import class_counters, data_version, enrollment_updates, projections, rollups, scope, student_view
+from app.cache import TTLCache
 from app.database import get_db
+from app.pagination import AfterParam, LimitParam, and_filters, decode_cursor, page_result
 from app.schemas import (
     AddStudentToClassRequest,
     BatchAddStudentsRequest,
+    BatchUpdateEnrollmentsRequest,
     ClassCreate,
     ClassResponse,
     UpdateEnrollmentRequest,
@@ -14,14 +20,131 @@ from app.schemas import (
 router = APIRouter()
 
 
-def _doc_to_class_response(doc, student_count: int = 0, at_risk_count: int = 0) -> dict:
+def _ttl_seconds() -> float:
+    return float(os.getenv("CLASS_CACHE_TTL_SECONDS", "300"))
+
+
+# Class ids known to exist. Classes are never deleted through the API, so only hits are cached.
+_known_classes = TTLCache(maxsize=10_000, ttl=_ttl_seconds)
+
+
+def _class_exists(db, class_id: str) -> bool:
+    if not ObjectId.is_valid(class_id):
+        return False
+    if _known_classes.get(class_id):
+        return True
+    if db.classes.find_one({"_id": ObjectId(class_id)}, projections.ID_ONLY):
+        _known_classes.set(class_id, True)
+        return True
+    return False
+
+
+def _doc_to_class_response(doc) -> dict:
     return {
         "id": str(doc["_id"]),
         "subject_code": doc["subject_code"],
         "subject_name": doc["subject_name"],
         "instructor_id": doc["instructor_id"],
-        "student_count": student_count,
-        "at_risk_count": at_risk_count,
+        "student_count": doc.get("student_count", 0),
+        "at_risk_count": class_counters.at_risk(doc),
+    }
+
+
+def _instructor_enrollments_pipeline(
+    instructor_id: str,
+    enrollment_match: dict | None = None,
+    after: list | None = None,
+    limit: int | None = None,
+) -> list[dict]:
+    """Aggregation on classes: the instructor's classes joined with their enrollments.
+
+    Yields one row per enrollment, already shaped server-side as
+    {student_email, class_id, subject_code, subject_name, risk?, gpa?, attendance?, lms_activity?},
+    ordered by subject_code then student_email (the order the per-class loops produced).
+    `after` is a keyset position [subject_code, class_id, student_email]; rows up to and
+    including it are skipped.
+    """
+    class_match = {"instructor_id": instructor_id}
+    lookup_match = {"$expr": {"$eq": ["$class_id", "$$cid"]}}
+    if after:
+        after_code, after_class_id, after_email = after
+        if not ObjectId.is_valid(after_class_id):
+            raise HTTPException(status_code=400, detail="Invalid pagination cursor.")
+        class_match = and_filters(class_match, {"$or": [
+            {"subject_code": {"$gt": after_code}},
+            {"subject_code": after_code, "_id": {"$gte": ObjectId(after_class_id)}},
+        ]})
+        # Within the class the cursor stopped in, continue after its last student.
+        lookup_match = {"$expr": {"$and": [
+            {"$eq": ["$class_id", "$$cid"]},
+            {"$or": [{"$ne": ["$$cid", after_class_id]}, {"$gt": ["$student_email", after_email]}]},
+        ]}}
+    if enrollment_match:
+        lookup_match = {"$and": [lookup_match, enrollment_match]}
+    pipeline = [
+        {"$match": class_match},
+        {"$sort": {"subject_code": 1, "_id": 1}},
+        {"$lookup": {
+            "from": "enrollments",
+            "let": {"cid": {"$toString": "$_id"}},
+            "pipeline": [
+                {"$match": lookup_match},
+                {"$sort": {"student_email": 1}},
+                {"$project": {"_id": 0, "student_email": 1, "risk": 1, "gpa": 1, "attendance": 1, "lms_activity": 1}},
+            ],
+            "as": "enrollment",
+        }},
+        {"$unwind": "$enrollment"},
+        {"$project": {
+            "_id": 0,
+            "student_email": "$enrollment.student_email",
+            "class_id": {"$toString": "$_id"},
+            "subject_code": {"$ifNull": ["$subject_code", ""]},
+            "subject_name": {"$ifNull": ["$subject_name", ""]},
+            # null indicators are left out here, so raw BSON rows match the JSON rows
+            "risk": projections.present("$enrollment.risk"),
+            "gpa": projections.present("$enrollment.gpa"),
+            "attendance": projections.present("$enrollment.attendance"),
+            "lms_activity": projections.present("$enrollment.lms_activity"),
+        }},
+    ]
+    if limit is not None:
+        pipeline.append({"$limit": limit})
+    return pipeline
+
+
+def _risk_alert_row(doc) -> dict:
+    return {
+        "student_email": doc["student_email"],
+        "risk": doc.get("risk"),
+        "class_id": doc["class_id"],
+        "subject_code": doc["subject_code"],
+        "subject_name": doc["subject_name"],
+    }
+
+
+def _instructor_student_key(row) -> list:
+    return [row["subject_code"], row["class_id"], row["student_email"]]
+
+
+_instructor_student_row = projections.without_nulls
+_class_student_row = projections.without_nulls
+
+
+def _risk_list_query(class_id: str) -> dict:
+    """Labeled enrollments of a class, for the risk summary list."""
+    return {"class_id": class_id, "risk": {"$in": list(class_counters.RISK_LEVELS)}}
+
+
+def _risk_summary(class_doc, docs: list) -> dict:
+    """Counts come from the class's stored counters; docs are its labeled enrollments."""
+    counts = class_counters.counts_of(class_doc)
+    return {
+        "total": counts["student_count"],
+        "high_risk": counts["risk_counts"]["High"],
+        "medium_risk": counts["risk_counts"]["Medium"],
+        "low_risk": counts["risk_counts"]["Low"],
+        "at_risk_list": [{"student_email": d["student_email"], "risk": d.get("risk")} for d in docs],
     }
 
 
@@ -30,57 +153,38 @@ def list_instructor_risk_alerts(instructor_id: str):
     """List all medium/high risk students across the instructor's classes (for Risk Alerts page)."""
     try:
         db = get_db()
-        classes_cursor = db.classes.find({"instructor_id": instructor_id}).sort("subject_code", 1)
-        alerts = []
-        for c in classes_cursor:
-            class_id = str(c["_id"])
-            subject_code = c.get("subject_code", "")
-            subject_name = c.get("subject_name", "")
-            cursor = db.enrollments.find(
-                {"class_id": class_id, "risk": {"$in": ["High", "Medium"]}}
-            ).sort("student_email", 1)
-            for doc in cursor:
-                alerts.append({
-                    "student_email": doc["student_email"],
-                    "risk": doc.get("risk"),
-                    "class_id": class_id,
-                    "subject_code": subject_code,
-                    "subject_name": subject_name,
-                })
-        return alerts
+        pipeline = _instructor_enrollments_pipeline(instructor_id, {"risk": {"$in": ["High", "Medium"]}})
+        return [_risk_alert_row(doc) for doc in db.classes.aggregate(pipeline)]
     except ServerSelectionTimeoutError:
         raise HTTPException(status_code=503, detail="Database unavailable.")
 
 
 @router.get("/instructor-students")
-def list_instructor_students(instructor_id: str):
-    """List all students (enrollments) across the instructor's classes for the Student List page."""
+def list_instructor_students(
+    instructor_id: str,
+    request: Request,
+    response: Response,
+    limit: int | None = LimitParam,
+    after: str | None = AfterParam,
+):
+    """List all students (enrollments) across the instructor's classes for the Student List page.
+    Send `Accept: application/bson` to receive the rows as raw BSON documents."""
     try:
         db = get_db()
-        classes_cursor = db.classes.find({"instructor_id": instructor_id}).sort("subject_code", 1)
-        rows = []
-        for c in classes_cursor:
-            class_id = str(c["_id"])
-            subject_code = c.get("subject_code", "")
-            subject_name = c.get("subject_name", "")
-            cursor = db.enrollments.find({"class_id": class_id}).sort("student_email", 1)
-            for doc in cursor:
-                row = {
-                    "student_email": doc["student_email"],
-                    "class_id": class_id,
-                    "subject_code": subject_code,
-                    "subject_name": subject_name,
-                }
-                if doc.get("risk") is not None:
-                    row["risk"] = doc["risk"]
-                if doc.get("gpa") is not None:
-                    row["gpa"] = doc["gpa"]
-                if doc.get("attendance") is not None:
-                    row["attendance"] = doc["attendance"]
-                if doc.get("lms_activity") is not None:
-                    row["lms_activity"] = doc["lms_activity"]
-                rows.append(row)
-        return rows
+        pipeline = _instructor_enrollments_pipeline(
+            instructor_id,
+            after=decode_cursor(after, 3) if after else None,
+            limit=limit + 1 if limit is not None else None,
+        )
+        if projections.wants_bson(request):
+            if limit is None:
+                return projections.bson_batches_response(db.classes.aggregate_raw_batches(pipeline))
+            # a page is at most MAX_PAGE_SIZE + 1 rows; its last row decides X-Next-Cursor
+            rows = list(projections.raw(db.classes).aggregate(pipeline))
+            rows = page_result(rows, limit, _instructor_student_key, response)
+            return projections.bson_response(rows, headers=dict(response.headers))
+        rows = [_instructor_student_row(doc) for doc in db.classes.aggregate(pipeline)]
+        return page_result(rows, limit, _instructor_student_key, response)
     except ServerSelectionTimeoutError:
         raise HTTPException(status_code=503, detail="Database unavailable.")
 
@@ -90,16 +194,8 @@ def list_classes(instructor_id: str):
     """List all classes for an instructor."""
     try:
         db = get_db()
-        cursor = db.classes.find({"instructor_id": instructor_id}).sort("subject_code", 1)
-        classes = []
-        for doc in cursor:
-            class_id = str(doc["_id"])
-            count = db.enrollments.count_documents({"class_id": class_id})
-            at_risk = db.enrollments.count_documents(
-                {"class_id": class_id, "risk": {"$in": ["High", "Medium"]}}
-            )
-            classes.append(_doc_to_class_response(doc, count, at_risk))
-        return classes
+        cursor = db.classes.find({"instructor_id": instructor_id}, projections.CLASS_WITH_COUNTS).sort("subject_code", 1)
+        return [_doc_to_class_response(doc) for doc in cursor]
     except ServerSelectionTimeoutError:
         raise HTTPException(status_code=503, detail="Database unavailable.")
 
@@ -111,14 +207,10 @@ def get_class(class_id: str):
         db = get_db()
         if not ObjectId.is_valid(class_id):
             raise HTTPException(status_code=404, detail="Class not found")
-        doc = db.classes.find_one({"_id": ObjectId(class_id)})
+        doc = db.classes.find_one({"_id": ObjectId(class_id)}, projections.CLASS_WITH_COUNTS)
         if not doc:
             raise HTTPException(status_code=404, detail="Class not found")
-        count = db.enrollments.count_documents({"class_id": class_id})
-        at_risk = db.enrollments.count_documents(
-            {"class_id": class_id, "risk": {"$in": ["High", "Medium"]}}
-        )
-        return _doc_to_class_response(doc, count, at_risk)
+        return _doc_to_class_response(doc)
     except ServerSelectionTimeoutError:
         raise HTTPException(status_code=503, detail="Database unavailable.")
 
@@ -132,39 +224,39 @@ def create_class(body: ClassCreate):
             "subject_code": body.subject_code.strip(),
             "subject_name": body.subject_name.strip(),
             "instructor_id": body.instructor_id.strip(),
+            **class_counters.zero(),
         }
         result = db.classes.insert_one(doc)
         doc["_id"] = result.inserted_id
-        return _doc_to_class_response(doc, 0)
+        _known_classes.set(str(result.inserted_id), True)
+        rollups.class_created(db, doc)
+        scope.invalidate()
+        data_version.bump(db, data_version.CLASSES)
+        return _doc_to_class_response(doc)
     except ServerSelectionTimeoutError:
         raise HTTPException(status_code=503, detail="Database unavailable.")
 
 
 @router.get("/{class_id}/students")
-def list_class_students(class_id: str):
-    """List students enrolled in a class with optional academic/risk/flag data."""
+def list_class_students(class_id: str, request: Request):
+    """List students enrolled in a class with optional academic/risk/flag data.
+    Send `Accept: application/bson` to receive the rows as raw BSON documents."""
     try:
         db = get_db()
         if not ObjectId.is_valid(class_id):
             raise HTTPException(status_code=404, detail="Class not found")
-        if not db.classes.find_one({"_id": ObjectId(class_id)}):
+        if not db.classes.find_one({"_id": ObjectId(class_id)}, projections.ID_ONLY):
             raise HTTPException(status_code=404, detail="Class not found")
-        cursor = db.enrollments.find({"class_id": class_id}).sort("student_email", 1)
-        out = []
-        for doc in cursor:
-            row = {"student_email": doc["student_email"]}
-            if doc.get("risk") is not None:
-                row["risk"] = doc["risk"]
-            if doc.get("gpa") is not None:
-                row["gpa"] = doc["gpa"]
-            if doc.get("attendance") is not None:
-                row["attendance"] = doc["attendance"]
-            if doc.get("lms_activity") is not None:
-                row["lms_activity"] = doc["lms_activity"]
-            if doc.get("flagged_for_mentoring") is not None:
-                row["flagged_for_mentoring"] = doc["flagged_for_mentoring"]
-            out.append(row)
-        return out
+        query = {"class_id": class_id}
+        if projections.wants_bson(request):
+            batches = db.enrollments.aggregate_raw_batches([
+                {"$match": query},
+                {"$sort": {"student_email": 1}},
+                {"$project": projections.present_fields(projections.ENROLLMENT_ROW)},
+            ])
+            return projections.bson_batches_response(batches)
+        cursor = db.enrollments.find(query, projections.ENROLLMENT_ROW).sort("student_email", 1)
+        return [_class_student_row(doc) for doc in cursor]
     except ServerSelectionTimeoutError:
         raise HTTPException(status_code=503, detail="Database unavailable.")
 
@@ -176,25 +268,11 @@ def get_class_risk_summary(class_id: str):
         db = get_db()
         if not ObjectId.is_valid(class_id):
             raise HTTPException(status_code=404, detail="Class not found")
-        if not db.classes.find_one({"_id": ObjectId(class_id)}):
+        doc = db.classes.find_one({"_id": ObjectId(class_id)}, class_counters.PROJECTION)
+        if not doc:
             raise HTTPException(status_code=404, detail="Class not found")
-        cursor = list(db.enrollments.find({"class_id": class_id}))
-        total = len(cursor)
-        high_risk = sum(1 for d in cursor if d.get("risk") == "High")
-        medium_risk = sum(1 for d in cursor if d.get("risk") == "Medium")
-        low_risk = sum(1 for d in cursor if d.get("risk") == "Low")
-        at_risk_list = [
-            {"student_email": d["student_email"], "risk": d.get("risk")}
-            for d in cursor
-            if d.get("risk") in ("High", "Medium", "Low")
-        ]
-        return {
-            "total": total,
-            "high_risk": high_risk,
-            "medium_risk": medium_risk,
-            "low_risk": low_risk,
-            "at_risk_list": at_risk_list,
-        }
+        cursor = db.enrollments.find(_risk_list_query(class_id), {"_id": 0, "student_email": 1, "risk": 1})
+        return _risk_summary(doc, list(cursor))
     except ServerSelectionTimeoutError:
         raise HTTPException(status_code=503, detail="Database unavailable.")
 
@@ -204,16 +282,16 @@ def add_student_to_class(class_id: str, body: AddStudentToClassRequest):
     """Add a student to a class by email."""
     try:
         db = get_db()
-        if not ObjectId.is_valid(class_id):
-            raise HTTPException(status_code=404, detail="Class not found")
-        doc = db.classes.find_one({"_id": ObjectId(class_id)})
-        if not doc:
+        if not _class_exists(db, class_id):
             raise HTTPException(status_code=404, detail="Class not found")
         email = body.email.strip().lower()
-        existing = db.enrollments.find_one({"class_id": class_id, "student_email": email})
+        existing = db.enrollments.find_one({"class_id": class_id, "student_email": email}, projections.ID_ONLY)
         if existing:
             raise HTTPException(status_code=400, detail="Student is already in this class.")
         db.enrollments.insert_one({"class_id": class_id, "student_email": email})
+        rollups.enrollments_changed(db, class_id, added=1)
+        student_view.invalidate(email)
+        data_version.bump(db, data_version.ENROLLMENTS)
         return {"message": "Student added to class.", "email": body.email}
     except ServerSelectionTimeoutError:
         raise HTTPException(status_code=503, detail="Database unavailable.")
@@ -224,47 +302,90 @@ def batch_add_students_to_class(class_id: str, body: BatchAddStudentsRequest):
     """Add multiple students to a class by email list."""
     try:
         db = get_db()
-        if not ObjectId.is_valid(class_id):
+        if not _class_exists(db, class_id):
             raise HTTPException(status_code=404, detail="Class not found")
-        if not db.classes.find_one({"_id": ObjectId(class_id)}):
+        emails = [e for e in (raw.strip().lower() for raw in body.emails) if e]
+        if not emails:
+            return {"message": "Batch add complete.", "added": 0, "skipped": 0, "results": []}
+        # Unordered insert: the unique (class_id, student_email) index rejects students already
+        # in the class (and repeats within the list) without stopping the rest of the batch.
+        # Other write errors are reported per row, so rows that were inserted are still counted.
+        duplicate_indexes, failed = set(), {}
+        try:
+            db.enrollments.insert_many(
+                [{"class_id": class_id, "student_email": email} for email in emails],
+                ordered=False,
+            )
+        except BulkWriteError as e:
+            for err in e.details.get("writeErrors", []):
+                if err.get("code") == 11000:
+                    duplicate_indexes.add(err["index"])
+                else:
+                    failed[err["index"]] = err.get("errmsg", "Write failed.")
+        results = []
+        for i, email in enumerate(emails):
+            if i in failed:
+                results.append({"email": email, "status": "error", "error": failed[i]})
+            else:
+                results.append({"email": email, "status": "skipped" if i in duplicate_indexes else "added"})
+        skipped = len(duplicate_indexes)
+        added = [email for i, email in enumerate(emails) if i not in duplicate_indexes and i not in failed]
+        rollups.enrollments_changed(db, class_id, added=len(added))
+        if added:
+            data_version.bump(db, data_version.ENROLLMENTS)
+            student_view.invalidate(*added)
+        return {
+            "message": "Batch add complete.",
+            "added": len(added),
+            "skipped": skipped,
+            "failed": len(failed),
+            "results": results,
+        }
+    except ServerSelectionTimeoutError:
+        raise HTTPException(status_code=503, detail="Database unavailable.")
+
+
+@router.patch("/{class_id}/students")
+def batch_update_enrollments(class_id: str, body: BatchUpdateEnrollmentsRequest):
+    """Update many students of a class in one request (spreadsheet-style grade entry).
+    Students listed more than once get their updates merged in order."""
+    try:
+        db = get_db()
+        if not _class_exists(db, class_id):
             raise HTTPException(status_code=404, detail="Class not found")
-        added = 0
-        skipped = 0
-        for raw in body.emails:
-            email = raw.strip().lower()
-            if not email:
-                continue
-            existing = db.enrollments.find_one({"class_id": class_id, "student_email": email})
-            if existing:
-                skipped += 1
-                continue
-            db.enrollments.insert_one({"class_id": class_id, "student_email": email})
-            added += 1
-        return {"message": "Batch add complete.", "added": added, "skipped": skipped}
+        updates: dict[tuple[str, str], dict] = {}
+        for item in body.updates:
+            payload = item.model_dump(exclude_unset=True, exclude={"student_email"})
+            if payload:
+                updates.setdefault((class_id, item.student_email.strip().lower()), {}).update(payload)
+        updated, missing = enrollment_updates.update_many(db, updates)
+        return {
+            "message": "Batch update complete.",
+            "updated": updated,
+            "not_enrolled": [email for _, email in missing],
+        }
     except ServerSelectionTimeoutError:
         raise HTTPException(status_code=503, detail="Database unavailable.")
 
 
 @router.patch("/{class_id}/students/{student_email:path}")
 def update_enrollment(class_id: str, student_email: str, body: UpdateEnrollmentRequest):
-    """Update academic indicators, risk, or flagged_for_mentoring for a student in the class."""
+    """Update academic indicators, risk, or flagged_for_mentoring for a student in the class.
+    New indicators rescore the risk label (app/scoring.py) unless risk was set by hand.
+    One find_one_and_update; the class is only looked up (through the cache) when the student
+    is not enrolled, to tell the two 404s apart."""
     try:
         db = get_db()
-        if not ObjectId.is_valid(class_id):
-            raise HTTPException(status_code=404, detail="Class not found")
-        if not db.classes.find_one({"_id": ObjectId(class_id)}):
-            raise HTTPException(status_code=404, detail="Class not found")
         email = student_email.strip().lower()
-        doc = db.enrollments.find_one({"class_id": class_id, "student_email": email})
-        if not doc:
-            raise HTTPException(status_code=404, detail="Student not enrolled in this class.")
         payload = body.model_dump(exclude_unset=True)
         if not payload:
+            if not _class_exists(db, class_id):
+                raise HTTPException(status_code=404, detail="Class not found")
             return {"message": "No updates.", "student_email": email}
-        db.enrollments.update_one(
-            {"class_id": class_id, "student_email": email},
-            {"$set": payload},
-        )
+        if not enrollment_updates.update_one(db, class_id, email, payload):
+            if not _class_exists(db, class_id):
+                raise HTTPException(status_code=404, detail="Class not found")
+            raise HTTPException(status_code=404, detail="Student not enrolled in this class.")
         return {"message": "Enrollment updated.", "student_email": email}
     except ServerSelectionTimeoutError:
         raise HTTPException(status_code=503, detail="Database unavailable.")
@@ -0,0 +1,115 @@
+"""
+Async (Motor) versions of the instructor read routes in classes.py.
+
+Mounted ahead of classes.router when MONGODB_DRIVER=async, so these paths are served by
+async def handlers on the event loop instead of sync handlers in the threadpool. Queries,
+pipelines and row shapes are shared with classes.py so both modes return identical output;
+write routes stay on the sync router.
+"""
+from bson import ObjectId
+from fastapi import APIRouter, HTTPException, Response
+from pymongo.errors import ServerSelectionTimeoutError
+
+from app import class_counters, projections
+from app.database import get_async_db
+from app.pagination import AfterParam, LimitParam, decode_cursor, page_result
+from app.routers.classes import (
+    _class_student_row,
+    _doc_to_class_response,
+    _instructor_enrollments_pipeline,
+    _instructor_student_key,
+    _instructor_student_row,
+    _risk_alert_row,
+    _risk_list_query,
+    _risk_summary,
+)
+from app.schemas import ClassResponse
+
+router = APIRouter()
+
+
+async def _require_class(db, class_id: str, projection: dict = projections.CLASS) -> dict:
+    if not ObjectId.is_valid(class_id):
+        raise HTTPException(status_code=404, detail="Class not found")
+    doc = await db.classes.find_one({"_id": ObjectId(class_id)}, projection)
+    if not doc:
+        raise HTTPException(status_code=404, detail="Class not found")
+    return doc
+
+
+@router.get("/risk-alerts")
+async def list_instructor_risk_alerts(instructor_id: str):
+    """List all medium/high risk students across the instructor's classes (for Risk Alerts page)."""
+    try:
+        db = get_async_db()
+        pipeline = _instructor_enrollments_pipeline(instructor_id, {"risk": {"$in": ["High", "Medium"]}})
+        return [_risk_alert_row(doc) async for doc in db.classes.aggregate(pipeline)]
+    except ServerSelectionTimeoutError:
+        raise HTTPException(status_code=503, detail="Database unavailable.")
+
+
+@router.get("/instructor-students")
+async def list_instructor_students(
+    instructor_id: str,
+    response: Response,
+    limit: int | None = LimitParam,
+    after: str | None = AfterParam,
+):
+    """List all students (enrollments) across the instructor's classes for the Student List page."""
+    try:
+        db = get_async_db()
+        pipeline = _instructor_enrollments_pipeline(
+            instructor_id,
+            after=decode_cursor(after, 3) if after else None,
+            limit=limit + 1 if limit is not None else None,
+        )
+        rows = [_instructor_student_row(doc) async for doc in db.classes.aggregate(pipeline)]
+        return page_result(rows, limit, _instructor_student_key, response)
+    except ServerSelectionTimeoutError:
+        raise HTTPException(status_code=503, detail="Database unavailable.")
+
+
+@router.get("", response_model=list[ClassResponse])
+async def list_classes(instructor_id: str):
+    """List all classes for an instructor."""
+    try:
+        db = get_async_db()
+        cursor = db.classes.find({"instructor_id": instructor_id}, projections.CLASS_WITH_COUNTS).sort("subject_code", 1)
+        return [_doc_to_class_response(doc) async for doc in cursor]
+    except ServerSelectionTimeoutError:
+        raise HTTPException(status_code=503, detail="Database unavailable.")
+
+
+@router.get("/{class_id}", response_model=ClassResponse)
+async def get_class(class_id: str):
+    """Get a single class by id."""
+    try:
+        db = get_async_db()
+        doc = await _require_class(db, class_id, projections.CLASS_WITH_COUNTS)
+        return _doc_to_class_response(doc)
+    except ServerSelectionTimeoutError:
+        raise HTTPException(status_code=503, detail="Database unavailable.")
+
+
+@router.get("/{class_id}/students")
+async def list_class_students(class_id: str):
+    """List students enrolled in a class with optional academic/risk/flag data."""
+    try:
+        db = get_async_db()
+        await _require_class(db, class_id)
+        cursor = db.enrollments.find({"class_id": class_id}, projections.ENROLLMENT_ROW).sort("student_email", 1)
+        return [_class_student_row(doc) async for doc in cursor]
+    except ServerSelectionTimeoutError:
+        raise HTTPException(status_code=503, detail="Database unavailable.")
+
+
+@router.get("/{class_id}/risk-summary")
+async def get_class_risk_summary(class_id: str):
+    """Class-level risk summary: counts by risk level and list of at-risk students."""
+    try:
+        db = get_async_db()
+        doc = await _require_class(db, class_id, class_counters.PROJECTION)
+        cursor = db.enrollments.find(_risk_list_query(class_id), {"_id": 0, "student_email": 1, "risk": 1})
+        return _risk_summary(doc, await cursor.to_list(None))
+    except ServerSelectionTimeoutError:
+        raise HTTPException(status_code=503, detail="Database unavailable.")
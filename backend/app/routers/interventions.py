@@ -1,8 +1,10 @@
 from bson import ObjectId
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Response
 from pymongo import ReturnDocument
 
+from app import data_version, projections
 from app.database import get_db
+from app.pagination import AfterParam, LimitParam, paginate_find
 from app.schemas import InterventionCreate, InterventionResponse, InterventionUpdate
 
 router = APIRouter()
@@ -15,13 +17,18 @@ def _doc_to_response(doc) -> dict:
 
 
 @router.get("", response_model=list[InterventionResponse])
-def list_interventions(status: str | None = None):
+def list_interventions(
+    response: Response,
+    status: str | None = None,
+    limit: int | None = LimitParam,
+    after: str | None = AfterParam,
+):
     db = get_db()
     q = {}
     if status:
         q["status"] = status
-    cursor = db.interventions.find(q)
-    return [_doc_to_response(d) for d in cursor]
+    docs = paginate_find(db.interventions, q, ["_id"], limit, after, response, projections.INTERVENTION)
+    return [_doc_to_response(d) for d in docs]
 
 
 @router.get("/{intervention_id}", response_model=InterventionResponse)
@@ -29,7 +36,7 @@ def get_intervention(intervention_id: str):
     db = get_db()
     if not ObjectId.is_valid(intervention_id):
         raise HTTPException(status_code=404, detail="Intervention not found")
-    doc = db.interventions.find_one({"_id": ObjectId(intervention_id)})
+    doc = db.interventions.find_one({"_id": ObjectId(intervention_id)}, projections.INTERVENTION)
     if not doc:
         raise HTTPException(status_code=404, detail="Intervention not found")
     return _doc_to_response(doc)
@@ -41,6 +48,7 @@ def create_intervention(body: InterventionCreate):
     doc = body.model_dump()
     result = db.interventions.insert_one(doc)
     doc["_id"] = result.inserted_id
+    data_version.bump(db, data_version.INTERVENTIONS)
     return _doc_to_response(doc)
 
 
@@ -53,10 +61,12 @@ def update_intervention(intervention_id: str, body: InterventionUpdate):
     result = db.interventions.find_one_and_update(
         {"_id": ObjectId(intervention_id)},
         {"$set": payload},
+        projection=projections.INTERVENTION,
         return_document=ReturnDocument.AFTER,
     )
     if not result:
         raise HTTPException(status_code=404, detail="Intervention not found")
+    data_version.bump(db, data_version.INTERVENTIONS)
     return _doc_to_response(result)
 
 
@@ -68,3 +78,4 @@ def delete_intervention(intervention_id: str):
     result = db.interventions.delete_one({"_id": ObjectId(intervention_id)})
     if not result.deleted_count:
         raise HTTPException(status_code=404, detail="Intervention not found")
+    data_version.bump(db, data_version.INTERVENTIONS)
@@ -1,13 +1,28 @@
 from bson import ObjectId
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Response
 from pymongo import ReturnDocument
 
+from app import projections
 from app.database import get_db
+from app.pagination import AfterParam, LimitParam, paginate_find
 from app.schemas import NotificationCreate, NotificationResponse, NotificationUpdate
 
 router = APIRouter()
 
 
+def _role_filter(role: str, instructor_id: str | None) -> dict:
+    """Notifications visible to a role. Instructors see role-wide notifications plus the risk
+    alerts for their own classes (app/risk_alerts.py), never other instructors' alerts."""
+    if role not in ("instructor", "admin", "amu-staff"):
+        raise HTTPException(status_code=400, detail="Invalid role")
+    if role != "instructor":
+        return {"role": role}
+    owners = [{"instructor_id": {"$exists": False}}]
+    if instructor_id:
+        owners.append({"instructor_id": instructor_id})
+    return {"role": role, "$or": owners}
+
+
 def _doc_to_response(doc) -> dict:
     out = {k: v for k, v in doc.items() if k != "_id"}
     out["id"] = str(doc["_id"])
@@ -15,12 +30,17 @@ def _doc_to_response(doc) -> dict:
 
 
 @router.get("", response_model=list[NotificationResponse])
-def list_notifications(role: str):
-    if role not in ("instructor", "admin", "amu-staff"):
-        raise HTTPException(status_code=400, detail="Invalid role")
+def list_notifications(
+    role: str,
+    response: Response,
+    instructor_id: str | None = None,
+    limit: int | None = LimitParam,
+    after: str | None = AfterParam,
+):
+    query = _role_filter(role, instructor_id)
     db = get_db()
-    cursor = db.notifications.find({"role": role})
-    return [_doc_to_response(d) for d in cursor]
+    docs = paginate_find(db.notifications, query, ["_id"], limit, after, response, projections.NOTIFICATION)
+    return [_doc_to_response(d) for d in docs]
 
 
 @router.post("", response_model=NotificationResponse, status_code=201)
@@ -41,6 +61,7 @@ def mark_notification_read(notification_id: str, body: NotificationUpdate):
     result = db.notifications.find_one_and_update(
         {"_id": ObjectId(notification_id)},
         {"$set": payload},
+        projection=projections.NOTIFICATION,
         return_document=ReturnDocument.AFTER,
     )
     if not result:
@@ -49,9 +70,8 @@ def mark_notification_read(notification_id: str, body: NotificationUpdate):
 
 
 @router.post("/{role}/mark-all-read")
-def mark_all_read(role: str):
-    if role not in ("instructor", "admin", "amu-staff"):
-        raise HTTPException(status_code=400, detail="Invalid role")
+def mark_all_read(role: str, instructor_id: str | None = None):
+    query = _role_filter(role, instructor_id)
     db = get_db()
-    db.notifications.update_many({"role": role}, {"$set": {"read": True}})
+    db.notifications.update_many(query, {"$set": {"read": True}})
     return {"ok": True}
@@ -1,8 +1,11 @@
 from bson import ObjectId
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Response
 from pymongo import ReturnDocument
 
+from app import projections
 from app.database import get_db
+from app.pagination import AfterParam, LimitParam, paginate_find
+from app.search import DEFAULT_SEARCH_LIMIT, search_pipeline, search_terms
 from app.schemas import StudentCreate, StudentResponse, StudentUpdate
 
 router = APIRouter()
@@ -15,18 +18,23 @@ def _doc_to_response(doc) -> dict:
 
 
 @router.get("", response_model=list[StudentResponse])
-def list_students(risk: str | None = None, search: str | None = None):
+def list_students(
+    response: Response,
+    risk: str | None = None,
+    search: str | None = None,
+    limit: int | None = LimitParam,
+    after: str | None = AfterParam,
+):
     db = get_db()
     q = {}
     if risk:
         q["risk"] = risk
-    if search:
-        q["$or"] = [
-            {"name": {"$regex": search, "$options": "i"}},
-            {"email": {"$regex": search, "$options": "i"}},
-        ]
-    cursor = db.students.find(q)
-    return [_doc_to_response(d) for d in cursor]
+    if search and search.strip():
+        # Relevance-ordered prefix search; returns the best `limit` matches (no cursor).
+        pipeline = search_pipeline(q, search, projections.STUDENT, limit or DEFAULT_SEARCH_LIMIT)
+        return [_doc_to_response(d) for d in db.students.aggregate(pipeline)]
+    docs = paginate_find(db.students, q, ["_id"], limit, after, response, projections.STUDENT)
+    return [_doc_to_response(d) for d in docs]
 
 
 @router.get("/{student_id}", response_model=StudentResponse)
@@ -34,7 +42,7 @@ def get_student(student_id: str):
     db = get_db()
     if not ObjectId.is_valid(student_id):
         raise HTTPException(status_code=404, detail="Student not found")
-    doc = db.students.find_one({"_id": ObjectId(student_id)})
+    doc = db.students.find_one({"_id": ObjectId(student_id)}, projections.STUDENT)
     if not doc:
         raise HTTPException(status_code=404, detail="Student not found")
     return _doc_to_response(doc)
@@ -44,6 +52,7 @@ def get_student(student_id: str):
 def create_student(body: StudentCreate):
     db = get_db()
     doc = body.model_dump()
+    doc["search_terms"] = search_terms(doc["name"], doc["email"])
     result = db.students.insert_one(doc)
     doc["_id"] = result.inserted_id
     return _doc_to_response(doc)
@@ -58,10 +67,14 @@ def update_student(student_id: str, body: StudentUpdate):
     result = db.students.find_one_and_update(
         {"_id": ObjectId(student_id)},
         {"$set": payload},
+        projection=projections.STUDENT,
         return_document=ReturnDocument.AFTER,
     )
     if not result:
         raise HTTPException(status_code=404, detail="Student not found")
+    if "name" in payload or "email" in payload:
+        result["search_terms"] = search_terms(result.get("name"), result.get("email"))
+        db.students.update_one({"_id": result["_id"]}, {"$set": {"search_terms": result["search_terms"]}})
     return _doc_to_response(result)
 
 
@@ -1,8 +1,11 @@
 from bson import ObjectId
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Response
 from pymongo import ReturnDocument
 
+from app import data_version, identity, projections, rollups, scope
 from app.database import get_db, get_collection_for_role, ROLE_COLLECTIONS
+from app.pagination import AfterParam, LimitParam, paginate_find_many
+from app.search import DEFAULT_SEARCH_LIMIT, rank, search_pipeline, search_terms
 from app.routers.auth import _hash_password
 from app.schemas import UserCreate, UserResponse, UserUpdate
 
@@ -10,49 +13,54 @@ router = APIRouter()
 
 
 def _user_doc_to_response(doc, role: str) -> dict:
-    out = {k: v for k, v in doc.items() if k != "_id" and k != "password_hash"}
+    out = {k: v for k, v in doc.items() if k not in ("_id", "password_hash", "search_terms")}
     out["id"] = str(doc["_id"])
     out["role"] = role
     return out
 
 
-def _find_user_by_id(db, user_id: str):
+def _find_user_by_id(db, user_id: str, projection: dict | None = None):
     """Return (doc, collection_name) if found in any role collection, else (None, None)."""
-    if not ObjectId.is_valid(user_id):
-        return None, None
-    oid = ObjectId(user_id)
-    for coll_name in ROLE_COLLECTIONS:
-        doc = db[coll_name].find_one({"_id": oid})
-        if doc:
-            return doc, coll_name
-    return None, None
+    return identity.find_user_by_id(db, user_id, projection)
 
 
 @router.get("", response_model=list[UserResponse])
-def list_users(role: str | None = None, search: str | None = None):
+def list_users(
+    response: Response,
+    role: str | None = None,
+    search: str | None = None,
+    limit: int | None = LimitParam,
+    after: str | None = AfterParam,
+):
     db = get_db()
     collections_to_query = (
         [get_collection_for_role(role)] if role and role != "all" else ROLE_COLLECTIONS
     )
     role_to_name = {"instructor": "instructor", "admin": "admin", "amustaff": "amu-staff"}
+    if search and search.strip():
+        # Relevance-ordered prefix search across role collections; best `limit` matches (no cursor).
+        # Each collection returns its own best `limit`, merged here in the same order.
+        size = limit or DEFAULT_SEARCH_LIMIT
+        pipeline = search_pipeline({}, search, projections.USER, size)
+        candidates = [
+            (doc, coll_name)
+            for coll_name in collections_to_query
+            for doc in db[coll_name].aggregate(pipeline)
+        ]
+        found = rank(candidates, search, size, key=lambda pair: pair[0])
+    else:
+        found = paginate_find_many(db, collections_to_query, {}, limit, after, response, projections.USER)
     out = []
-    for coll_name in collections_to_query:
-        q = {}
-        if search:
-            q["$or"] = [
-                {"name": {"$regex": search, "$options": "i"}},
-                {"email": {"$regex": search, "$options": "i"}},
-            ]
-        for doc in db[coll_name].find(q):
-            role_val = doc.get("role") or role_to_name.get(coll_name, coll_name)
-            out.append(_user_doc_to_response(doc, role_val))
+    for doc, coll_name in found:
+        role_val = doc.get("role") or role_to_name.get(coll_name, coll_name)
+        out.append(_user_doc_to_response(doc, role_val))
     return out
 
 
 @router.get("/{user_id}", response_model=UserResponse)
 def get_user(user_id: str):
     db = get_db()
-    doc, _ = _find_user_by_id(db, user_id)
+    doc, _ = _find_user_by_id(db, user_id, projections.USER)
     if not doc:
         raise HTTPException(status_code=404, detail="User not found")
     role = doc.get("role", "instructor")
@@ -64,21 +72,27 @@ def create_user(body: UserCreate):
     db = get_db()
     coll_name = get_collection_for_role(body.role)
     coll = db[coll_name]
-    if coll.find_one({"email": body.email}):
+    if coll.find_one({"email": body.email}, projections.ID_ONLY):
         raise HTTPException(status_code=400, detail="Email already registered")
     doc = body.model_dump()
     password = doc.pop("password", None)
     if password:
         doc["password_hash"] = _hash_password(password)
+    doc["search_terms"] = search_terms(doc["name"], doc["email"])
     result = coll.insert_one(doc)
     doc["_id"] = result.inserted_id
+    identity.register(db, coll_name, doc)
+    if coll_name == "instructor":
+        rollups.instructor_changed(db, str(doc["_id"]))
+        scope.invalidate()
+        data_version.bump(db, data_version.INSTRUCTORS)
     return _user_doc_to_response(doc, body.role)
 
 
 @router.patch("/{user_id}", response_model=UserResponse)
 def update_user(user_id: str, body: UserUpdate):
     db = get_db()
-    doc, coll_name = _find_user_by_id(db, user_id)
+    doc, coll_name = _find_user_by_id(db, user_id, projections.ID_ONLY)
     if not doc:
         raise HTTPException(status_code=404, detail="User not found")
     payload = body.model_dump(exclude_unset=True)
@@ -86,10 +100,21 @@ def update_user(user_id: str, body: UserUpdate):
     result = db[coll_name].find_one_and_update(
         {"_id": ObjectId(user_id)},
         {"$set": payload},
+        projection=projections.USER,
         return_document=ReturnDocument.AFTER,
     )
     if not result:
         raise HTTPException(status_code=404, detail="User not found")
+    if "name" in payload or "email" in payload:
+        terms = search_terms(result.get("name"), result.get("email"))
+        db[coll_name].update_one({"_id": result["_id"]}, {"$set": {"search_terms": terms}})
+    if "email" in payload:
+        identity.register(db, coll_name, result)
+    if coll_name == "instructor":
+        if "department" in payload:
+            rollups.instructor_changed(db, user_id)
+        scope.invalidate()
+        data_version.bump(db, data_version.INSTRUCTORS)
     role = result.get("role", "instructor")
     return _user_doc_to_response(result, role)
 
@@ -97,9 +122,14 @@ def update_user(user_id: str, body: UserUpdate):
 @router.delete("/{user_id}", status_code=204)
 def delete_user(user_id: str):
     db = get_db()
-    doc, coll_name = _find_user_by_id(db, user_id)
+    doc, coll_name = _find_user_by_id(db, user_id, projections.ID_ONLY)
     if not doc:
         raise HTTPException(status_code=404, detail="User not found")
     result = db[coll_name].delete_one({"_id": ObjectId(user_id)})
     if not result.deleted_count:
         raise HTTPException(status_code=404, detail="User not found")
+    identity.forget(db, user_id)
+    if coll_name == "instructor":
+        rollups.instructor_changed(db, user_id)
+        scope.invalidate()
+        data_version.bump(db, data_version.INSTRUCTORS)
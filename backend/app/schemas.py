@@ -177,3 +177,14 @@ class UpdateEnrollmentRequest(BaseModel):
     lms_activity: Optional[float] = Field(None, ge=0, le=100)
     risk: Optional[Literal["High", "Medium", "Low"]] = None
     flagged_for_mentoring: Optional[bool] = None
+    # Recorded after the term ends; evaluated against the risk label (app/evaluation.py)
+    term: Optional[str] = Field(None, min_length=1, max_length=40)
+    outcome: Optional[Literal["passed", "failed", "withdrawn"]] = None
+
+
+class BatchUpdateEnrollmentItem(UpdateEnrollmentRequest):
+    student_email: EmailStr
+
+
+class BatchUpdateEnrollmentsRequest(BaseModel):
+    updates: list[BatchUpdateEnrollmentItem] = Field(..., min_length=1, max_length=500)
@@ -0,0 +1,87 @@
+"""
+Cached department → instructors → classes scope resolution for admin endpoints.
+
+Admin reads are filtered by instructor department, which used to mean listing the
+department's instructors, then their classes, on every request (several times per page
+load). resolve() instead answers from an in-memory snapshot of every instructor and class,
+loaded once and reused until it expires (SCOPE_CACHE_TTL_SECONDS, default 60) or a write
+calls invalidate(). Resolved scopes are memoized per department and expose the class ids
+as a tuple ready for a `{"$in": ...}` filter.
+
+The snapshot is per process: writes made through another worker become visible here when
+the TTL expires.
+"""
+import os
+import threading
+import time
+
+from app import projections
+
+
+def _ttl_seconds() -> float:
+    return float(os.getenv("SCOPE_CACHE_TTL_SECONDS", "60"))
+
+
+class Scope:
+    """Instructors and classes visible under one department filter (or all departments)."""
+
+    __slots__ = ("department", "instructor_ids", "class_ids", "classes", "instructors")
+
+    def __init__(self, department, instructor_ids, classes, instructors):
+        self.department = department
+        self.instructor_ids = frozenset(instructor_ids)
+        self.classes = {cid: c for cid, c in classes.items() if c.get("instructor_id") in self.instructor_ids}
+        self.class_ids = tuple(self.classes)
+        # every instructor by str id (not only this scope's): rows show the class owner's name
+        self.instructors = instructors
+
+
+class _Snapshot:
+    def __init__(self, db):
+        self.loaded_at = time.monotonic()
+        self.instructors = {
+            str(doc["_id"]): doc for doc in db.instructor.find({}, projections.INSTRUCTOR_SUMMARY)
+        }
+        self.classes = {str(doc["_id"]): doc for doc in db.classes.find({}, projections.CLASS)}
+        self.scopes: dict[str | None, Scope] = {}
+
+    def departments(self) -> list[str]:
+        return sorted({inst.get("department") for inst in self.instructors.values() if inst.get("department")})
+
+    def scope(self, department: str | None) -> Scope:
+        key = department if department and department != "all" else None
+        if key not in self.scopes:
+            ids = [iid for iid, inst in self.instructors.items() if key is None or inst.get("department") == key]
+            self.scopes[key] = Scope(key, ids, self.classes, self.instructors)
+        return self.scopes[key]
+
+
+_lock = threading.Lock()
+_snapshot: _Snapshot | None = None
+
+
+def _current(db) -> _Snapshot:
+    global _snapshot
+    with _lock:
+        if _snapshot is None or time.monotonic() - _snapshot.loaded_at > _ttl_seconds():
+            _snapshot = _Snapshot(db)
+        return _snapshot
+
+
+def resolve(db, department: str | None) -> Scope:
+    """Scope for a department filter; None or "all" means every instructor."""
+    snapshot = _current(db)
+    with _lock:
+        return snapshot.scope(department)
+
+
+def departments(db) -> list[str]:
+    """Sorted distinct instructor departments."""
+    return _current(db).departments()
+
+
+def invalidate():
+    """Drop the snapshot; call after creating classes or creating/updating/deleting instructors."""
+    global _snapshot
+    with _lock:
+        _snapshot = None
@@ -0,0 +1,176 @@
+"""
+Risk scoring from the academic indicators stored on enrollments (gpa, attendance,
+lms_activity).
+
+Each indicator is normalised to 0..1 (gpa / 4, attendance / 100, lms_activity / 100) and the
+risk score is one minus their weighted mean, with the weights of missing indicators spread
+over the ones present. A score of HIGH_THRESHOLD or more is High, MEDIUM_THRESHOLD or more is
+Medium, anything lower is Low; enrollments without indicators keep their label.
+
+Labels set by hand (`risk_source: "manual"`, written by PATCH .../students/{email} when it
+carries `risk`) are never overwritten. rescore_all() scores every enrollment in one vectorized
+pass and writes back only the labels that changed; label_update() rescores a single enrollment
+when an update changes its indicators.
+"""
+from collections import defaultdict
+
+import numpy as np
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app import data_version, risk_alerts, rollups, student_view
+from app.indicators import INDICATORS, to_float
+
+WEIGHTS = {"gpa": 0.5, "attendance": 0.3, "lms_activity": 0.2}
+SCALES = {"gpa": 4.0, "attendance": 100.0, "lms_activity": 100.0}
+HIGH_THRESHOLD = 0.5
+MEDIUM_THRESHOLD = 0.3
+LABELS = ("Low", "Medium", "High")
+MANUAL = "manual"
+MODEL = "model"
+WRITE_BATCH = 1000
+# Stamped by conditional bulk writes so the ops that matched can be told apart afterwards;
+# removed again by write_matched().
+WRITE_RUN = "write_run"
+
+
+def score(values: dict) -> np.ndarray:
+    """Risk scores (NaN where no indicator is present) for arrays of indicator values."""
+    total = weight = None
+    for name in INDICATORS:
+        x = np.clip(np.asarray(values[name], dtype=np.float64) / SCALES[name], 0.0, 1.0)
+        present = ~np.isnan(x)
+        w = np.where(present, WEIGHTS[name], 0.0)
+        term = np.where(present, x, 0.0) * w
+        total = term if total is None else total + term
+        weight = w if weight is None else weight + w
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return 1.0 - total / weight
+
+
+def label_codes(scores: np.ndarray) -> np.ndarray:
+    """Index into LABELS per score, -1 where the score is NaN."""
+    codes = np.where(scores >= HIGH_THRESHOLD, 2, np.where(scores >= MEDIUM_THRESHOLD, 1, 0)).astype(np.int8)
+    codes[np.isnan(scores)] = -1
+    return codes
+
+
+def label_for(doc: dict) -> str | None:
+    """Risk label for one enrollment's indicators, or None when it has none."""
+    code = label_codes(score({name: [to_float(doc.get(name))] for name in INDICATORS}))[0]
+    return LABELS[code] if code >= 0 else None
+
+
+def label_update(doc: dict, payload: dict):
+    """Complete an enrollment update in place: a `risk` in the update becomes a manual label,
+    new indicators rescore a label that was not set by hand."""
+    if "risk" in payload:
+        payload["risk_source"] = MANUAL
+    elif doc.get("risk_source") != MANUAL and any(name in payload for name in INDICATORS):
+        label = label_for({**doc, **payload})
+        if label:
+            payload.update(risk=label, risk_source=MODEL)
+
+
+def risk_update_stages() -> list[dict]:
+    """Update-pipeline stages that rescore a document server-side after its indicators were
+    set, with the same formula as score(); hand-set labels and documents without indicators
+    keep their risk. Only numeric values count as present, as in indicators.to_float(), so
+    label_update() predicts the label this pipeline writes."""
+    weights, terms = [], []
+    for name in INDICATORS:
+        present = {"$isNumber": f"${name}"}
+        scaled = {"$min": [1.0, {"$max": [0.0, {"$divide": [f"${name}", SCALES[name]]}]}]}
+        weights.append({"$cond": [present, WEIGHTS[name], 0.0]})
+        terms.append({"$cond": [present, {"$multiply": [scaled, WEIGHTS[name]]}, 0.0]})
+    label = {"$switch": {
+        "branches": [
+            {"case": {"$gte": ["$$score", HIGH_THRESHOLD]}, "then": "High"},
+            {"case": {"$gte": ["$$score", MEDIUM_THRESHOLD]}, "then": "Medium"},
+        ],
+        "default": "Low",
+    }}
+    keep = {"$or": [{"$eq": ["$risk_source", MANUAL]}, {"$eq": ["$$weight", 0]}]}
+    scored = {"$let": {"vars": {"score": {"$subtract": [1.0, {"$divide": ["$$total", "$$weight"]}]}}, "in": label}}
+    return [
+        {"$set": {"_score": {"total": {"$add": terms}, "weight": {"$add": weights}}}},
+        {"$set": {
+            "risk": {"$let": {"vars": {"total": "$_score.total", "weight": "$_score.weight"},
+                              "in": {"$cond": [keep, "$risk", scored]}}},
+            "risk_source": {"$let": {"vars": {"weight": "$_score.weight"},
+                                     "in": {"$cond": [keep, "$risk_source", MODEL]}}},
+        }},
+        {"$unset": "_score"},
+    ]
+
+
+def unchanged_filter(doc: dict, fields) -> dict:
+    """Filter that matches the document only while `fields` still hold the values read in doc."""
+    return {name: doc[name] if name in doc else {"$exists": False} for name in fields}
+
+
+def write_matched(db, batch: list, run: ObjectId) -> list:
+    """Write (op, item) pairs whose ops set WRITE_RUN to `run`, where item[0] is the enrollment
+    _id; returns the items whose op matched (their document was unchanged). The marker is
+    removed again once the matched ops are known."""
+    ids = [item[0] for _, item in batch]
+    result = db.enrollments.bulk_write([op for op, _ in batch], ordered=False)
+    if result.matched_count == len(batch):
+        matched = set(ids)
+    else:
+        matched = {doc["_id"] for doc in db.enrollments.find({"_id": {"$in": ids}, WRITE_RUN: run}, {"_id": 1})}
+    if matched:
+        db.enrollments.update_many({"_id": {"$in": list(matched)}, WRITE_RUN: run}, {"$unset": {WRITE_RUN: ""}})
+    return [item for _, item in batch if item[0] in matched]
+
+
+def rescore_all(db, dry_run: bool = False) -> dict:
+    """Rescore every enrollment and write back the labels that changed.
+    Returns {"scored", "changed"} counts.
+
+    Each write only applies while the enrollment's risk and indicators still hold the values
+    that were scored, so concurrent updates win; only writes that matched are booked in
+    rollups, alerts and student views (matched writes are told apart by their WRITE_RUN)."""
+    docs, current = [], []
+    columns = {name: [] for name in INDICATORS}
+    projection = {"class_id": 1, "student_email": 1, "risk": 1, "risk_source": 1, **{name: 1 for name in INDICATORS}}
+    cursor = db.enrollments.find({"risk_source": {"$ne": MANUAL}}, projection, batch_size=10_000)
+    for doc in cursor:
+        docs.append(doc)
+        current.append(LABELS.index(doc["risk"]) if doc.get("risk") in LABELS else -1)
+        for name in INDICATORS:
+            columns[name].append(to_float(doc.get(name)))
+
+    codes = label_codes(score(columns))
+    changed = np.flatnonzero((codes >= 0) & (codes != np.asarray(current, dtype=np.int8)))
+    scored = int((codes >= 0).sum())
+    if dry_run or not changed.size:
+        return {"scored": scored, "changed": int(changed.size)}
+
+    run = ObjectId()
+    booked, batch = [], []
+    for i in changed.tolist():
+        doc = docs[i]
+        old = LABELS[current[i]] if current[i] >= 0 else None
+        new = LABELS[codes[i]]
+        batch.append((UpdateOne(
+            {"_id": doc["_id"], **unchanged_filter(doc, ("risk", "risk_source", *INDICATORS))},
+            {"$set": {"risk": new, "risk_source": MODEL, WRITE_RUN: run}, "$currentDate": {"updated_at": True}},
+        ), (doc["_id"], doc.get("class_id"), doc.get("student_email"), old, new)))
+        if len(batch) == WRITE_BATCH:
+            booked += write_matched(db, batch, run)
+            batch = []
+    if batch:
+        booked += write_matched(db, batch, run)
+    if not booked:
+        return {"scored": scored, "changed": 0}
+
+    risk_changes = defaultdict(list)
+    for _, class_id, _, old, new in booked:
+        risk_changes[class_id].append((old, new))
+    for class_id, changes in risk_changes.items():
+        rollups.enrollments_changed(db, class_id, risk_changes=changes)
+    risk_alerts.record([(class_id, email, old, new) for _, class_id, email, old, new in booked])
+    data_version.bump(db, data_version.ENROLLMENTS)
+    student_view.invalidate(*{email for _, _, email, _, _ in booked})
+    return {"scored": scored, "changed": len(booked)}
@@ -0,0 +1,120 @@
+"""
+Prefix search over people (students and role-collection users).
+
+Each searchable document carries a `search_terms` array of lowercase keys derived from its
+name and email (name words, full email, email local part and its pieces, domain). A search
+matches documents where every query word is a prefix of some key, which MongoDB answers
+from the multikey index on search_terms instead of scanning with an unanchored $regex. Query
+words are split like the stored keys, so "o'brien" matches the keys "o" and "brien".
+Matches are ranked inside the database (exact word hits before prefix hits, then name) before
+the limit is applied, so a common prefix never crowds out an exact hit.
+"""
+import re
+
+from pymongo import UpdateOne
+
+from app.database import ROLE_COLLECTIONS
+
+SEARCHABLE_COLLECTIONS = ["students", *ROLE_COLLECTIONS]
+DEFAULT_SEARCH_LIMIT = 50
+
+_SPLIT = re.compile(r"[^0-9a-z]+")
+
+
+def search_terms(name: str | None, email: str | None) -> list[str]:
+    """Lowercase search keys for a person."""
+    terms = set()
+    name = (name or "").strip().lower()
+    email = (email or "").strip().lower()
+    terms.update(t for t in _SPLIT.split(name) if t)
+    if email:
+        terms.add(email)
+        local, _, domain = email.partition("@")
+        if local:
+            terms.add(local)
+            terms.update(t for t in _SPLIT.split(local) if t)
+        if domain:
+            terms.add(domain)
+    return sorted(terms)
+
+
+def _query_words(search: str) -> list[str]:
+    return [w for w in search.strip().lower().split() if w]
+
+
+def _pieces(word: str) -> list[str]:
+    return [t for t in _SPLIT.split(word) if t]
+
+
+def _exact_keys(search: str) -> list[str]:
+    """Keys that count as exact hits: each query word and the pieces it splits into."""
+    keys = set()
+    for word in _query_words(search):
+        keys.add(word)
+        keys.update(_pieces(word))
+    return sorted(keys)
+
+
+def _word_filter(word: str) -> dict:
+    # a whole word can prefix an email, local part or domain key; otherwise every piece
+    # must prefix a key, the same split the stored name and email-local keys use
+    whole = {"search_terms": re.compile("^" + re.escape(word))}
+    pieces = _pieces(word)
+    if not pieces or pieces == [word]:
+        return whole
+    return {"$or": [whole, {"search_terms": {"$all": [re.compile("^" + re.escape(p)) for p in pieces]}}]}
+
+
+def search_filter(search: str) -> dict:
+    """Filter matching documents where every word of `search` prefixes one of its keys."""
+    clauses = [_word_filter(w) for w in _query_words(search)]
+    if not clauses:
+        return {}
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def search_pipeline(query: dict, search: str, projection: dict, limit: int) -> list[dict]:
+    """Aggregation returning the best `limit` matches of `query` plus the search filter, ranked
+    by exact key hits, then name and email. Results keep `search_terms` so rank() can merge
+    the output of several collections."""
+    return [
+        {"$match": {**query, **search_filter(search)}},
+        {"$addFields": {
+            "_exact": {"$size": {"$setIntersection": [{"$ifNull": ["$search_terms", []]}, _exact_keys(search)]}},
+            "_name": {"$toLower": {"$ifNull": ["$name", ""]}},
+        }},
+        {"$sort": {"_exact": -1, "_name": 1, "email": 1, "_id": 1}},
+        {"$limit": limit},
+        {"$project": {**projection, "search_terms": 1}},
+    ]
+
+
+def rank(docs: list, search: str, limit: int, key=lambda d: d) -> list:
+    """Order candidates by relevance: exact key hits, then prefix hits, then name."""
+    exact_keys = set(_exact_keys(search))
+
+    def score(item):
+        doc = key(item)
+        exact = len(exact_keys & set(doc.get("search_terms") or []))
+        return (-exact, (doc.get("name") or "").lower(), doc.get("email") or "")
+
+    return sorted(docs, key=score)[:limit]
+
+
+def backfill_search_terms(db) -> int:
+    """Populate search_terms on documents written before search keys existed (or by other tools)."""
+    updated = 0
+    for coll_name in SEARCHABLE_COLLECTIONS:
+        coll = db[coll_name]
+        ops = []
+        for doc in coll.find({"search_terms": {"$exists": False}}, {"name": 1, "email": 1}):
+            ops.append(UpdateOne(
+                {"_id": doc["_id"]},
+                {"$set": {"search_terms": search_terms(doc.get("name"), doc.get("email"))}},
+            ))
+            if len(ops) == 1000:
+                updated += coll.bulk_write(ops, ordered=False).modified_count
+                ops = []
+        if ops:
+            updated += coll.bulk_write(ops, ordered=False).modified_count
+    return updated
@@ -0,0 +1,84 @@
+"""
+Student 360 view for the admin student detail page: every enrollment of one student with its
+class and the class's instructor.
+
+build() produces it with a single aggregation (enrollments → $lookup classes → $lookup
+instructor) instead of one query per class. get() caches results per email for
+STUDENT_CACHE_TTL_SECONDS (default 30); enrollment writes call invalidate() for the affected
+emails, and instructor or class edits show up when the entry expires. Pass a primary database
+handle: a cached view read from a lagging secondary would outlive the invalidate() meant to
+refresh it.
+"""
+import os
+
+from app import projections
+from app.cache import TTLCache
+
+
+def _ttl_seconds() -> float:
+    return float(os.getenv("STUDENT_CACHE_TTL_SECONDS", "30"))
+
+
+_cache = TTLCache(maxsize=5000, ttl=_ttl_seconds)
+
+
+def _to_object_id(field: str) -> dict:
+    return {"$convert": {"input": field, "to": "objectId", "onError": None, "onNull": None}}
+
+
+def pipeline(email: str) -> list[dict]:
+    return [
+        {"$match": {"student_email": email}},
+        {"$project": {"_id": 0, "class_id": 1, "risk": 1, "gpa": 1, "attendance": 1, "lms_activity": 1,
+                      "class_oid": _to_object_id("$class_id")}},
+        {"$lookup": {"from": "classes", "localField": "class_oid", "foreignField": "_id", "as": "class"}},
+        # keep enrollments whose class is gone, so "no enrollments" stays distinguishable
+        {"$unwind": {"path": "$class", "preserveNullAndEmptyArrays": True}},
+        {"$addFields": {"instructor_oid": _to_object_id("$class.instructor_id")}},
+        {"$lookup": {"from": "instructor", "localField": "instructor_oid", "foreignField": "_id", "as": "instructor"}},
+        {"$project": {
+            "class_id": 1, "risk": 1, "gpa": 1, "attendance": 1, "lms_activity": 1,
+            **{f"class.{field}": 1 for field in projections.CLASS},
+            **{f"instructor.{field}": 1 for field in projections.INSTRUCTOR_SUMMARY},
+        }},
+    ]
+
+
+def _row(doc) -> dict:
+    c = doc["class"]
+    inst = doc["instructor"][0] if doc.get("instructor") else None
+    return {
+        "class_id": doc["class_id"],
+        "subject_code": c.get("subject_code", ""),
+        "subject_name": c.get("subject_name", ""),
+        "course": (c.get("subject_code", "") + " " + c.get("subject_name", "")).strip(),
+        "instructor_id": c.get("instructor_id", ""),
+        "instructor_name": (inst.get("name", "") if inst else ""),
+        "department": (inst.get("department", "") if inst else ""),
+        "risk": doc.get("risk"),
+        "gpa": doc.get("gpa"),
+        "attendance": doc.get("attendance"),
+        "lms_activity": doc.get("lms_activity"),
+    }
+
+
+def build(db, email: str) -> list[dict] | None:
+    """Enrollment rows for a student, or None if the student has no enrollments."""
+    docs = list(db.enrollments.aggregate(pipeline(email)))
+    if not docs:
+        return None
+    return [_row(doc) for doc in docs if doc.get("class")]
+
+
+def get(db, email: str) -> list[dict] | None:
+    rows = _cache.get(email)
+    if rows is None:
+        rows = build(db, email)
+        if rows is not None:
+            _cache.set(email, rows)
+    return rows
+
+
+def invalidate(*emails: str):
+    for email in emails:
+        _cache.pop(email)
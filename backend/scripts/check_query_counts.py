@@ -0,0 +1,111 @@
+"""
+Assert that the class routes issue a constant number of MongoDB commands however many classes
+an instructor has (no N+1 queries).
+
+Seeds instructors with 1, 4 and 16 classes in a scratch database (scripts/fixtures.py),
+calls each route in-process with a fresh command counter (app/monitoring.py) and fails when
+any route's count changes with the number of classes. With motor installed the async routes
+are checked too, which also proves the counter reaches Motor's executor threads.
+
+    python -m scripts.check_query_counts
+"""
+import argparse
+import asyncio
+import importlib.util
+import os
+
+from dotenv import load_dotenv
+from fastapi import Request, Response
+
+# 16 classes x 6 students stays within one cursor batch, so getMore never adds commands
+CLASS_COUNTS = (1, 4, 16)
+
+
+def _sync_routes(seeded: dict) -> dict:
+    from app.routers import classes
+
+    iid, first = seeded["instructor_id"], seeded["class_ids"][0]
+    request = Request({"type": "http", "headers": []})
+    return {
+        "list-classes": lambda: classes.list_classes(iid),
+        "risk-alerts": lambda: classes.list_instructor_risk_alerts(iid),
+        # limit/after default to Query() markers outside FastAPI, so they are passed explicitly
+        "instructor-students": lambda: classes.list_instructor_students(iid, request, Response(), None, None),
+        "get-class": lambda: classes.get_class(first),
+        "class-students": lambda: classes.list_class_students(first, request),
+        "risk-summary": lambda: classes.get_class_risk_summary(first),
+    }
+
+
+def _async_routes(seeded: dict) -> dict:
+    from app.routers import classes_async
+
+    iid, first = seeded["instructor_id"], seeded["class_ids"][0]
+    return {
+        "list-classes": lambda: classes_async.list_classes(iid),
+        "risk-alerts": lambda: classes_async.list_instructor_risk_alerts(iid),
+        "instructor-students": lambda: classes_async.list_instructor_students(iid, Response(), None, None),
+        "get-class": lambda: classes_async.get_class(first),
+        "class-students": lambda: classes_async.list_class_students(first),
+        "risk-summary": lambda: classes_async.get_class_risk_summary(first),
+    }
+
+
+def _count(call) -> int:
+    from app.monitoring import start_counting
+
+    counter = start_counting()
+    call()
+    return counter.count
+
+
+async def _count_async(call) -> int:
+    from app.monitoring import start_counting
+
+    counter = start_counting()
+    await call()
+    return counter.count
+
+
+def check() -> int:
+    from scripts.fixtures import scratch_database, seed_instructor
+
+    modes = ["sync"] + (["async"] if importlib.util.find_spec("motor") else [])
+    counts: dict[tuple[str, str], list[int]] = {}
+    with scratch_database() as db:
+        seeds = [seed_instructor(db, classes=n) for n in CLASS_COUNTS]
+        for call in _sync_routes(seeds[0]).values():
+            call()  # warm-up: connection set-up is not part of a route's cost
+        for seeded in seeds:
+            for name, call in _sync_routes(seeded).items():
+                counts.setdefault(("sync", name), []).append(_count(call))
+        if "async" in modes:
+            async def measure():
+                for call in _async_routes(seeds[0]).values():
+                    await call()
+                for seeded in seeds:
+                    for name, call in _async_routes(seeded).items():
+                        counts.setdefault(("async", name), []).append(await _count_async(call))
+
+            # one event loop for every async call: the Motor client stays bound to it
+            asyncio.run(measure())
+
+    failures = 0
+    print(f"commands per request with {', '.join(map(str, CLASS_COUNTS))} classes")
+    for (mode, name), values in counts.items():
+        ok = len(set(values)) == 1 and values[0] > 0
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {mode:5} {name:20} {values}")
+    print("Command counts constant." if not failures else f"{failures} routes vary with the number of classes (or counted nothing).")
+    return 1 if failures else 0
+
+
+def main():
+    load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env"))
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args()
+    raise SystemExit(check())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+Check or repair the enrollment counters stored on class documents (app/class_counters.py).
+
+    python -m scripts.class_counters check     # report classes whose counters drifted
+    python -m scripts.class_counters repair    # recount only the drifted classes
+
+`check` exits with status 1 when any class differs, so it can run from cron.
+"""
+import argparse
+import os
+
+from dotenv import load_dotenv
+
+
+def main():
+    load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env"))
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["check", "repair"])
+    args = parser.parse_args()
+
+    from app.class_counters import check, repair
+    from app.database import get_db
+
+    db = get_db()
+    if args.command == "repair":
+        print(f"Recounted {repair(db)} classes.")
+        return
+    drift = check(db)
+    for entry in drift:
+        print(f"DRIFT class {entry['class_id']}: stored={entry['stored']} expected={entry['expected']}")
+    print("Class counters consistent." if not drift else f"{len(drift)} classes drifted; run `repair`.")
+    raise SystemExit(1 if drift else 0)
+
+
+if __name__ == "__main__":
+    main()
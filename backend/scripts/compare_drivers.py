@@ -0,0 +1,195 @@
+"""
+Compare the sync (pymongo) and async (motor) class routes.
+
+Parity: seeds instructors with 0, 1 and 3 classes in a scratch database (scripts/fixtures.py),
+calls both implementations in-process with the same arguments, including a paged request and
+unknown or invalid class ids, and exits 1 when any result, error or X-Next-Cursor header
+differs. With --instructor-id it compares that instructor's routes on the configured database
+instead. Needs motor.
+
+    python -m scripts.compare_drivers parity
+
+Throughput: drives a running server with N concurrent keep-alive clients for a fixed time.
+Start the API once with MONGODB_DRIVER=sync and once with MONGODB_DRIVER=async and run:
+
+    python -m scripts.compare_drivers bench --url "http://localhost:8000/api/classes?instructor_id=<id>" --clients 500
+"""
+import argparse
+import asyncio
+import importlib.util
+import os
+import time
+from urllib.parse import urlsplit
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request, Response
+
+FIXTURE_CLASSES = (0, 1, 3)
+PAGE_SIZE = 4
+
+
+def _checks(instructor_id: str, class_ids: list[str]) -> list:
+    """(name, sync call, async call) for every class read route of one instructor."""
+    from app.routers import classes, classes_async
+
+    request = Request({"type": "http", "headers": []})
+
+    def paged(call, limit):
+        # limit/after default to Query() markers outside FastAPI, so they are passed explicitly
+        response = Response()
+        return call(response, limit), response.headers.get("x-next-cursor")
+
+    async def paged_async(call, limit):
+        response = Response()
+        return await call(response, limit), response.headers.get("x-next-cursor")
+
+    checks = [
+        ("risk-alerts", lambda: classes.list_instructor_risk_alerts(instructor_id),
+         lambda: classes_async.list_instructor_risk_alerts(instructor_id)),
+        ("list-classes", lambda: classes.list_classes(instructor_id),
+         lambda: classes_async.list_classes(instructor_id)),
+    ]
+    for limit in (None, PAGE_SIZE):
+        checks.append((
+            f"instructor-students limit={limit}",
+            lambda limit=limit: paged(lambda r, n: classes.list_instructor_students(instructor_id, request, r, n, None), limit),
+            lambda limit=limit: paged_async(lambda r, n: classes_async.list_instructor_students(instructor_id, r, n, None), limit),
+        ))
+    for cid in class_ids:
+        checks.extend([
+            (f"class {cid}", lambda cid=cid: classes.get_class(cid),
+             lambda cid=cid: classes_async.get_class(cid)),
+            (f"class {cid} students", lambda cid=cid: classes.list_class_students(cid, request),
+             lambda cid=cid: classes_async.list_class_students(cid)),
+            (f"class {cid} risk-summary", lambda cid=cid: classes.get_class_risk_summary(cid),
+             lambda cid=cid: classes_async.get_class_risk_summary(cid)),
+        ])
+    return checks
+
+
+def _outcome(call):
+    try:
+        return call()
+    except HTTPException as e:
+        return ("HTTPException", e.status_code, e.detail)
+
+
+async def _outcome_async(call):
+    try:
+        return await call()
+    except HTTPException as e:
+        return ("HTTPException", e.status_code, e.detail)
+
+
+def _compare(checks: list) -> int:
+    """Run every check on both drivers and print the result; returns the number that differ."""
+    async def run_async():
+        return [await _outcome_async(make) for _, _, make in checks]
+
+    # one event loop for every async call: the Motor client stays bound to it
+    async_results = asyncio.run(run_async())
+    failures = 0
+    for (name, sync_call, _), async_result in zip(checks, async_results):
+        ok = _outcome(sync_call) == async_result
+        failures += not ok
+        print(f"{'ok  ' if ok else 'DIFF'} {name}")
+    print(f"{len(checks) - failures}/{len(checks)} endpoints identical")
+    return failures
+
+
+def parity(instructor_id: str | None = None) -> int:
+    if not importlib.util.find_spec("motor"):
+        print("motor is not installed; install it to compare the async routes.")
+        return 1
+    if instructor_id:
+        from app.database import get_db
+
+        class_ids = [str(c["_id"]) for c in get_db().classes.find({"instructor_id": instructor_id}, {"_id": 1})]
+        return 1 if _compare(_checks(instructor_id, class_ids)) else 0
+
+    from scripts.fixtures import scratch_database, seed_instructor
+
+    with scratch_database() as db:
+        checks = []
+        for n in FIXTURE_CLASSES:
+            seeded = seed_instructor(db, classes=n)
+            checks += _checks(seeded["instructor_id"], seeded["class_ids"] + ["0" * 24, "not-a-class-id"])
+        failures = _compare(checks)
+    return 1 if failures else 0
+
+
+async def _client(host: str, port: int, request: bytes, deadline: float, latencies: list, errors: list):
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError as e:
+        errors.append(str(e))
+        return
+    try:
+        while time.monotonic() < deadline:
+            started = time.monotonic()
+            writer.write(request)
+            await writer.drain()
+            status = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                if name.lower() == "content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+            if not status.split(b" ")[1:2] == [b"200"]:
+                errors.append(status.decode("latin-1").strip())
+            latencies.append(time.monotonic() - started)
+    except (OSError, asyncio.IncompleteReadError) as e:
+        errors.append(str(e))
+    finally:
+        writer.close()
+
+
+def bench(url: str, clients: int, seconds: float) -> int:
+    parts = urlsplit(url)
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    request = f"GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nConnection: keep-alive\r\n\r\n".encode()
+    latencies: list[float] = []
+    errors: list[str] = []
+
+    async def run():
+        deadline = time.monotonic() + seconds
+        await asyncio.gather(*(
+            _client(parts.hostname, parts.port or 80, request, deadline, latencies, errors)
+            for _ in range(clients)
+        ))
+
+    started = time.monotonic()
+    asyncio.run(run())
+    elapsed = time.monotonic() - started
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else 0
+
+    print(f"{clients} clients, {elapsed:.1f}s: {len(latencies)} requests, {len(latencies) / elapsed:.0f} req/s")
+    print(f"latency ms: p50 {pct(0.50):.1f}  p95 {pct(0.95):.1f}  p99 {pct(0.99):.1f}  errors {len(errors)}")
+    return 0
+
+
+def main():
+    load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env"))
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("parity", help="compare sync and async route output")
+    p.add_argument("--instructor-id", help="compare this instructor on the configured database instead of fixtures")
+    b = sub.add_parser("bench", help="measure throughput of a running server")
+    b.add_argument("--url", required=True)
+    b.add_argument("--clients", type=int, default=500)
+    b.add_argument("--seconds", type=float, default=15)
+    args = parser.parse_args()
+    if args.command == "parity":
+        raise SystemExit(parity(args.instructor_id))
+    raise SystemExit(bench(args.url, args.clients, args.seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""
+Evaluate recorded risk labels against enrollment outcomes (app/evaluation.py) outside the API,
+e.g. nightly after outcomes are imported.
+
+    python -m scripts.evaluate           # terms with enrollments written since the last run
+    python -m scripts.evaluate --full    # every term
+"""
+import argparse
+import os
+
+from dotenv import load_dotenv
+
+
+def main():
+    load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env"))
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--full", action="store_true", help="re-evaluate every term")
+    args = parser.parse_args()
+
+    from app.database import get_db
+    from app.evaluation import refresh
+
+    written = refresh(get_db(), full=args.full)
+    print(f"Wrote {written} evaluation results." if written else "No new outcomes to evaluate.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Fixture data for the check scripts (query counts, driver parity).
+
+scratch_database() points get_db() / get_async_db() at a throwaway database
+(CHECK_MONGODB_DB, default "<MONGODB_DB>_checks"), creates the declared indexes and drops the
+database again afterwards, so checks never touch real data. seed_instructor() adds one
+instructor with a given number of classes and labeled enrollments.
+"""
+import os
+import uuid
+from contextlib import contextmanager
+
+RISKS = ("High", "Medium", "Low", None)
+
+
+@contextmanager
+def scratch_database():
+    from app import scope
+    from app.database import get_client
+    from app.indexes import ensure_indexes
+
+    name = os.getenv("CHECK_MONGODB_DB") or os.getenv("MONGODB_DB", "capstonesystem") + "_checks"
+    previous = os.environ.get("MONGODB_DB")
+    os.environ["MONGODB_DB"] = name
+    client = get_client()
+    client.drop_database(name)
+    db = client[name]
+    ensure_indexes(db, log=lambda *_: None)
+    try:
+        yield db
+    finally:
+        client.drop_database(name)
+        if previous is None:
+            os.environ.pop("MONGODB_DB", None)
+        else:
+            os.environ["MONGODB_DB"] = previous
+        scope.invalidate()
+
+
+def seed_instructor(db, classes: int, students_per_class: int = 6, department: str = "Computer Science") -> dict:
+    """Insert an instructor with `classes` classes; returns {"instructor_id", "class_ids"}."""
+    from app import class_counters, rollups, scope
+
+    tag = uuid.uuid4().hex[:8]
+    instructor_id = str(db.instructor.insert_one({
+        "name": f"Instructor {tag}", "email": f"instructor-{tag}@example.edu", "department": department,
+    }).inserted_id)
+    class_ids = []
+    for i in range(classes):
+        class_id = str(db.classes.insert_one({
+            "subject_code": f"CS{100 + i}", "subject_name": f"Course {i} {tag}", "instructor_id": instructor_id,
+        }).inserted_id)
+        class_ids.append(class_id)
+        enrollments = []
+        for j in range(students_per_class):
+            doc = {"class_id": class_id, "student_email": f"student{j}-{tag}@example.edu",
+                   "gpa": round(1 + (j % 4) * 0.75, 2), "attendance": 60 + (j * 7) % 40}
+            if RISKS[j % len(RISKS)]:
+                doc["risk"] = RISKS[j % len(RISKS)]
+            enrollments.append(doc)
+        if enrollments:
+            db.enrollments.insert_many(enrollments)
+    class_counters.backfill(db)
+    rollups.rebuild_rollups(db)
+    scope.invalidate()
+    return {"instructor_id": instructor_id, "class_ids": class_ids}
@@ -0,0 +1,29 @@
+"""
+Record today's risk snapshot (app/risk_history.py) outside the API process, e.g. from cron
+when the server runs with RISK_SNAPSHOT_INTERVAL_SECONDS=0.
+
+    python -m scripts.risk_history snapshot
+"""
+import argparse
+import os
+
+from dotenv import load_dotenv
+
+
+def main():
+    load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env"))
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["snapshot"])
+    parser.parse_args()
+
+    from app.database import get_db
+    from app.risk_history import ensure_snapshot_collection, take_snapshot
+
+    db = get_db()
+    ensure_snapshot_collection(db)
+    written = take_snapshot(db)
+    print(f"Recorded {written} rollup snapshots." if written else "Today's snapshot already exists.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Check or rebuild the admin overview rollups (app/rollups.py).
+
+    python -m scripts.rollups check      # report rollups that drifted from enrollments
+    python -m scripts.rollups rebuild    # recompute every rollup from scratch
+
+`check` exits with status 1 when any rollup differs, so it can run from cron.
+"""
+import argparse
+import os
+
+from dotenv import load_dotenv
+
+
+def main():
+    load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env"))
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["check", "rebuild"])
+    args = parser.parse_args()
+
+    from app.database import get_db
+    from app.rollups import check_rollups, rebuild_rollups
+
+    db = get_db()
+    if args.command == "rebuild":
+        print(f"Rebuilt {rebuild_rollups(db)} rollup documents.")
+        return
+    drift = check_rollups(db)
+    for entry in drift:
+        changed = [
+            f"{k} stored={entry['stored'][k]} expected={v}"
+            for k, v in entry["expected"].items()
+            if entry["stored"][k] != v
+        ]
+        print(f"DRIFT {entry['_id']}: {', '.join(changed) or 'scope'}")
+    print("Rollups consistent." if not drift else f"{len(drift)} rollup documents drifted; run `rebuild`.")
+    raise SystemExit(1 if drift else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+Rescore the risk label of every enrollment from its indicators (app/scoring.py), e.g. nightly
+from cron. Only labels that change are written; hand-set labels are left alone.
+
+    python -m scripts.score_risk             # rescore and write changed labels
+    python -m scripts.score_risk --dry-run   # only count what would change
+"""
+import argparse
+import os
+import time
+
+from dotenv import load_dotenv
+
+
+def main():
+    load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env"))
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="count changes without writing them")
+    args = parser.parse_args()
+
+    from app.database import get_db
+    from app.risk_alerts import drain
+    from app.scoring import rescore_all
+
+    db = get_db()
+    started = time.perf_counter()
+    result = rescore_all(db, dry_run=args.dry_run)
+    verb = "would change" if args.dry_run else "changed"
+    print(f"Scored {result['scored']} enrollments, {verb} {result['changed']} labels in {time.perf_counter() - started:.1f}s.")
+    written = drain(db)
+    if written:
+        print(f"Wrote {written} risk notifications.")
+
+
+if __name__ == "__main__":
+    main()